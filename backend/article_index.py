@@ -0,0 +1,193 @@
+import bisect
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+# Articles whose index is kept in memory per process, on top of the stored copy
+INDEX_CACHE_SIZE = 32
+
+
+class ArticleIndex:
+    """
+    Pre-order (Euler tour) numbering of an article's comment tree.
+
+    Comment at position p has its whole subtree at positions [p, end[p]),
+    so "is a descendant of" is a range check and a subtree is a slice.
+    `by_author` lists each author's positions in increasing order. Only
+    the numbering is held: built once when a store saves the article and
+    persisted with it (to_dict), it stays valid while the store's
+    updated_at equals `version`. A view expands just the comments it keeps
+    (store.read_positions): the SQLite store reads only those rows, the
+    JSON store decodes the file once per version and keeps it in memory.
+    Positions are the same pre-order the SQLite store numbers rows with.
+    """
+
+    def __init__(self, ids: List[str], parent: List[int], end: List[int],
+                 by_author: Dict[str, List[int]], version=None):
+        self.ids = ids
+        self.parent = parent
+        self.end = end
+        self.by_author = by_author
+        self.version = version
+        self._position = None
+
+    @classmethod
+    def build(cls, comments: List[Dict], version=None) -> "ArticleIndex":
+        ids, parent, end, by_author = [], [], [], {}
+        # Iterative pre-order walk; a None marker closes a subtree.
+        stack = [(c, -1) for c in reversed(comments)]
+        while stack:
+            item, up = stack.pop()
+            if item is None:
+                end[up] = len(ids)
+                continue
+            pos = len(ids)
+            ids.append(str(item['id']))
+            parent.append(up)
+            end.append(pos + 1)
+            # Authorless comments (knowledge files) are keyed "" so the index is JSON
+            by_author.setdefault(item.get('author') or "", []).append(pos)
+            children = item.get('children') or []
+            if children:
+                stack.append((None, pos))
+                stack.extend((c, pos) for c in reversed(children))
+        return cls(ids, parent, end, by_author, version)
+
+    def to_dict(self) -> Dict:
+        return {'version': self.version, 'ids': self.ids, 'parent': self.parent,
+                'end': self.end, 'by_author': self.by_author}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ArticleIndex":
+        return cls(data['ids'], data['parent'], data['end'], data['by_author'], data.get('version'))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def position(self) -> Dict[str, int]:
+        # Only root views need it; built once per cached index
+        if self._position is None:
+            self._position = {comment_id: pos for pos, comment_id in enumerate(self.ids)}
+        return self._position
+
+    def subtree(self, comment_id: str) -> Optional[range]:
+        pos = self.position.get(str(comment_id))
+        return None if pos is None else range(pos, self.end[pos])
+
+    def by(self, author: str, within: Optional[range] = None) -> List[int]:
+        positions = self.by_author.get(author, [])
+        if within is None:
+            return positions
+        lo = bisect.bisect_left(positions, within.start)
+        hi = bisect.bisect_left(positions, within.stop)
+        return positions[lo:hi]
+
+    def select(self, author: Optional[str] = None, root: Optional[str] = None):
+        """
+        (matched positions, kept positions in order): the comments by
+        `author`, in the subtree of comment `root`, or both, and every
+        ancestor of a match. None if `root` is not a comment here.
+        """
+        within = None
+        if root is not None:
+            within = self.subtree(root)
+            if within is None:
+                return None
+        matched = self.by(author, within) if author is not None else list(within or range(len(self)))
+
+        keep = set(matched)
+        for pos in matched:
+            # Stop at the first ancestor already kept: its chain is in too.
+            up = self.parent[pos]
+            while up != -1 and up not in keep:
+                keep.add(up)
+                up = self.parent[up]
+        return matched, sorted(keep)
+
+    def assemble(self, article: Dict, comments: Dict[int, Dict], matched: List[int], keep: List[int]) -> Dict:
+        """The view from select()'s positions and the comments read at them."""
+        top, nodes = [], {}
+        for pos in keep:
+            node = {k: v for k, v in comments[pos].items() if k != 'children'}
+            node['children'] = []
+            nodes[pos] = node
+            up = self.parent[pos]
+            (nodes[up]['children'] if up in nodes else top).append(node)
+
+        view = {k: v for k, v in article.items() if k != 'comments'}
+        view['comments'] = top
+        view['matched_ids'] = [self.ids[pos] for pos in matched]
+        return view
+
+    def matches(self, comments: Dict[int, Dict]) -> bool:
+        """Whether comments read from the store are the ones this index numbered."""
+        return all(pos < len(self.ids) and str(c['id']) == self.ids[pos] for pos, c in comments.items())
+
+
+_cache = OrderedDict()
+_guard = threading.Lock()
+
+
+def _remember(store, article_id, index):
+    key = (store.collection, article_id)
+    with _guard:
+        _cache[key] = index
+        _cache.move_to_end(key)
+        while len(_cache) > INDEX_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return index
+
+
+def _rebuild(store, article_id: str) -> Optional[ArticleIndex]:
+    # Articles stored before indexes were persisted, or whose index is stale
+    version = store.updated_at(article_id)
+    data = store.get(article_id)
+    if data is None:
+        return None
+    index = ArticleIndex.build(data.get('comments', []), version)
+    store.save_index(article_id, index)
+    return _remember(store, article_id, index)
+
+
+def get(store, article_id: str) -> Optional[ArticleIndex]:
+    """The index of the stored article: from memory, else as the store persisted it, else rebuilt."""
+    version = store.updated_at(article_id)
+    if version is None:
+        return None
+    key = (store.collection, article_id)
+    with _guard:
+        cached = _cache.get(key)
+        if cached is not None and cached.version == version:
+            _cache.move_to_end(key)
+            return cached
+    stored = store.get_index(article_id)
+    if stored is not None and stored.get('version') == version:
+        return _remember(store, article_id, ArticleIndex.from_dict(stored))
+    return _rebuild(store, article_id)
+
+
+def view(store, article_id: str, author: Optional[str] = None, root: Optional[str] = None):
+    """
+    The stored article with only the matching comments (see
+    ArticleIndex.select), expanding no other comment than those kept;
+    `matched_ids` lists the matches themselves. Returns None if the
+    article is not stored, False if `root` is not one of its comments.
+    """
+    for _ in range(2):
+        index = get(store, article_id)
+        if index is None:
+            return None
+        selected = index.select(author=author, root=root)
+        if selected is None:
+            return False
+        matched, keep = selected
+        read = store.read_positions(article_id, keep)
+        if read is None:
+            return None
+        article, comments = read
+        if len(comments) == len(keep) and index.matches(comments):
+            return index.assemble(article, comments, matched, keep)
+        # Replaced between reading the index and the comments
+        _rebuild(store, article_id)
+    return None
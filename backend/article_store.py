@@ -0,0 +1,715 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+from storage import (
+    BACKEND_DIR, CACHE_DIR, atomic_write_json, read_json, read_bytes, read_checksums, checksum,
+    key_lock, remove, CorruptedFileError, JsonObjectReader,
+)
+from compaction import compact_article, expand_article, expand_author
+from article_index import ArticleIndex
+
+PROJECT_ROOT = os.path.dirname(BACKEND_DIR)
+
+# Where each collection lives when stored as plain JSON files.
+# "knowledge/<user>" collections map to backend/knowledge/<user>.
+COLLECTION_DIRS = {
+    "cache": CACHE_DIR,
+    "public": os.path.join(PROJECT_ROOT, "frontend", "public", "data"),
+}
+KNOWLEDGE_DIR = os.path.join(BACKEND_DIR, "knowledge")
+
+# Collections published as static files (GitHub Pages); written without
+# checksum sidecars, which would otherwise be deployed alongside them.
+STATIC_COLLECTIONS = {"public"}
+
+# Scraped threads, whose comments repeat author names and avatars: stored
+# compact and minified (compaction.compact_article). Knowledge files keep
+# the plain, indented layout extract_by_author and their history use.
+COMPACT_COLLECTIONS = {"cache", "public"}
+
+# Files in a JSON collection directory that are not articles.
+NON_ARTICLE_FILES = {"index.json"}
+
+DEFAULT_DB_PATH = os.path.join(BACKEND_DIR, "articles.db")
+
+# Encoded articles kept in memory by SqliteArticleStore.get_raw
+RAW_CACHE_SIZE = 64
+# Comment rows per query when streaming an article out of SQLite
+ITER_PAGE_SIZE = 500
+# Decoded articles, as pre-order comment lists, kept by JsonArticleStore for
+# read_positions (filtered views of the same threads)
+FLAT_CACHE_SIZE = 32
+
+# Where a JSON collection keeps each article's comment-tree index (article_index)
+INDEX_DIR_NAME = ".index"
+
+
+def discover_collections() -> List[str]:
+    """All JSON collections on disk: cache, public and every knowledge/<user>."""
+    collections = ["cache", "public"]
+    if os.path.isdir(KNOWLEDGE_DIR):
+        for username in sorted(os.listdir(KNOWLEDGE_DIR)):
+            if os.path.isdir(os.path.join(KNOWLEDGE_DIR, username)):
+                collections.append(f"knowledge/{username}")
+    return collections
+
+
+def collection_dir(collection: str) -> str:
+    if collection in COLLECTION_DIRS:
+        return COLLECTION_DIRS[collection]
+    if collection.startswith("knowledge/"):
+        return os.path.join(KNOWLEDGE_DIR, collection.split("/", 1)[1])
+    raise ValueError(f"Unknown collection: {collection}")
+
+
+class JsonArticleStore:
+    """
+    One `<id>.json` file per article, as the project has always stored them.
+    Files of COMPACT_COLLECTIONS hold the minified compact form
+    (compaction.compact_article); get() expands it, get_raw() and the file
+    itself are the compact form. Other collections are stored as given.
+    Except for static collections, save() also writes the article's
+    ArticleIndex to `.index/<id>.json`.
+    """
+
+    def __init__(self, collection: str, directory: Optional[str] = None):
+        self.collection = collection
+        self.directory = directory or collection_dir(collection)
+        self.with_checksum = collection not in STATIC_COLLECTIONS
+        self.compact = collection in COMPACT_COLLECTIONS
+        self.indexed = collection not in STATIC_COLLECTIONS
+        self._flat_cache = OrderedDict()
+        self._flat_cache_guard = threading.Lock()
+
+    def path(self, article_id: str) -> str:
+        return os.path.join(self.directory, f"{article_id}.json")
+
+    def index_path(self, article_id: str) -> str:
+        return os.path.join(self.directory, INDEX_DIR_NAME, f"{article_id}.json")
+
+    def _lock_key(self, article_id):
+        return f"{self.collection}:{article_id}"
+
+    def exists(self, article_id: str) -> bool:
+        return os.path.exists(self.path(article_id))
+
+    def updated_at(self, article_id: str) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.path(article_id))
+        except FileNotFoundError:
+            return None
+
+    def _read(self, article_id: str) -> Optional[Dict]:
+        """The stored form as is (compact for COMPACT_COLLECTIONS)."""
+        path = self.path(article_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            return read_json(path)
+        except CorruptedFileError:
+            # Possibly caught a writer between its two renames; retry once it is done.
+            with key_lock(self._lock_key(article_id)):
+                return read_json(path)
+
+    def get(self, article_id: str) -> Optional[Dict]:
+        data = self._read(article_id)
+        return expand_article(data) if data is not None else None
+
+    def iter_article(self, article_id: str) -> Optional[Tuple[Dict, Iterator[Tuple[Dict, int]]]]:
+        """
+        The article's own fields and an iterator of (comment, depth) in
+        reading order, for consumers that don't need the tree (exports).
+        Comments come expanded and without `children`. None if not stored.
+
+        The file is never decoded whole: a first pass reads the other
+        fields (which may follow `comments`) and verifies the checksum, a
+        second one decodes one top-level comment, with its replies, at a
+        time. Memory is bounded by the largest such subtree, not the thread.
+        """
+        path = self.path(article_id)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        try:
+            try:
+                data = self._scan(f)
+            except CorruptedFileError:
+                # Possibly caught a writer between its two renames; retry once it is done.
+                f.close()
+                with key_lock(self._lock_key(article_id)):
+                    f = open(path, 'rb')
+                    data = self._scan(f)
+        except BaseException:
+            f.close()
+            raise
+        return data, _stream_comments(f, data.pop('authors', None) or [])
+
+    def _scan(self, f) -> Dict:
+        """Every field but `comments`, verified against the checksum sidecar."""
+        reader = JsonObjectReader(f)
+        data = {}
+        try:
+            for key in reader.members():
+                if key == 'comments':
+                    for _ in reader.elements():
+                        pass
+                else:
+                    data[key] = reader.value()
+            error = None
+        except ValueError as e:
+            # A torn file is reported as such, not as a syntax error
+            error = e
+        reader.read_rest()
+        expected = read_checksums(f.name) if self.with_checksum else []
+        if expected and reader.sha256.hexdigest() not in expected:
+            raise CorruptedFileError(f"Checksum mismatch for {f.name}")
+        if error is not None:
+            raise error
+        return data
+
+    def _flat(self, article_id: str):
+        """(own fields, authors, comments in pre-order) of the stored copy; cached per mtime."""
+        version = self.updated_at(article_id)
+        if version is None:
+            return None
+        key = (article_id, version)
+        with self._flat_cache_guard:
+            flat = self._flat_cache.get(key)
+            if flat is not None:
+                self._flat_cache.move_to_end(key)
+                return flat
+        data = self._read(article_id)
+        if data is None:
+            return None
+        authors = data.pop('authors', None) or []
+        comments = []
+        stack = list(reversed(data.pop('comments', [])))
+        while stack:
+            comment = stack.pop()
+            stack.extend(reversed(comment.get('children') or []))
+            comments.append(comment)
+        flat = (data, authors, comments)
+        # Only if no write landed during the read, so the key describes the content
+        if self.updated_at(article_id) == version:
+            with self._flat_cache_guard:
+                self._flat_cache[key] = flat
+                while len(self._flat_cache) > FLAT_CACHE_SIZE:
+                    self._flat_cache.popitem(last=False)
+        return flat
+
+    def read_positions(self, article_id: str, positions: List[int]) -> Optional[Tuple[Dict, Dict[int, Dict]]]:
+        """
+        The article's own fields and {position: comment} for the given
+        pre-order positions (article_index), expanded and without
+        `children`. None if not stored. The file is decoded once per
+        version (FLAT_CACHE_SIZE articles are kept), so after the first
+        view of a thread the cost is that of the comments asked for.
+        """
+        flat = self._flat(article_id)
+        if flat is None:
+            return None
+        data, authors, comments = flat
+        found = {
+            pos: expand_author({k: v for k, v in comments[pos].items() if k != 'children'}, authors)
+            for pos in positions if pos < len(comments)
+        }
+        return dict(data), found
+
+    def get_index(self, article_id: str) -> Optional[Dict]:
+        """The persisted ArticleIndex (to_dict form), if any; callers check its version."""
+        path = self.index_path(article_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            return read_json(path, verify=self.with_checksum)
+        except (CorruptedFileError, ValueError) as e:
+            print(f"Ignoring unreadable index {path}: {e}")
+            return None
+
+    def save_index(self, article_id: str, index: ArticleIndex):
+        if self.indexed:
+            atomic_write_json(self.index_path(article_id), index.to_dict(),
+                              with_checksum=self.with_checksum, indent=None)
+
+    def get_raw(self, article_id: str) -> Optional[Tuple[bytes, str]]:
+        """The stored JSON bytes and their sha256, without decoding them."""
+        path = self.path(article_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            data = read_bytes(path)
+        except CorruptedFileError:
+            with key_lock(self._lock_key(article_id)):
+                data = read_bytes(path)
+        return data, checksum(data)
+
+    def listing_token(self):
+        """Changes whenever an article is added, replaced or removed."""
+        try:
+            # Every write renames into the directory, which bumps its mtime.
+            return os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def save(self, data: Dict):
+        article_id = str(data['id'])
+        with key_lock(self._lock_key(article_id)):
+            if self.compact:
+                atomic_write_json(self.path(article_id), compact_article(data),
+                                  with_checksum=self.with_checksum, indent=None)
+            else:
+                atomic_write_json(self.path(article_id), data, with_checksum=self.with_checksum)
+            # Stamped with the new file's mtime, so a stale index is recognised
+            self.save_index(article_id, ArticleIndex.build(data.get('comments', []), self.updated_at(article_id)))
+
+    def delete(self, article_id: str):
+        with key_lock(self._lock_key(article_id)):
+            remove(self.path(article_id))
+            remove(self.index_path(article_id))
+
+    def list_ids(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return [
+            f[:-len('.json')] for f in os.listdir(self.directory)
+            if f.endswith('.json') and not f.startswith('.') and f not in NON_ARTICLE_FILES
+        ]
+
+    def list_articles(self) -> List[Dict]:
+        """Return `{id, title, version, updated_at}` for every article, newest first."""
+        items = []
+        for article_id in self.list_ids():
+            path = self.path(article_id)
+            try:
+                data = read_json(path)
+                if 'id' in data and 'title' in data:
+                    items.append({
+                        'id': data['id'],
+                        'title': data['title'],
+                        'version': data.get('version', 0),
+                        'updated_at': os.path.getmtime(path),
+                    })
+            except Exception as e:
+                print(f"Error reading {path}: {e}")
+        items.sort(key=lambda x: x['updated_at'], reverse=True)
+        return items
+
+
+def _stream_comments(f, authors: List[Dict]) -> Iterator[Tuple[Dict, int]]:
+    # Same open file as the scan, so a file replaced since is not mixed in
+    try:
+        f.seek(0)
+        reader = JsonObjectReader(f)
+        for key in reader.members():
+            if key != 'comments':
+                reader.value()
+                continue
+            for comment in reader.elements():
+                yield from _walk_stored([comment], authors)
+    finally:
+        f.close()
+
+
+def _walk_stored(comments: List[Dict], authors: List[Dict]) -> Iterator[Tuple[Dict, int]]:
+    # Iterative so long reply chains don't hit the recursion limit.
+    stack = [(c, 0) for c in reversed(comments)]
+    while stack:
+        comment, depth = stack.pop()
+        stack.extend((c, depth + 1) for c in reversed(comment.get('children') or []))
+        yield expand_author({k: v for k, v in comment.items() if k != 'children'}, authors), depth
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS authors (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    avatar TEXT
+);
+
+CREATE TABLE IF NOT EXISTS articles (
+    collection TEXT NOT NULL,
+    id TEXT NOT NULL,
+    title TEXT,
+    content TEXT,
+    author_id INTEGER REFERENCES authors(id),
+    publish_time TEXT,
+    extra TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (collection, id)
+);
+CREATE INDEX IF NOT EXISTS idx_articles_updated ON articles(collection, updated_at);
+
+-- `position` is the comment's pre-order index within the article's tree, so
+-- reading rows by position always yields a parent before its children.
+CREATE TABLE IF NOT EXISTS comments (
+    collection TEXT NOT NULL,
+    article_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    id TEXT NOT NULL,
+    parent_id TEXT,
+    author_id INTEGER REFERENCES authors(id),
+    content TEXT,
+    content_text TEXT,
+    time TEXT,
+    timestamp REAL,
+    location TEXT,
+    reply_to_user TEXT,
+    quoted_text TEXT,
+    extra TEXT,
+    PRIMARY KEY (collection, article_id, position),
+    FOREIGN KEY (collection, article_id) REFERENCES articles(collection, id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_comments_id ON comments(collection, article_id, id);
+CREATE INDEX IF NOT EXISTS idx_comments_parent ON comments(collection, article_id, parent_id);
+CREATE INDEX IF NOT EXISTS idx_comments_author ON comments(author_id);
+CREATE INDEX IF NOT EXISTS idx_comments_timestamp ON comments(timestamp);
+
+-- article_index.ArticleIndex of each article, as JSON, written with it
+CREATE TABLE IF NOT EXISTS article_indexes (
+    collection TEXT NOT NULL,
+    article_id TEXT NOT NULL,
+    version REAL NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (collection, article_id),
+    FOREIGN KEY (collection, article_id) REFERENCES articles(collection, id) ON DELETE CASCADE
+);
+"""
+
+ARTICLE_COLUMNS = ("title", "content", "publish_time")
+COMMENT_COLUMNS = ("content", "content_text", "time", "timestamp", "location", "reply_to_user", "quoted_text")
+
+
+def _split_extra(item: Dict, columns, skip) -> str:
+    # Anything without a dedicated column, plus keys explicitly set to None,
+    # goes into a JSON blob so documents round-trip unchanged.
+    extra = {
+        k: v for k, v in item.items()
+        if k not in skip and (k not in columns or v is None)
+    }
+    return json.dumps(extra, ensure_ascii=False) if extra else None
+
+
+class SqliteArticleStore:
+    """
+    Normalised articles/comments/authors tables in a single SQLite database,
+    plus each article's ArticleIndex, written in the same transaction.
+    Runs in WAL mode so readers (API workers) never block on the writer.
+    """
+
+    def __init__(self, collection: str, db_path: Optional[str] = None):
+        self.collection = collection
+        self.db_path = db_path or os.environ.get("ARTICLE_DB", DEFAULT_DB_PATH)
+        self.compact = collection in COMPACT_COLLECTIONS
+        self._local = threading.local()
+        self._raw_cache = OrderedDict()
+        self._raw_cache_guard = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _author_id(self, name, avatar=None, seen=None):
+        if not name:
+            return None
+        if seen is not None and name in seen:
+            return seen[name]
+        self.conn.execute(
+            "INSERT INTO authors (name, avatar) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET avatar = COALESCE(NULLIF(excluded.avatar, ''), authors.avatar)",
+            (name, avatar),
+        )
+        author_id = self.conn.execute("SELECT id FROM authors WHERE name = ?", (name,)).fetchone()[0]
+        if seen is not None:
+            seen[name] = author_id
+        return author_id
+
+    def exists(self, article_id: str) -> bool:
+        row = self.conn.execute(
+            "SELECT 1 FROM articles WHERE collection = ? AND id = ?", (self.collection, article_id)
+        ).fetchone()
+        return row is not None
+
+    def updated_at(self, article_id: str) -> Optional[float]:
+        row = self.conn.execute(
+            "SELECT updated_at FROM articles WHERE collection = ? AND id = ?", (self.collection, article_id)
+        ).fetchone()
+        return row['updated_at'] if row else None
+
+    def _header(self, article_id: str) -> Optional[Dict]:
+        row = self.conn.execute(
+            "SELECT a.*, au.name AS author_name FROM articles a "
+            "LEFT JOIN authors au ON au.id = a.author_id "
+            "WHERE a.collection = ? AND a.id = ?",
+            (self.collection, article_id),
+        ).fetchone()
+        if row is None:
+            return None
+
+        data = {'id': row['id']}
+        for col in ARTICLE_COLUMNS:
+            if row[col] is not None:
+                data[col] = row[col]
+        if row['author_name'] is not None:
+            data['author'] = row['author_name']
+        if row['extra']:
+            data.update(json.loads(row['extra']))
+        return data
+
+    _COMMENTS_QUERY = (
+        "SELECT c.*, au.name AS author_name, au.avatar AS author_avatar FROM comments c "
+        "LEFT JOIN authors au ON au.id = c.author_id "
+        "WHERE c.collection = ? AND c.article_id = ?"
+    )
+
+    @staticmethod
+    def _comment(r) -> Dict:
+        comment = {'id': r['id']}
+        if r['author_name'] is not None:
+            comment['author'] = r['author_name']
+            comment['author_avatar'] = r['author_avatar'] or ""
+        for col in COMMENT_COLUMNS:
+            if r[col] is not None:
+                comment[col] = r[col]
+        comment['children'] = []
+        if r['extra']:
+            comment.update(json.loads(r['extra']))
+            if comment['children'] is None:
+                del comment['children']
+        return comment
+
+    def get(self, article_id: str) -> Optional[Dict]:
+        data = self._header(article_id)
+        if data is None:
+            return None
+
+        comments = []
+        by_id = {}
+        rows = self.conn.execute(self._COMMENTS_QUERY + " ORDER BY c.position", (self.collection, article_id))
+        for r in rows:
+            comment = self._comment(r)
+            parent = by_id.get(r['parent_id']) if r['parent_id'] is not None else None
+            if parent is not None:
+                parent['children'].append(comment)
+            else:
+                comments.append(comment)
+            by_id[r['id']] = comment
+        data['comments'] = comments
+        return data
+
+    def iter_article(self, article_id: str) -> Optional[Tuple[Dict, Iterator[Tuple[Dict, int]]]]:
+        """Same as JsonArticleStore.iter_article; comment rows are read ITER_PAGE_SIZE at a time."""
+        updated_at = self.updated_at(article_id)
+        data = self._header(article_id)
+        if data is None:
+            return None
+        return data, self._iter_comments(article_id, updated_at)
+
+    def _iter_comments(self, article_id: str, updated_at) -> Iterator[Tuple[Dict, int]]:
+        # Each page is its own query on the calling thread's connection, so the
+        # iterator may be advanced from different threads (StreamingResponse).
+        depths = {}
+        position = -1
+        while True:
+            rows = self.conn.execute(
+                self._COMMENTS_QUERY + " AND c.position > ? ORDER BY c.position LIMIT ?",
+                (self.collection, article_id, position, ITER_PAGE_SIZE),
+            ).fetchall()
+            if self.updated_at(article_id) != updated_at:
+                raise RuntimeError(f"Article {article_id} was replaced while being read")
+            if not rows:
+                return
+            for r in rows:
+                comment = self._comment(r)
+                comment.pop('children', None)
+                # Rows are in pre-order, so the parent's depth is known
+                depth = depths[r['parent_id']] + 1 if r['parent_id'] in depths else 0
+                depths[r['id']] = depth
+                yield comment, depth
+            position = rows[-1]['position']
+
+    def read_positions(self, article_id: str, positions: List[int]) -> Optional[Tuple[Dict, Dict[int, Dict]]]:
+        """Same as JsonArticleStore.read_positions; only those comment rows are read."""
+        data = self._header(article_id)
+        if data is None:
+            return None
+        found = {}
+        positions = sorted(positions)
+        for start in range(0, len(positions), ITER_PAGE_SIZE):
+            page = positions[start:start + ITER_PAGE_SIZE]
+            rows = self.conn.execute(
+                self._COMMENTS_QUERY + f" AND c.position IN ({', '.join('?' * len(page))})",
+                (self.collection, article_id, *page),
+            )
+            for r in rows:
+                comment = self._comment(r)
+                comment.pop('children', None)
+                found[r['position']] = comment
+        return data, found
+
+    def get_index(self, article_id: str) -> Optional[Dict]:
+        row = self.conn.execute(
+            "SELECT version, data FROM article_indexes WHERE collection = ? AND article_id = ?",
+            (self.collection, article_id),
+        ).fetchone()
+        if row is None:
+            return None
+        index = json.loads(row['data'])
+        index['version'] = row['version']
+        return index
+
+    def save_index(self, article_id: str, index: ArticleIndex):
+        data = index.to_dict()
+        version = data.pop('version')
+        self.conn.execute(
+            "INSERT OR REPLACE INTO article_indexes (collection, article_id, version, data) VALUES (?, ?, ?, ?)",
+            (self.collection, article_id, version, json.dumps(data, ensure_ascii=False, separators=(',', ':'))),
+        )
+
+    def get_raw(self, article_id: str) -> Optional[Tuple[bytes, str]]:
+        """The article in compact form, as JSON, and its sha256; cached per updated_at."""
+        updated_at = self.updated_at(article_id)
+        if updated_at is None:
+            return None
+        key = (article_id, updated_at)
+        with self._raw_cache_guard:
+            raw = self._raw_cache.get(key)
+            if raw is not None:
+                self._raw_cache.move_to_end(key)
+                return raw
+        data = self.get(article_id)
+        if data is None:
+            return None
+        if self.compact:
+            data = compact_article(data)
+        body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        raw = (body, checksum(body))
+        with self._raw_cache_guard:
+            self._raw_cache[key] = raw
+            while len(self._raw_cache) > RAW_CACHE_SIZE:
+                self._raw_cache.popitem(last=False)
+        return raw
+
+    def listing_token(self):
+        row = self.conn.execute(
+            "SELECT COUNT(*), MAX(updated_at) FROM articles WHERE collection = ?", (self.collection,)
+        ).fetchone()
+        return (row[0], row[1])
+
+    def save(self, data: Dict):
+        article_id = str(data['id'])
+        updated_at = time.time()
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "DELETE FROM comments WHERE collection = ? AND article_id = ?", (self.collection, article_id)
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO articles "
+                "(collection, id, title, content, author_id, publish_time, extra, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.collection, article_id,
+                    data.get('title'), data.get('content'),
+                    self._author_id(data.get('author')),
+                    data.get('publish_time'),
+                    _split_extra(data, ARTICLE_COLUMNS, {'id', 'author', 'comments'}),
+                    updated_at,
+                ),
+            )
+
+            rows = []
+            author_ids = {}
+            # Iterative pre-order walk: deep reply chains must not hit the recursion limit.
+            stack = [(c, None) for c in reversed(data.get('comments', []))]
+            while stack:
+                comment, parent_id = stack.pop()
+                # content_text is left NULL: compaction.comment_text() derives it from content.
+                fields = {k: v for k, v in comment.items() if k not in ('children', 'content_text')}
+                if 'children' not in comment:
+                    # Flat comments (knowledge files) have no children list; a null
+                    # marker in `extra` lets get() reproduce that.
+                    fields['children'] = None
+                rows.append((
+                    self.collection, article_id, len(rows), str(comment['id']), parent_id,
+                    self._author_id(comment.get('author'), comment.get('author_avatar'), author_ids),
+                    *(fields.get(col) for col in COMMENT_COLUMNS),
+                    _split_extra(fields, COMMENT_COLUMNS, {'id', 'author', 'author_avatar'}),
+                ))
+                for child in reversed(comment.get('children', [])):
+                    stack.append((child, str(comment['id'])))
+
+            conn.executemany(
+                "INSERT INTO comments (collection, article_id, position, id, parent_id, author_id, "
+                + ", ".join(COMMENT_COLUMNS) + ", extra) VALUES ("
+                + ", ".join("?" * (7 + len(COMMENT_COLUMNS))) + ")",
+                rows,
+            )
+            self.save_index(article_id, ArticleIndex.build(data.get('comments', []), updated_at))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, article_id: str):
+        # Comments go with it via ON DELETE CASCADE.
+        self.conn.execute(
+            "DELETE FROM articles WHERE collection = ? AND id = ?", (self.collection, article_id)
+        )
+
+    def list_ids(self) -> List[str]:
+        rows = self.conn.execute("SELECT id FROM articles WHERE collection = ?", (self.collection,))
+        return [r['id'] for r in rows]
+
+    def list_articles(self) -> List[Dict]:
+        rows = self.conn.execute(
+            # `version` is not a column; it rides along in `extra` like other article fields
+            "SELECT id, title, COALESCE(json_extract(extra, '$.version'), 0) AS version, updated_at "
+            "FROM articles WHERE collection = ? ORDER BY updated_at DESC",
+            (self.collection,),
+        )
+        return [{'id': r['id'], 'title': r['title'], 'version': r['version'], 'updated_at': r['updated_at']}
+                for r in rows]
+
+
+_stores = {}
+_stores_guard = threading.Lock()
+
+
+def get_store(collection: str, directory: Optional[str] = None):
+    """
+    Return the article store for `collection` ("cache", "public" or
+    "knowledge/<user>"). The backend is chosen with ARTICLE_STORE=json|sqlite
+    (default json); `directory` overrides the JSON location. Static
+    collections are always JSON files: the Pages site and the update
+    workflow read and commit them from disk.
+    """
+    backend = os.environ.get("ARTICLE_STORE", "json").lower()
+    if collection in STATIC_COLLECTIONS:
+        backend = "json"
+    key = (backend, collection, directory)
+    with _stores_guard:
+        store = _stores.get(key)
+        if store is None:
+            if backend == "sqlite":
+                store = SqliteArticleStore(collection)
+            elif backend == "json":
+                store = JsonArticleStore(collection, directory)
+            else:
+                raise ValueError(f"Unknown ARTICLE_STORE backend: {backend}")
+            _stores[key] = store
+        return store
@@ -0,0 +1,62 @@
+import time
+import random
+import argparse
+from datetime import datetime
+from meta_parser import parse_meta_batch, _parse_absolute, _day_start
+
+LOCATIONS = ["北京", "上海", "广东", "浙江", "江苏", "山东", "河北", "湖南", "四川", "福建", "移动", "海外"]
+PAGE_SIZE = 50
+
+
+def make_pages(n, seed=0):
+    """Comment meta lines of n comments: a thread's worth of minutes, ~3% edited."""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1).timestamp()
+    texts = []
+    for i in range(n):
+        stamp = datetime.fromtimestamp(start + i * rng.randint(30, 600)).strftime("%Y-%m-%d %H:%M")
+        edited = "修改" if rng.random() < 0.03 else ""
+        texts.append(f"{stamp}{edited} 来自{rng.choice(LOCATIONS)}")
+    return [texts[i:i + PAGE_SIZE] for i in range(0, n, PAGE_SIZE)]
+
+
+def legacy_parse(time_loc):
+    """The previous per-comment path in extract_comment_data (minus its print on failure)."""
+    parts = time_loc.split(' 来自')
+    publish_time = parts[0]
+    location = parts[1] if len(parts) > 1 else ""
+    try:
+        clean_time_str = publish_time.replace("修改", "").strip()
+        timestamp = datetime.strptime(clean_time_str, "%Y-%m-%d %H:%M").timestamp()
+    except ValueError:
+        timestamp = 0
+    return publish_time, timestamp, location
+
+
+def run(label, fn, pages):
+    start = time.perf_counter()
+    count = sum(len(fn(page)) for page in pages)
+    elapsed = time.perf_counter() - start
+    print(f"{label:>12} {count:>8} comments {elapsed * 1000:9.1f} ms  {elapsed / count * 1e6:6.2f} us/comment")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark comment meta parsing (time, location, edit marker).')
+    parser.add_argument('--sizes', default="1000,10000,100000", help='Comma-separated comment counts')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print("legacy:      split + replace + datetime.strptime per comment")
+    print("batch cold:  meta_parser.parse_meta_batch per page, empty caches")
+    print("batch warm:  same pages again, as on a re-scrape or update run (up to CACHE_SIZE strings)")
+    for n in [int(x) for x in args.sizes.split(",")]:
+        pages = make_pages(n, args.seed)
+        run("legacy", lambda page: [legacy_parse(t) for t in page], pages)
+        _parse_absolute.cache_clear()
+        _day_start.cache_clear()
+        run("batch cold", parse_meta_batch, pages)
+        run("batch warm", parse_meta_batch, pages)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import time
+import random
+import argparse
+from scraper import build_comment_tree
+from quote_index import normalize, shingles, containment, MIN_QUOTE_SCORE
+
+# Common characters so that unrelated comments still share plenty of shingles,
+# like real threads do.
+CHARS = "的一是了我不人在他有这个上们来到时大地为子中你说生国年着就那和要她出也得里后自以会家可下而过天去能对小多然于心学么之都好看起发当没成只如事把还用第样道想作种开美总从无情己面最女但现前些所同日手又行意动方期它头经长儿回位分爱老因很给名法间斯知世什两次使身者被高已亲其进此话常与活正感"
+AUTHORS = [f"user{i}" for i in range(300)]
+
+
+def make_thread(n, seed=0):
+    """Synthetic thread: ~40% of replies quote an earlier comment, mangled like jisilu quotes."""
+    rng = random.Random(seed)
+    comments, expected = [], {}
+    for i in range(n):
+        text = "".join(rng.choice(CHARS) for _ in range(rng.randint(20, 160)))
+        comment = {
+            "id": str(i), "author": rng.choice(AUTHORS), "content_text": text,
+            "quoted_text": None, "reply_to_user": None, "timestamp": i, "children": [],
+        }
+        if i > 0 and rng.random() < 0.4:
+            target = comments[rng.randrange(len(comments))]
+            src = target["content_text"]
+            quote = src[:rng.randint(15, max(15, len(src)))]   # truncated
+            if rng.random() < 0.3:
+                quote = " ".join(quote[j:j + 7] for j in range(0, len(quote), 7))  # whitespace changes
+            if rng.random() < 0.3:
+                pos = rng.randrange(len(quote))
+                quote = quote[:pos] + rng.choice(CHARS) + quote[pos + 1:]   # light edit
+            comment["quoted_text"] = quote
+            if rng.random() < 0.5:
+                comment["reply_to_user"] = target["author"]
+            expected[comment["id"]] = target["id"]
+        comments.append(comment)
+    return comments, expected
+
+
+def naive_build(comments):
+    """The old resolution: exact `quoted_text[:50]` substring, scanning every predecessor."""
+    tree, processed = [], []
+    for comment in comments:
+        parent = None
+        quote = comment.get("quoted_text")
+        if quote:
+            quote = quote[:50]
+            for prev in reversed(processed):
+                if quote in prev["content_text"]:
+                    parent = prev
+                    break
+        (parent["children"] if parent else tree).append(comment)
+        processed.append(comment)
+    return tree
+
+
+def scan_build(comments):
+    """Fuzzy matching without an index: score the quote against every predecessor."""
+    tree, processed = [], []
+    for comment in comments:
+        parent, best = None, MIN_QUOTE_SCORE
+        if comment.get("quoted_text"):
+            quote_shingles = shingles(normalize(comment["quoted_text"]))
+            for prev in reversed(processed):
+                score = containment(quote_shingles, prev["_text"])
+                if score > best:
+                    parent, best = prev, score
+        (parent["children"] if parent else tree).append(comment)
+        comment["_text"] = normalize(comment["content_text"])
+        processed.append(comment)
+    return tree
+
+
+def accuracy(comments, expected):
+    parents = {}
+    for c in comments:
+        for child in c["children"]:
+            parents[child["id"]] = c["id"]
+    resolved = sum(1 for cid, pid in expected.items() if parents.get(cid) == pid)
+    return resolved / max(1, len(expected))
+
+
+def run(label, build, n, seed):
+    comments, expected = make_thread(n, seed)
+    start = time.perf_counter()
+    build(comments)
+    elapsed = time.perf_counter() - start
+    print(f"{label:>6} n={n:<6} {elapsed * 1000:9.1f} ms   quoting replies resolved to their source: "
+          f"{accuracy(comments, expected):6.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark quote resolution in build_comment_tree.')
+    parser.add_argument('--sizes', default="1000,5000,10000", help='Comma-separated thread sizes')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scan-max', type=int, default=2000,
+                        help='Largest size to run the quadratic fuzzy scan on')
+    args = parser.parse_args()
+
+    print("index: build_comment_tree with QuoteIndex")
+    print("naive: previous exact quoted_text[:50] substring scan")
+    print("scan:  same fuzzy scoring as the index, but against every predecessor")
+    for n in [int(x) for x in args.sizes.split(",")]:
+        run("index", build_comment_tree, n, args.seed)
+        run("naive", naive_build, n, args.seed)
+        if n <= args.scan_max:
+            run("scan", scan_build, n, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import os
+import json
+import hashlib
+from typing import Dict, Optional
+from storage import atomic_write_bytes, atomic_write_json, read_json, ensure_dir, key_lock
+
+# Top-level comments shipped in the first-screen chunk
+FIRST_SCREEN_COMMENTS = 10
+# Top-level comments per follow-up page chunk
+PAGE_SIZE = 50
+# Reply subtrees larger than this are moved to their own lazily loaded chunk
+SUBTREE_INLINE_LIMIT = 8
+
+# Only what the frontend renders; matching fields (quoted_text, timestamp, ...) stay server-side.
+ARTICLE_FIELDS = ("id", "title", "content", "author", "publish_time")
+# `author` is written as an index into the head chunk's `authors` list
+COMMENT_FIELDS = ("id", "content", "time", "location", "reply_to_user")
+
+MANIFEST_NAME = "manifest.json"
+
+
+def bundle_dir(data_dir: str, article_id: str) -> str:
+    return os.path.join(data_dir, "bundles", str(article_id))
+
+
+def _subtree_size(comment: Dict) -> int:
+    size = 0
+    stack = [comment]
+    while stack:
+        node = stack.pop()
+        size += 1
+        stack.extend(node.get('children', []))
+    return size
+
+
+class _ChunkWriter:
+    """Writes minified, content-addressed chunks into one directory (Pages compresses them itself)."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.files = []
+        # {name, avatar} entries shared by every chunk of the article, as in compaction.compact_article
+        self.authors = []
+        self._author_index = {}
+
+    def author_index(self, comment: Dict) -> int:
+        key = (comment.get('author') or "", comment.get('author_avatar') or "")
+        if key not in self._author_index:
+            self._author_index[key] = len(self.authors)
+            author = {'name': key[0]}
+            if key[1]:
+                author['avatar'] = key[1]
+            self.authors.append(author)
+        return self._author_index[key]
+
+    def emit(self, obj) -> str:
+        raw = json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        name = f"{hashlib.sha256(raw).hexdigest()[:16]}.json"
+        path = os.path.join(self.directory, name)
+        # Same name means same content, so an existing chunk can be reused as-is.
+        if not os.path.exists(path):
+            atomic_write_bytes(path, raw, with_checksum=False)
+        self.files.append(name)
+        return name
+
+    def pack_comment(self, comment: Dict) -> Dict:
+        packed = {k: comment[k] for k in COMMENT_FIELDS if comment.get(k)}
+        packed['author'] = self.author_index(comment)
+        children = comment.get('children', [])
+        if not children:
+            return packed
+        if _subtree_size(comment) > SUBTREE_INLINE_LIMIT:
+            packed['children_chunk'] = self.emit([self.pack_comment(c) for c in children])
+            packed['children_count'] = len(children)
+        else:
+            packed['children'] = [self.pack_comment(c) for c in children]
+        return packed
+
+
+def write_bundle(data: Dict, data_dir: str) -> Dict:
+    """
+    Split an article into content-hashed chunks under data/bundles/<id>/:
+    a small first-screen head (article + first top-level comments), a chain
+    of follow-up pages, and separate chunks for large reply subtrees.
+    Comments name their author by index into the head's `authors` list.
+    Returns the manifest, whose `head` is referenced from index.json.
+    """
+    article_id = str(data['id'])
+    directory = bundle_dir(data_dir, article_id)
+    ensure_dir(directory)
+
+    with key_lock(f"bundle:{article_id}"):
+        writer = _ChunkWriter(directory)
+        comments = data.get('comments', [])
+
+        # Pages are chained head -> page 1 -> page 2 ..., so build them back to front.
+        next_chunk = None
+        for start in reversed(range(FIRST_SCREEN_COMMENTS, len(comments), PAGE_SIZE)):
+            page = {'comments': [writer.pack_comment(c) for c in comments[start:start + PAGE_SIZE]]}
+            if next_chunk:
+                page['next'] = next_chunk
+            next_chunk = writer.emit(page)
+
+        head = {k: data[k] for k in ARTICLE_FIELDS if k in data}
+        head['comment_count'] = len(comments)
+        head['comments'] = [writer.pack_comment(c) for c in comments[:FIRST_SCREEN_COMMENTS]]
+        # Complete by now: later chunks were packed first
+        head['authors'] = writer.authors
+        if next_chunk:
+            head['next'] = next_chunk
+        head_name = writer.emit(head)
+
+        manifest_path = os.path.join(directory, MANIFEST_NAME)
+        previous = load_manifest(data_dir, article_id) or {}
+        manifest = {'head': head_name, 'files': sorted(set(writer.files))}
+        atomic_write_json(manifest_path, manifest, with_checksum=False, indent=None)
+
+        # Keep the previous generation so clients holding an older index.json
+        # can still finish loading; anything older is removed.
+        _prune(directory, set(manifest['files']) | set(previous.get('files', [])))
+
+    return manifest
+
+
+def _prune(directory: str, keep):
+    for filename in os.listdir(directory):
+        if filename == MANIFEST_NAME or filename.startswith('.'):
+            continue
+        # Anything not in the manifest, including .gz/.br twins of older versions
+        if filename not in keep:
+            os.remove(os.path.join(directory, filename))
+
+
+def load_manifest(data_dir: str, article_id: str) -> Optional[Dict]:
+    path = os.path.join(bundle_dir(data_dir, article_id), MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        return read_json(path)
+    except ValueError as e:
+        print(f"Ignoring unreadable bundle manifest {path}: {e}")
+        return None
+
+
+def head_path(manifest: Dict, article_id: str) -> str:
+    """Path of the head chunk relative to the data directory, as stored in index.json."""
+    return f"bundles/{article_id}/{manifest['head']}"
+
@@ -0,0 +1,67 @@
+import os
+import sys
+import argparse
+import subprocess
+
+# Module -> import budget in milliseconds (cumulative, best of --runs).
+# main.py is dominated by FastAPI/pydantic; the CLIs should be near-instant.
+BUDGETS = {
+    "main": 600,
+    "update_data": 150,
+    "scrape_user": 150,
+    "extract_by_author": 100,
+    "export": 100,
+    "snapshot": 100,
+}
+# Parsing, HTTP, imaging and analytics stacks: only loaded once a scrape,
+# download or table build actually happens.
+HEAVY = ("requests", "bs4", "lxml", "numpy", "PIL", "uvicorn")
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def measure(module: str):
+    """(cumulative import time in ms, top-level packages imported) for a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    total, loaded = None, set()
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        loaded.add(name.split(".")[0])
+        if name == module:
+            total = int(cumulative) / 1000
+    return total, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that backend modules import fast and without heavy stacks.')
+    parser.add_argument('modules', nargs='*', help=f'Modules to check (default: {", ".join(BUDGETS)})')
+    parser.add_argument('--runs', type=int, default=3, help='Imports per module; the fastest counts')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiply every budget (slow CI machines)')
+    args = parser.parse_args()
+
+    failures = 0
+    for module in args.modules or BUDGETS:
+        best, loaded = None, set()
+        for _ in range(max(1, args.runs)):
+            total, loaded = measure(module)
+            best = total if best is None else min(best, total)
+        budget = BUDGETS.get(module, 100) * args.scale
+        heavy = sorted(set(HEAVY) & loaded)
+        ok = best <= budget and not heavy
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {module:<18} {best:7.1f} ms (budget {budget:.0f} ms)"
+              + (f", imports {', '.join(heavy)}" if heavy else ""))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
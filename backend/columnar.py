@@ -0,0 +1,289 @@
+import io
+import os
+import re
+import html
+import json
+import argparse
+from typing import Dict, List, Optional
+from storage import BACKEND_DIR, atomic_write_bytes, atomic_write_json, read_json, ensure_dir, key_lock, remove
+from meta_parser import parse_meta_batch
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# One .npz partition per article plus manifest.json, and manifest.log for
+# the entries changed since manifest.json was last written
+TABLE_DIR = os.path.join(BACKEND_DIR, "analytics")
+MANIFEST_NAME = "manifest.json"
+MANIFEST_LOG_NAME = "manifest.log"
+# manifest.log is folded into manifest.json once it grows past this
+MANIFEST_LOG_LIMIT = 256 * 1024
+
+# Columns of every partition. author/location/collection are int32 codes into
+# the partition's own dictionaries (authors, locations); load_table() merges
+# those into table-wide ones.
+COLUMNS = ("article_id", "comment_id", "parent_id", "author", "timestamp", "location", "text_length")
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_NUMBER_RE = re.compile(r'(\d+)$')
+
+
+def _numeric_id(value) -> int:
+    # Comment ids are numeric on jisilu; knowledge files keep the "answer_list_" prefix.
+    match = _NUMBER_RE.search(str(value or ""))
+    return int(match.group(1)) if match else -1
+
+
+def _text_length(comment: Dict) -> int:
+    """Length of the comment's own text, without markup or the quoted part."""
+    content = comment.get('content') or ""
+    if 'content_text' not in comment and '<' not in content and content.startswith('> '):
+        # Knowledge files: "> quote\n\nreply"
+        content = content.split('\n\n', 1)[1] if '\n\n' in content else ""
+    return len(html.unescape(_TAG_RE.sub('', content)).strip())
+
+
+def flatten_article(data: Dict, default_author: str = "") -> Dict[str, List]:
+    """Row-wise lists for COLUMNS (author/location as strings) of one expanded article."""
+    rows = {name: [] for name in COLUMNS}
+    article_id = _numeric_id(data.get('id'))
+    comments = []
+    # Iterative so long reply chains don't hit the recursion limit.
+    stack = [(c, -1) for c in reversed(data.get('comments', []))]
+    while stack:
+        comment, parent_id = stack.pop()
+        comment_id = _numeric_id(comment.get('id'))
+        comments.append(comment)
+        rows['article_id'].append(article_id)
+        rows['comment_id'].append(comment_id)
+        rows['parent_id'].append(parent_id)
+        rows['author'].append(comment.get('author') or default_author)
+        rows['text_length'].append(_text_length(comment))
+        stack.extend((c, comment_id) for c in reversed(comment.get('children') or []))
+
+    # Re-parse the shown time rather than trusting `timestamp`: older copies
+    # stored the Beijing wall-clock read in the scraping host's zone. Knowledge
+    # files only have the "... 来自XX" string.
+    for comment, meta in zip(comments, parse_meta_batch(c.get('time') or "" for c in comments)):
+        timestamp = meta.timestamp or comment.get('timestamp')
+        rows['timestamp'].append(float(timestamp) if timestamp else float('nan'))
+        location = comment.get('location')
+        rows['location'].append(meta.location if location is None else location)
+    return rows
+
+
+def _encode(values: List[str]):
+    """Dictionary-encode strings: (sorted unique values, int32 codes)."""
+    dictionary, codes = np.unique(np.array(values, dtype=str), return_inverse=True)
+    return dictionary, codes.astype(np.int32)
+
+
+def _part_name(collection: str, article_id: str) -> str:
+    return f"{collection.replace('/', '__')}__{article_id}.npz"
+
+
+class ColumnarStore:
+    """
+    Comments of every stored article as columnar NumPy partitions, one per
+    article, so re-ingesting an article only rewrites its own partition.
+    The manifest maps "<collection>/<id>" to {file, rows, version}, where
+    version is the article store's updated_at for the ingested copy. An
+    ingest appends its one entry to manifest.log (a null entry removes the
+    key); the log is replayed over manifest.json and folded into it every
+    MANIFEST_LOG_LIMIT bytes, so a save never rewrites the whole manifest.
+    """
+
+    def __init__(self, directory: str = TABLE_DIR):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+        self.log_path = os.path.join(directory, MANIFEST_LOG_NAME)
+
+    def load_manifest(self) -> Dict[str, Dict]:
+        manifest = read_json(self.manifest_path) if os.path.exists(self.manifest_path) else {}
+        try:
+            with open(self.log_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        key, entry = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by a crash
+                    if entry is None:
+                        manifest.pop(key, None)
+                    else:
+                        manifest[key] = entry
+        except FileNotFoundError:
+            pass
+        return manifest
+
+    def _write_partition(self, collection: str, data: Dict) -> Dict:
+        default_author = collection.split('/', 1)[1] if collection.startswith('knowledge/') else ""
+        rows = flatten_article(data, default_author)
+        authors, author_codes = _encode(rows['author'])
+        locations, location_codes = _encode(rows['location'])
+        name = _part_name(collection, data['id'])
+
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            article_id=np.array(rows['article_id'], dtype=np.int64),
+            comment_id=np.array(rows['comment_id'], dtype=np.int64),
+            parent_id=np.array(rows['parent_id'], dtype=np.int64),
+            author=author_codes,
+            timestamp=np.array(rows['timestamp'], dtype=np.float64),
+            location=location_codes,
+            text_length=np.array(rows['text_length'], dtype=np.int32),
+            authors=authors,
+            locations=locations,
+        )
+        atomic_write_bytes(os.path.join(self.directory, "parts", name), buffer.getvalue(), with_checksum=False)
+        return {'file': name, 'rows': len(rows['comment_id'])}
+
+    def _update_manifest(self, changes: Dict[str, Optional[Dict]]):
+        with key_lock("columnar:manifest"):
+            removed = [key for key, entry in changes.items() if entry is None]
+            old = self.load_manifest() if removed else {}
+            lines = "".join(json.dumps([key, entry], ensure_ascii=False) + "\n" for key, entry in changes.items())
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            for key in removed:
+                if key in old:
+                    remove(os.path.join(self.directory, "parts", old[key]['file']))
+            if os.path.getsize(self.log_path) > MANIFEST_LOG_LIMIT:
+                self._fold_log()
+
+    def _fold_log(self):
+        # Replaying the log again over the new manifest.json is harmless, so a
+        # crash between the two steps loses nothing.
+        atomic_write_json(self.manifest_path, self.load_manifest(), with_checksum=False, indent=None)
+        remove(self.log_path)
+
+    def append(self, collection: str, data: Dict, version=None):
+        """(Re)write one article's partition; the ingest hook."""
+        ensure_dir(os.path.join(self.directory, "parts"))
+        entry = self._write_partition(collection, data)
+        entry['version'] = version
+        self._update_manifest({f"{collection}/{data['id']}": entry})
+
+    def sync(self, collections: List[str]) -> int:
+        """Bring the table in line with the article stores; returns partitions rewritten."""
+        from article_store import get_store
+
+        ensure_dir(os.path.join(self.directory, "parts"))
+        manifest = self.load_manifest()
+        changes, seen = {}, set()
+        for collection in collections:
+            store = get_store(collection)
+            for article_id in store.list_ids():
+                key = f"{collection}/{article_id}"
+                seen.add(key)
+                version = store.updated_at(article_id)
+                if key in manifest and manifest[key].get('version') == version:
+                    continue
+                data = store.get(article_id)
+                if data is None:
+                    continue
+                data.setdefault('id', article_id)
+                entry = self._write_partition(collection, data)
+                entry['version'] = version
+                changes[key] = entry
+        # Articles deleted from a synced collection
+        for key in manifest:
+            if key.rsplit('/', 1)[0] in collections and key not in seen:
+                changes[key] = None
+        if changes:
+            self._update_manifest(changes)
+        return sum(1 for entry in changes.values() if entry is not None)
+
+
+class CommentTable:
+    """All partitions concatenated; author/location/collection are codes into the matching arrays."""
+
+    def __init__(self, columns: Dict, authors, locations, collections):
+        self.columns = columns
+        self.authors = authors
+        self.locations = locations
+        self.collections = collections
+
+    def __len__(self):
+        return len(self.columns['comment_id'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+
+def load_table(directory: str = TABLE_DIR, collections: Optional[List[str]] = None) -> CommentTable:
+    """Load and merge partitions (optionally only some collections) into one CommentTable."""
+    if np is None:
+        raise RuntimeError("numpy is required for the columnar comment table (pip install numpy)")
+    store = ColumnarStore(directory)
+    manifest = store.load_manifest()
+    keys = sorted(k for k in manifest if collections is None or k.rsplit('/', 1)[0] in collections)
+
+    parts, collection_names = [], sorted({k.rsplit('/', 1)[0] for k in keys})
+    for key in keys:
+        with np.load(os.path.join(directory, "parts", manifest[key]['file'])) as part:
+            parts.append((key.rsplit('/', 1)[0], {name: part[name] for name in part.files}))
+
+    if not parts:
+        empty = {name: np.array([], dtype=np.int32) for name in COLUMNS}
+        empty['collection'] = np.array([], dtype=np.int32)
+        return CommentTable(empty, np.array([], dtype=str), np.array([], dtype=str), np.array(collection_names))
+
+    # Merge the per-partition dictionaries, then remap each partition's codes.
+    authors, author_map = np.unique(np.concatenate([p['authors'] for _, p in parts]), return_inverse=True)
+    locations, location_map = np.unique(np.concatenate([p['locations'] for _, p in parts]), return_inverse=True)
+    columns = {name: [] for name in COLUMNS}
+    columns['collection'] = []
+    author_offset = location_offset = 0
+    for collection, part in parts:
+        n_authors, n_locations = len(part['authors']), len(part['locations'])
+        for name in ("article_id", "comment_id", "parent_id", "timestamp", "text_length"):
+            columns[name].append(part[name])
+        columns['author'].append(author_map[author_offset:author_offset + n_authors][part['author']])
+        columns['location'].append(location_map[location_offset:location_offset + n_locations][part['location']])
+        columns['collection'].append(
+            np.full(len(part['comment_id']), collection_names.index(collection), dtype=np.int32)
+        )
+        author_offset += n_authors
+        location_offset += n_locations
+
+    merged = {name: np.concatenate(values) for name, values in columns.items()}
+    merged['author'] = merged['author'].astype(np.int32)
+    merged['location'] = merged['location'].astype(np.int32)
+    return CommentTable(merged, authors, locations, np.array(collection_names))
+
+
+_default = ColumnarStore()
+
+
+def ingest(collection: str, data: Dict, version=None):
+    """Ingest hook for the scrapers: skipped quietly without numpy, never fails the caller."""
+    if np is None:
+        return
+    try:
+        _default.append(collection, data, version)
+    except Exception as e:
+        print(f"Columnar ingest failed for {collection}/{data.get('id')}: {e}")
+
+
+def main():
+    from article_store import discover_collections
+
+    parser = argparse.ArgumentParser(description='Maintain the columnar comment table used by comment_query.py.')
+    parser.add_argument('--collection', '-c', action='append', help='Only these collections (repeatable)')
+    parser.add_argument('--dir', default=TABLE_DIR, help='Table directory')
+    args = parser.parse_args()
+    if np is None:
+        parser.error("numpy is required (pip install numpy)")
+
+    collections = args.collection or discover_collections()
+    written = ColumnarStore(args.dir).sync(collections)
+    print(f"Synced {', '.join(collections)}: {written} partitions written to {args.dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import argparse
+from typing import List, Optional, Tuple
+from columnar import np, load_table, CommentTable, ColumnarStore, TABLE_DIR
+
+# Buckets follow Beijing time, like the times shown on jisilu
+UTC_OFFSET = 8 * 3600
+
+FREQUENCIES = ("hour", "weekday", "day", "month")
+
+
+def _top(counts, names, limit: int) -> List[Tuple[str, int]]:
+    order = np.argsort(counts, kind="stable")[::-1][:limit]
+    return [(str(names[i]), int(counts[i])) for i in order if counts[i] > 0]
+
+
+def filter_table(table: CommentTable, author: Optional[str] = None, since: Optional[float] = None,
+                 until: Optional[float] = None):
+    """Boolean row mask for the given author and [since, until) epoch range."""
+    mask = np.ones(len(table), dtype=bool)
+    if author is not None:
+        code = np.searchsorted(table.authors, author)
+        if code >= len(table.authors) or table.authors[code] != author:
+            return np.zeros(len(table), dtype=bool)
+        mask &= table['author'] == code
+    if since is not None:
+        mask &= table['timestamp'] >= since
+    if until is not None:
+        mask &= table['timestamp'] < until
+    return mask
+
+
+def author_counts(table: CommentTable, mask=None, limit: int = 20) -> List[Tuple[str, int]]:
+    codes = table['author'] if mask is None else table['author'][mask]
+    return _top(np.bincount(codes, minlength=len(table.authors)), table.authors, limit)
+
+
+def location_counts(table: CommentTable, mask=None, limit: int = 20) -> List[Tuple[str, int]]:
+    codes = table['location'] if mask is None else table['location'][mask]
+    return _top(np.bincount(codes, minlength=len(table.locations)), table.locations, limit)
+
+
+def article_counts(table: CommentTable, mask=None, limit: int = 20) -> List[Tuple[str, int]]:
+    ids = table['article_id'] if mask is None else table['article_id'][mask]
+    unique, counts = np.unique(ids, return_counts=True)
+    return _top(counts, unique, limit)
+
+
+def activity(table: CommentTable, freq: str = "month", mask=None) -> List[Tuple[str, int]]:
+    """Comment counts per hour of day, weekday, day or month (Beijing time); undated comments are skipped."""
+    timestamps = table['timestamp'] if mask is None else table['timestamp'][mask]
+    timestamps = timestamps[~np.isnan(timestamps)]
+    local = (timestamps + UTC_OFFSET).astype(np.int64)
+    if freq == "hour":
+        counts = np.bincount((local // 3600) % 24, minlength=24)
+        return [(f"{h:02d}:00", int(c)) for h, c in enumerate(counts)]
+    if freq == "weekday":
+        # 1970-01-01 was a Thursday
+        counts = np.bincount((local // 86400 + 3) % 7, minlength=7)
+        return [(name, int(c)) for name, c in zip(("周一", "周二", "周三", "周四", "周五", "周六", "周日"), counts)]
+    unit = "D" if freq == "day" else "M"
+    buckets = local.astype("datetime64[s]").astype(f"datetime64[{unit}]")
+    unique, counts = np.unique(buckets, return_counts=True)
+    return [(str(b), int(c)) for b, c in zip(unique, counts)]
+
+
+def text_length_stats(table: CommentTable, mask=None) -> dict:
+    lengths = table['text_length'] if mask is None else table['text_length'][mask]
+    if len(lengths) == 0:
+        return {"comments": 0}
+    p50, p90, p99 = np.percentile(lengths, [50, 90, 99])
+    return {
+        "comments": int(len(lengths)),
+        "mean": round(float(lengths.mean()), 1),
+        "p50": int(p50), "p90": int(p90), "p99": int(p99),
+        "max": int(lengths.max()),
+    }
+
+
+def _print_rows(title: str, rows):
+    print(f"\n{title}")
+    width = max((len(name) for name, _ in rows), default=0)
+    for name, count in rows:
+        print(f"  {name:<{width}}  {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vectorized statistics over the columnar comment table.')
+    parser.add_argument('--collection', '-c', action='append', help='Only these collections (repeatable)')
+    parser.add_argument('--author', '-a', help='Only comments by this author')
+    parser.add_argument('--top', '-n', type=int, default=20, help='Rows per ranking')
+    parser.add_argument('--freq', choices=FREQUENCIES, default='month', help='Activity bucket')
+    parser.add_argument('--sync', action='store_true', help='Sync the table with the article stores first')
+    parser.add_argument('--dir', default=TABLE_DIR, help='Table directory')
+    args = parser.parse_args()
+    if np is None:
+        parser.error("numpy is required (pip install numpy)")
+
+    if args.sync:
+        from article_store import discover_collections
+        ColumnarStore(args.dir).sync(args.collection or discover_collections())
+
+    table = load_table(args.dir, args.collection)
+    mask = filter_table(table, author=args.author) if args.author else None
+    print(f"{len(table)} comments in {len(np.unique(table['article_id']))} articles "
+          f"({', '.join(map(str, table.collections)) or 'empty table, run columnar.py'})")
+    print(f"Text length: {text_length_stats(table, mask)}")
+    if not args.author:
+        _print_rows("Top authors", author_counts(table, limit=args.top))
+    _print_rows("Top locations", location_counts(table, mask, args.top))
+    _print_rows("Most commented articles", article_counts(table, mask, args.top))
+    _print_rows(f"Activity by {args.freq}", activity(table, args.freq, mask))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import re
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+from lazy import lazy_import
+
+bs4 = lazy_import("bs4")
+
+BASE_URL = "https://www.jisilu.cn"
+
+# Everything else is unwrapped (text kept) or, for DROP_TAGS, removed with its content.
+ALLOWED_TAGS = {
+    "p", "br", "hr", "a", "img", "b", "strong", "i", "em", "u", "s", "del", "sub", "sup",
+    "blockquote", "ul", "ol", "li", "pre", "code", "h1", "h2", "h3", "h4", "h5", "h6",
+    "table", "thead", "tbody", "tr", "th", "td",
+}
+DROP_TAGS = {"script", "style", "iframe", "video", "object", "embed", "form", "input", "button", "noscript"}
+ALLOWED_ATTRS = {
+    "a": {"href", "target"},
+    "img": {"src", "alt"},
+    "th": {"colspan", "rowspan"},
+    "td": {"colspan", "rowspan"},
+}
+URL_ATTRS = {"href", "src"}
+# Elements that still mean something without text inside
+VOID_TAGS = {"br", "hr", "img"}
+# Kept even when empty: dropping a cell or row shifts the rest of the table
+STRUCTURAL_TAGS = {"table", "thead", "tbody", "tr", "th", "td"}
+# Content that keeps its wrapper (e.g. an image link) from counting as empty
+MEDIA_TAGS = ["img", "hr"]
+
+_WS_RE = re.compile(r'\s+')
+_TAG_RE = re.compile(r'<[^>]+>')
+
+
+def _safe_url(url: str) -> Optional[str]:
+    url = url.strip()
+    if url.lower().startswith(("javascript:", "data:", "vbscript:")):
+        return None
+    # Content is rendered off-site, so site-relative links must become absolute.
+    return urljoin(BASE_URL + "/", url)
+
+
+def sanitize_html(content) -> str:
+    """
+    Reduce comment/article HTML (a string or a bs4 Tag, which is modified in
+    place) to ALLOWED_TAGS/ALLOWED_ATTRS, drop empty wrappers and collapse
+    whitespace. The outer container is unwrapped; the result is inner HTML.
+    """
+    if content is None:
+        return ""
+    if isinstance(content, str):
+        if not content.strip():
+            return ""
+        root = bs4.BeautifulSoup(content, "lxml")
+        root = root.body or root
+    else:
+        root = content
+
+    for node in root.find_all(string=lambda s: isinstance(s, bs4.Comment)):
+        node.extract()
+    for tag in root.find_all(DROP_TAGS):
+        tag.decompose()
+
+    # Deepest first, so unwrapping a parent never revisits its children
+    for tag in reversed(root.find_all(True)):
+        if tag.name not in ALLOWED_TAGS:
+            tag.unwrap()
+            continue
+        allowed = ALLOWED_ATTRS.get(tag.name, set())
+        for attr in list(tag.attrs):
+            if attr not in allowed:
+                del tag[attr]
+            elif attr in URL_ATTRS:
+                url = _safe_url(tag[attr])
+                if url is None:
+                    del tag[attr]
+                else:
+                    tag[attr] = url
+        if tag.get("target") is not None:
+            if tag["target"] != "_blank":
+                del tag["target"]
+            else:
+                tag["rel"] = "noopener noreferrer"
+        if tag.name == "img" and not tag.get("src"):
+            tag.decompose()  # unsafe source removed above; nothing left to show
+        elif (tag.name not in VOID_TAGS and tag.name not in STRUCTURAL_TAGS
+              and not tag.get_text(strip=True) and not tag.find(MEDIA_TAGS)):
+            tag.decompose()
+
+    for node in root.find_all(string=True):
+        if isinstance(node, bs4.NavigableString) and not node.find_parent("pre"):
+            node.replace_with(_WS_RE.sub(" ", str(node)))
+
+    return "".join(str(child) for child in root.contents).strip()
+
+
+def html_to_text(html: str) -> str:
+    if not html:
+        return ""
+    try:
+        return bs4.BeautifulSoup(html, "lxml").get_text(strip=True)
+    except ImportError:
+        return _WS_RE.sub(" ", _TAG_RE.sub("", html)).strip()
+
+
+def comment_text(comment: Dict) -> str:
+    """
+    Plain text of a comment, quote included. The comment's own part is its
+    `content_text` (what quote matching indexes), derived from the HTML for
+    comments stored without it.
+    """
+    own = comment.get("content_text")
+    if own is None:
+        own = html_to_text(comment.get("content", ""))
+    return (comment.get("quoted_text") or "") + own
+
+
+def drop_derived_text(comments: List[Dict]):
+    """Remove `content_text` (recomputable via comment_text) from a comment tree in place."""
+    stack = list(comments)
+    while stack:
+        comment = stack.pop()
+        comment.pop("content_text", None)
+        stack.extend(comment.get("children") or [])
+
+
+def compact_article(data: Dict) -> Dict:
+    """
+    Storage form of an article: comments refer to their author by index into
+    a per-article `authors` list of {name, avatar}, instead of repeating the
+    name and avatar URL on every comment; `content_text` is dropped.
+    Returns a new dict; the comment dicts are copied, not modified.
+    """
+    if "authors" in data:
+        return data  # already compact
+    authors, index = [], {}
+
+    def pack(comment):
+        packed = {k: v for k, v in comment.items() if k not in ("children", "author_avatar", "content_text")}
+        name = comment.get("author")
+        if isinstance(name, str):
+            key = (name, comment.get("author_avatar"))
+            if key not in index:
+                index[key] = len(authors)
+                author = {"name": name}
+                if comment.get("author_avatar") is not None:
+                    author["avatar"] = comment["author_avatar"]
+                authors.append(author)
+            packed["author"] = index[key]
+        elif "author_avatar" in comment:
+            packed["author_avatar"] = comment["author_avatar"]
+        return packed
+
+    # Iterative so long reply chains don't hit the recursion limit.
+    result = dict(data)
+    result["comments"] = []
+    stack = [(c, result["comments"]) for c in reversed(data.get("comments", []))]
+    while stack:
+        comment, siblings = stack.pop()
+        packed = pack(comment)
+        siblings.append(packed)
+        if "children" in comment:
+            packed["children"] = []
+            stack.extend((c, packed["children"]) for c in reversed(comment["children"]))
+    if authors:
+        result["authors"] = authors
+    return result
+
+
+def expand_author(comment: Dict, authors: List[Dict]) -> Dict:
+    """Replace a compact comment's author index with name and avatar, in place."""
+    idx = comment.get("author")
+    if isinstance(idx, int):
+        author = authors[idx]
+        comment["author"] = author["name"]
+        if "avatar" in author:
+            comment["author_avatar"] = author["avatar"]
+    return comment
+
+
+def expand_article(data: Dict) -> Dict:
+    """Inverse of compact_article (minus `content_text`, see comment_text). Modifies `data` in place."""
+    authors = data.pop("authors", None)
+    if authors is None:
+        return data
+    stack = list(data.get("comments", []))
+    while stack:
+        comment = stack.pop()
+        expand_author(comment, authors)
+        stack.extend(comment.get("children") or [])
+    return data
@@ -1,27 +1,16 @@
 import json
-from scraper import get_jisilu_data, build_comment_tree, extract_comment_data
+from scraper import fetch_page, build_comment_tree, extract_comment_data
 from bs4 import BeautifulSoup
-import os
-import hashlib
 from datetime import datetime
 
 def debug_comments():
     url = "https://www.jisilu.cn/question/518718"
-    url_hash = hashlib.md5(url.encode()).hexdigest()
-    cache_file = f"cache_{url_hash}.html"
-    
-    # We need to fetch the data first to populate the cache
-    if not os.path.exists(cache_file):
-        print(f"Fetching data for {url} to create cache...")
-        try:
-            get_jisilu_data(url)
-        except Exception as e:
-            print(f"Error fetching data: {e}")
-            return
-
-    print(f"Loading from cache: {cache_file}")
-    with open(cache_file, 'r', encoding='utf-8') as f:
-        html_content = f.read()
+    # Shared page cache: reuses the page if any tool fetched it before
+    try:
+        html_content = fetch_page(url)
+    except Exception as e:
+        print(f"Error fetching data: {e}")
+        return
         
     soup = BeautifulSoup(html_content, 'lxml')
     comments_raw = []
@@ -0,0 +1,186 @@
+import os
+import copy
+from typing import Dict, List, Optional
+from storage import atomic_write_json, read_json, ensure_dir
+
+# Article fields tracked by deltas; comments are handled separately and
+# `version` is bookkeeping, not content.
+ARTICLE_FIELDS = ("title", "content", "author", "publish_time")
+# How many deltas to keep per article; older clients just refetch in full.
+MAX_DELTAS = 30
+
+ROOT = ""  # parent key used for top-level comments in `children_order`
+
+
+def _flatten(comments: List[Dict]) -> Dict[str, Dict]:
+    """Map comment id -> {parent, fields, children: [ids]} (fields excludes children)."""
+    nodes = {}
+    stack = [(c, ROOT) for c in reversed(comments)]
+    while stack:
+        comment, parent = stack.pop()
+        children = comment.get('children', [])
+        nodes[str(comment['id'])] = {
+            'parent': parent,
+            'fields': {k: v for k, v in comment.items() if k != 'children'},
+            'children': [str(c['id']) for c in children],
+        }
+        stack.extend((c, str(comment['id'])) for c in reversed(children))
+    return nodes
+
+
+def compute_delta(old: Dict, new: Dict) -> Optional[Dict]:
+    """
+    Structural diff between two snapshots of an article.
+    Returns None when nothing changed. Otherwise:
+      article:        changed article-level fields
+      added:          new comments (without children)
+      updated:        [{id, set: {...}, unset: [...]}] for edited comments
+      moved:          ids of comments that changed parent
+      removed:        ids no longer present
+      children_order: {parent_id or "" for top level: [child ids]} for every
+                      parent whose child list changed, added/moved nodes included
+    """
+    old_nodes = _flatten(old.get('comments', []))
+    new_nodes = _flatten(new.get('comments', []))
+
+    delta = {
+        'article': {k: new.get(k) for k in ARTICLE_FIELDS if old.get(k) != new.get(k)},
+        'added': [],
+        'updated': [],
+        'moved': [],
+        'removed': [cid for cid in old_nodes if cid not in new_nodes],
+        'children_order': {},
+    }
+
+    for cid, node in new_nodes.items():
+        before = old_nodes.get(cid)
+        if before is None:
+            delta['added'].append(node['fields'])
+            continue
+        if before['parent'] != node['parent']:
+            delta['moved'].append(cid)
+        changed = {k: v for k, v in node['fields'].items() if before['fields'].get(k, object()) != v}
+        unset = [k for k in before['fields'] if k not in node['fields']]
+        if changed or unset:
+            entry = {'id': cid, 'set': changed}
+            if unset:
+                entry['unset'] = unset
+            delta['updated'].append(entry)
+
+    old_top = [str(c['id']) for c in old.get('comments', [])]
+    new_top = [str(c['id']) for c in new.get('comments', [])]
+    if old_top != new_top:
+        delta['children_order'][ROOT] = new_top
+    for cid, node in new_nodes.items():
+        before = old_nodes.get(cid)
+        if (before['children'] if before else []) != node['children']:
+            delta['children_order'][cid] = node['children']
+
+    if not any(delta[k] for k in delta):
+        return None
+    return delta
+
+
+def apply_delta(article: Dict, delta: Dict) -> Dict:
+    """Apply a delta produced by compute_delta to a cached copy; returns a new article."""
+    result = {k: v for k, v in article.items() if k != 'comments'}
+    result.update(delta.get('article', {}))
+    if 'to_version' in delta:
+        result['version'] = delta['to_version']
+
+    nodes = _flatten(article.get('comments', []))
+    for cid in delta.get('removed', []):
+        nodes.pop(cid, None)
+    for fields in delta.get('added', []):
+        nodes[str(fields['id'])] = {'fields': copy.deepcopy(fields), 'children': []}
+    for entry in delta.get('updated', []):
+        fields = nodes[entry['id']]['fields']
+        fields.update(copy.deepcopy(entry['set']))
+        for k in entry.get('unset', []):
+            fields.pop(k, None)
+
+    top = [str(c['id']) for c in article.get('comments', [])]
+    for parent, order in delta.get('children_order', {}).items():
+        if parent == ROOT:
+            top = order
+        else:
+            nodes[parent]['children'] = order
+
+    def build(cid):
+        # Iterative so long reply chains don't hit the recursion limit.
+        root = dict(nodes[cid]['fields'], children=[])
+        stack = [(root, cid)]
+        while stack:
+            out, node_id = stack.pop()
+            for child_id in nodes[node_id]['children']:
+                if child_id in nodes:
+                    child = dict(nodes[child_id]['fields'], children=[])
+                    out['children'].append(child)
+                    stack.append((child, child_id))
+        return root
+
+    result['comments'] = [build(cid) for cid in top if cid in nodes]
+    return result
+
+
+def delta_dir(data_dir: str, article_id: str) -> str:
+    return os.path.join(data_dir, "deltas", str(article_id))
+
+
+def write_delta(data_dir: str, article_id: str, delta: Dict):
+    """Store a delta as deltas/<id>/<to_version>.json and drop ones past MAX_DELTAS."""
+    directory = delta_dir(data_dir, article_id)
+    ensure_dir(directory)
+    path = os.path.join(directory, f"{delta['to_version']}.json")
+    atomic_write_json(path, delta, with_checksum=False, indent=None)
+
+    versions = sorted(int(f[:-len('.json')]) for f in os.listdir(directory)
+                      if f.endswith('.json') and f[:-len('.json')].isdigit())
+    for version in versions[:-MAX_DELTAS]:
+        os.remove(os.path.join(directory, f"{version}.json"))
+    return path
+
+
+def read_delta(data_dir: str, article_id: str, version: int) -> Optional[Dict]:
+    path = os.path.join(delta_dir(data_dir, article_id), f"{version}.json")
+    if not os.path.exists(path):
+        return None
+    return read_json(path, verify=False)
+
+
+def latest_version(data_dir: str, article_id: str) -> Optional[int]:
+    """`to_version` of the newest stored delta, which is the article's current version."""
+    directory = delta_dir(data_dir, article_id)
+    if not os.path.isdir(directory):
+        return None
+    versions = [int(f[:-len('.json')]) for f in os.listdir(directory)
+                if f.endswith('.json') and f[:-len('.json')].isdigit()]
+    return max(versions) if versions else None
+
+
+def deltas_since(data_dir: str, article_id: str, version: int, target_version: int) -> Optional[List[Dict]]:
+    """
+    The deltas taking `version` to `target_version`, in order. Returns None
+    if one is missing (pruned past MAX_DELTAS): refetch in full.
+    """
+    chain = []
+    while version < target_version:
+        delta = read_delta(data_dir, article_id, version + 1)
+        if delta is None or delta.get('from_version') != version:
+            return None
+        chain.append(delta)
+        version = delta['to_version']
+    return chain
+
+
+def catch_up(article: Dict, data_dir: str, target_version: int) -> Optional[Dict]:
+    """
+    Bring a cached article up to `target_version` by applying the stored
+    deltas in order. Returns None if a delta is missing (refetch in full).
+    """
+    chain = deltas_since(data_dir, article['id'], article.get('version', 0), target_version)
+    if chain is None:
+        return None
+    for delta in chain:
+        article = apply_delta(article, delta)
+    return article
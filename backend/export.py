@@ -0,0 +1,244 @@
+import os
+import re
+import html
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+from urllib.parse import urljoin
+
+# Nesting deeper than this is flattened to this level; the reply target
+# is still named, so long chains stay readable.
+MAX_DEPTH = 8
+# Chunks are joined up to about this many characters before being handed on
+BUFFER_SIZE = 64 * 1024
+
+FORMATS = {
+    "md": ("text/markdown; charset=utf-8", ".md"),
+    "html": ("text/html; charset=utf-8", ".html"),
+}
+
+_BR_RE = re.compile(r'<br\s*/?>', re.I)
+_BLOCK_END_RE = re.compile(r'</(p|div|li|h[1-6]|tr|blockquote|pre)>', re.I)
+_IMG_RE = re.compile(r'<img\b[^>]*?\bsrc="([^"]*)"[^>]*>', re.I)
+_LINK_RE = re.compile(r'<a\b[^>]*?\bhref="([^"]*)"[^>]*>(.*?)</a>', re.I | re.S)
+_TAG_RE = re.compile(r'<[^>]+>')
+_BLANK_LINES_RE = re.compile(r'\n\s*\n+')
+_URL_ATTR_RE = re.compile(r'\b(src|href)="([^"]+)"')
+
+# (comment without children, depth) in reading order, as from a store's iter_article
+Comments = Iterable[Tuple[Dict, int]]
+
+
+def media_rewriter(collection: str, base_url: Optional[str] = None) -> Callable[[str], str]:
+    """
+    Exported files leave the site, so the local media URLs written by
+    media_cache (relative or root-relative) would not resolve. With
+    `base_url`, where the site serving the media is reachable, they are
+    made absolute; otherwise they go back to the original remote URLs.
+    """
+    from media_cache import MediaCache, collection_media
+
+    cache = MediaCache(*collection_media(collection))
+    prefix = cache.url_prefix
+    originals = None
+
+    def resolve(match):
+        nonlocal originals
+        url = html.unescape(match.group(2))
+        if not url.startswith(prefix):
+            return match.group(0)
+        if base_url:
+            url = urljoin(base_url, url)
+        else:
+            if originals is None:
+                originals = cache.original_urls()
+            url = originals.get(url[len(prefix):], url)
+        return f'{match.group(1)}="{html.escape(url)}"'
+
+    return lambda content: _URL_ATTR_RE.sub(resolve, content) if content else content
+
+
+def html_to_markdown(content: str) -> str:
+    """Good-enough Markdown for sanitized comment HTML (see compaction.sanitize_html)."""
+    if not content:
+        return ""
+    text = _IMG_RE.sub(lambda m: f"![]({m.group(1)})", content)
+    text = _LINK_RE.sub(
+        lambda m: m.group(2) if m.group(2).startswith("![") else f"[{m.group(2)}]({m.group(1)})", text
+    )
+    text = _BR_RE.sub("\n", text)
+    text = _BLOCK_END_RE.sub("\n\n", text)
+    text = html.unescape(_TAG_RE.sub("", text))
+    lines = [line.strip() for line in text.split("\n")]
+    return _BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
+
+
+def walk(comments) -> Comments:
+    """(comment, depth) in reading order for an in-memory tree; iterative for long reply chains."""
+    stack = [(c, 0) for c in reversed(comments)]
+    while stack:
+        comment, depth = stack.pop()
+        yield comment, depth
+        stack.extend((c, depth + 1) for c in reversed(comment.get('children') or []))
+
+
+def _meta(comment: Dict) -> str:
+    parts = [comment.get('time') or ""]
+    if comment.get('location'):
+        parts.append(comment['location'])
+    return " · ".join(p for p in parts if p)
+
+
+def _same(content):
+    return content
+
+
+def iter_markdown(article: Dict, comments: Comments, rewrite: Callable[[str], str] = _same) -> Iterator[str]:
+    yield f"# {article.get('title', '')}\n\n"
+    byline = " · ".join(p for p in (article.get('author'), article.get('publish_time')) if p)
+    if byline:
+        yield f"{byline}\n\n"
+    if article.get('id'):
+        yield f"原文: https://www.jisilu.cn/question/{article['id']}\n\n"
+    body = html_to_markdown(rewrite(article.get('content', '')))
+    if body:
+        yield f"{body}\n\n"
+    yield "---\n\n## 评论\n\n"
+
+    for comment, depth in comments:
+        indent = "  " * min(depth, MAX_DEPTH)
+        head = f"**{comment.get('author', '')}**"
+        if comment.get('reply_to_user'):
+            head += f" 回复 @{comment['reply_to_user']}"
+        meta = _meta(comment)
+        if meta:
+            head += f" · {meta}"
+        lines = [f"{indent}- {head}"]
+        if comment.get('quoted_text'):
+            lines.append(f"{indent}  > {comment['quoted_text']}")
+        for line in html_to_markdown(rewrite(comment.get('content', ''))).split("\n"):
+            lines.append(f"{indent}  {line}" if line else "")
+        yield "\n".join(lines) + "\n\n"
+
+
+PRINT_CSS = """
+body { font-family: -apple-system, "PingFang SC", "Microsoft YaHei", sans-serif; max-width: 860px;
+       margin: 2em auto; color: #1f2937; line-height: 1.6; }
+h1 { font-size: 1.6em; }
+.byline { color: #6b7280; font-size: .9em; }
+.comment { border-left: 2px solid #e5e7eb; padding-left: .8em; margin: .6em 0 .6em .4em; }
+.comment > .head { font-size: .85em; color: #6b7280; }
+.comment > .head b { color: #111827; }
+blockquote { margin: .3em 0; padding-left: .6em; border-left: 3px solid #d1d5db; color: #6b7280; }
+img { max-width: 100%; }
+@media print { .comment { break-inside: avoid-page; } a { color: inherit; } }
+"""
+
+
+def iter_html(article: Dict, comments: Comments, rewrite: Callable[[str], str] = _same) -> Iterator[str]:
+    """Standalone print-friendly HTML; print it to PDF from any browser."""
+    esc = html.escape
+    yield ("<!DOCTYPE html>\n<html lang=\"zh-CN\"><head><meta charset=\"utf-8\">"
+           f"<title>{esc(article.get('title', ''))}</title><style>{PRINT_CSS}</style></head><body>\n")
+    yield f"<h1>{esc(article.get('title', ''))}</h1>\n"
+    byline = " · ".join(esc(p) for p in (article.get('author'), article.get('publish_time')) if p)
+    if article.get('id'):
+        link = f"https://www.jisilu.cn/question/{esc(str(article['id']))}"
+        byline += f' · <a href="{link}">原文</a>'
+    yield f"<p class=\"byline\">{byline}</p>\n<article>{rewrite(article.get('content', ''))}</article>\n<hr>\n"
+
+    # Close the divs of comments whose subtree ended before the next one opens
+    open_depth = 0
+    for comment, depth in comments:
+        depth = min(depth, MAX_DEPTH)
+        closing = "</div>" * (open_depth - depth)
+        head = f"<b>{esc(comment.get('author', ''))}</b>"
+        if comment.get('reply_to_user'):
+            head += f" 回复 @{esc(comment['reply_to_user'])}"
+        meta = _meta(comment)
+        if meta:
+            head += f" · {esc(meta)}"
+        quote = f"<blockquote>{esc(comment['quoted_text'])}</blockquote>" if comment.get('quoted_text') else ""
+        yield (f"{closing}<div class=\"comment\"><div class=\"head\">{head}</div>"
+               f"{quote}<div class=\"body\">{rewrite(comment.get('content', ''))}</div>\n")
+        open_depth = depth + 1
+    yield "</div>" * open_depth + "\n</body></html>\n"
+
+
+def buffered(chunks: Iterator[str], size: int = BUFFER_SIZE) -> Iterator[str]:
+    """Join small chunks so consumers (sockets, files) see fewer, larger writes."""
+    parts, length = [], 0
+    for chunk in chunks:
+        parts.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield "".join(parts)
+            parts, length = [], 0
+    if parts:
+        yield "".join(parts)
+
+
+def iter_export(article: Dict, comments: Comments, fmt: str,
+                rewrite: Callable[[str], str] = _same) -> Iterator[str]:
+    """
+    The export of `article` (its own fields) and `comments` ((comment,
+    depth) pairs, e.g. from a store's iter_article, or walk() of a tree),
+    with every HTML fragment passed through `rewrite` (see media_rewriter).
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    exporter = iter_markdown if fmt == "md" else iter_html
+    return buffered(exporter(article, comments, rewrite))
+
+
+def export_to_file(collection: str, article_id: str, fmt: str, output_dir: str,
+                   base_url: Optional[str] = None) -> str:
+    from article_store import get_store
+
+    stored = get_store(collection).iter_article(article_id)
+    if stored is None:
+        raise FileNotFoundError(f"Article {article_id} not found in '{collection}'")
+    article, comments = stored
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"{article_id}{FORMATS[fmt][1]}")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for chunk in iter_export(article, comments, fmt, media_rewriter(collection, base_url)):
+            f.write(chunk)
+    os.replace(tmp_path, path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export stored articles to Markdown or print-ready HTML.')
+    parser.add_argument('article_ids', nargs='*', help='Article IDs (default: every article in the collection)')
+    parser.add_argument('--format', '-f', choices=sorted(FORMATS), default='md')
+    parser.add_argument('--collection', '-c', default='cache', help='Store collection (cache, public or knowledge/<user>)')
+    parser.add_argument('--output', '-o', default='exports', help='Output directory')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1, help='Articles exported in parallel')
+    parser.add_argument('--base-url', help='Where the site serving the media is reachable, to link local copies '
+                                           '(default: link the original remote images)')
+    args = parser.parse_args()
+
+    article_ids = args.article_ids
+    if not article_ids:
+        from article_store import get_store
+        article_ids = get_store(args.collection).list_ids()
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        futures = {
+            executor.submit(export_to_file, args.collection, aid, args.format, args.output, args.base_url): aid
+            for aid in article_ids
+        }
+        for future in as_completed(futures):
+            try:
+                print(f"Exported {futures[future]} -> {future.result()}")
+            except Exception as e:
+                failed += 1
+                print(f"Failed to export {futures[future]}: {e}")
+    print(f"Exported {len(article_ids) - failed}/{len(article_ids)} articles")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
 import json
 import argparse
 import os
+from compaction import comment_text, expand_article
+from lazy import lazy_import
+
+bs4 = lazy_import("bs4")
 
 def extract_comments_recursive(comments, result_dict):
     """
@@ -11,7 +15,7 @@ def extract_comments_recursive(comments, result_dict):
 
     for comment in comments:
         author = comment.get('author')
-        content = comment.get('content_text', '')
+        content = comment_text(comment)
         
         # 如果作者存在且有内容，则添加到结果中
         if author and content:
@@ -27,7 +31,9 @@ def extract_comments_recursive(comments, result_dict):
 
 def main():
     parser = argparse.ArgumentParser(description='Extract comments by author from a JSON cache file.')
-    parser.add_argument('input_file', help='Path to the input JSON file (e.g., cache/517247.json)')
+    parser.add_argument('input_file', nargs='?', help='Path to the input JSON file (e.g., cache/517247.json)')
+    parser.add_argument('--article', '-a', help='Read this article ID from the article store instead of a file')
+    parser.add_argument('--collection', '-c', default='cache', help='Store collection for --article (cache, public or knowledge/<user>)')
     parser.add_argument('--output', '-o', default='abstract.json', help='Path to the output JSON file (default: abstract.json)')
     
     args = parser.parse_args()
@@ -35,14 +41,22 @@ def main():
     input_path = args.input_file
     output_path = args.output
     
-    if not os.path.exists(input_path):
+    if args.article:
+        from article_store import get_store
+        data = get_store(args.collection).get(args.article)
+        if data is None:
+            print(f"Error: Article '{args.article}' not found in '{args.collection}'.")
+            return
+    elif not input_path:
+        parser.error('either input_file or --article is required')
+    elif not os.path.exists(input_path):
         print(f"Error: Input file '{input_path}' not found.")
         return
+    else:
+        with open(input_path, 'r', encoding='utf-8') as f:
+            data = expand_article(json.load(f))
 
     try:
-        with open(input_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            
         # 结果字典：Key=Author, Value=List[Content]
         grouped_comments = {}
         
@@ -58,8 +72,7 @@ def main():
         
         if main_author and main_content:
             try:
-                from bs4 import BeautifulSoup
-                soup = BeautifulSoup(main_content, 'lxml')
+                soup = bs4.BeautifulSoup(main_content, 'lxml')
                 main_content_text = soup.get_text(strip=True)
             except ImportError:
                 # Fallback: simple tag removal or keep as is
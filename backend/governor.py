@@ -0,0 +1,249 @@
+import os
+import time
+import itertools
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+from storage import LOCK_DIR, atomic_write_json, read_json, key_lock
+from lazy import lazy_import
+
+requests = lazy_import("requests")
+
+# Requests allowed in flight at once; the controller moves between 1 and this.
+MAX_CONCURRENCY = 4
+# Minimum gap between request starts, adjusted between these bounds.
+MIN_INTERVAL = 0.2
+MAX_INTERVAL = 10.0
+START_INTERVAL = 0.5
+# Responses slower than this count as the site pushing back.
+TARGET_LATENCY = 2.0
+# Additive step per good response: concurrency +1/limit, interval -INTERVAL_STEP.
+INTERVAL_STEP = 0.05
+# Consecutive blocks (403/429/captcha) before the circuit opens, and for how long.
+FAILURE_THRESHOLD = 3
+COOLDOWN = 120.0
+# A slot held longer than this is assumed lost (its process died mid-request).
+LEASE_TIMEOUT = 120.0
+# How often a waiting request rechecks the shared state for a free slot.
+POLL_INTERVAL = 0.1
+
+# Controller state shared by every process on this machine (uvicorn workers,
+# update_data.py, scrape_user.py), read and written under key_lock.
+STATE_PATH = os.path.join(LOCK_DIR, "governor.json")
+
+# How a request ended, as reported to RequestGovernor._release
+OK = "ok"            # got a response; its latency decides up or down
+BLOCKED = "blocked"  # 403/429/captcha
+ERROR = "error"      # network failure: slow down, but it says nothing about blocking
+ABORTED = "aborted"  # interrupted on our side; no signal either way
+
+BLOCK_STATUS = (403, 429)
+# Text of jisilu's anti-scraping interstitial. Normal pages always carry the
+# `aw-` layout classes, which keeps a comment that merely mentions 验证码
+# from tripping the detector.
+CAPTCHA_MARKERS = ("验证码", "访问过于频繁", "captcha")
+
+
+class RequestBlockedError(Exception):
+    """The site answered with a block (403/429) or a captcha page."""
+
+    def __init__(self, message, response=None):
+        super().__init__(message)
+        self.response = response
+
+
+class CircuitOpenError(RequestBlockedError):
+    """Too many consecutive blocks; requests are refused until the cooldown ends."""
+
+
+def is_captcha_page(response) -> bool:
+    content_type = response.headers.get('Content-Type', '')
+    if 'html' not in content_type:
+        return False
+    text = response.text
+    return any(marker in text for marker in CAPTCHA_MARKERS) and 'aw-' not in text
+
+
+class RequestGovernor:
+    """
+    Shared throttle for outbound jisilu requests.
+
+    Concurrency and the gap between requests follow AIMD: every fast,
+    successful response nudges them up (additive), while a slow response,
+    a network error, a 403/429 or a captcha page halves concurrency and
+    doubles the gap (multiplicative). After FAILURE_THRESHOLD blocks in a
+    row the circuit opens and every request fails fast with
+    CircuitOpenError until the cooldown (or the server's Retry-After) has
+    passed; then a single probe is let through. Only a response closes the
+    circuit again; a blocked or failed probe reopens it.
+
+    The state lives in a small JSON file (STATE_PATH) updated under
+    key_lock, so every process scraping from this machine shares one
+    limit, one request gap and one circuit: in-flight requests are leases
+    in that file, which expire after LEASE_TIMEOUT if their process dies.
+    """
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY, target_latency: float = TARGET_LATENCY,
+                 failure_threshold: int = FAILURE_THRESHOLD, cooldown: float = COOLDOWN,
+                 state_path: str = STATE_PATH):
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state_path = state_path
+
+        self._tokens = itertools.count()
+        # Wakes waiting threads of this process early; other processes are polled
+        self._cond = threading.Condition()
+
+    def _initial_state(self) -> Dict:
+        return {
+            "limit": 1.0,  # start cautiously and grow
+            "interval": START_INTERVAL,
+            "failures": 0,
+            "open_until": 0.0,
+            "next_start": 0.0,
+            "probe": None,
+            "leases": {},  # token -> expiry (epoch seconds)
+        }
+
+    def _read_stored(self) -> Dict:
+        state = self._initial_state()
+        try:
+            state.update(read_json(self.state_path, verify=False))
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            print(f"Governor: resetting unreadable state {self.state_path}: {e}")
+        return state
+
+    @staticmethod
+    def _prune(stored: Dict) -> Dict:
+        """A copy of `stored` without expired leases."""
+        now = time.time()
+        state = dict(stored, leases={t: exp for t, exp in stored["leases"].items() if exp > now})
+        if state["probe"] not in state["leases"]:
+            state["probe"] = None
+        return state
+
+    def _read(self) -> Dict:
+        return self._prune(self._read_stored())
+
+    @contextmanager
+    def _state(self):
+        """
+        Read-modify-write the shared state under its cross-process lock. The
+        file is only rewritten if something changed (a lease granted or
+        pruned, an outcome recorded): waiting threads poll it read-only.
+        """
+        with key_lock(f"governor:{self.state_path}"):
+            stored = self._read_stored()
+            state = self._prune(stored)
+            yield state
+            if state != stored:
+                atomic_write_json(self.state_path, state, with_checksum=False, indent=None)
+
+    def snapshot(self) -> Dict:
+        """Current shared state (limit, interval, failures, open_until, ...)."""
+        with key_lock(f"governor:{self.state_path}"):
+            return self._read()
+
+    def _acquire(self) -> str:
+        token = f"{os.getpid()}-{next(self._tokens)}"
+        while True:
+            with self._state() as state:
+                now = time.time()
+                if now < state["open_until"]:
+                    raise CircuitOpenError(
+                        f"Circuit open for another {state['open_until'] - now:.0f}s after repeated blocks"
+                    )
+                half_open = state["failures"] >= self.failure_threshold
+                if half_open:
+                    # One probe at a time until the site lets us through again
+                    granted = not state["leases"]
+                    if granted:
+                        state["probe"] = token
+                else:
+                    granted = len(state["leases"]) < int(state["limit"])
+                if granted:
+                    state["leases"][token] = now + LEASE_TIMEOUT
+                    start = max(now, state["next_start"])
+                    state["next_start"] = start + state["interval"]
+                    break
+            with self._cond:
+                self._cond.wait(timeout=POLL_INTERVAL)
+        delay = start - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        return token
+
+    def _open(self, state: Dict, seconds: float, reason: str):
+        state["open_until"] = time.time() + seconds
+        print(f"Governor: circuit open for {seconds:.0f}s {reason}")
+
+    def _slow_down(self, state: Dict):
+        state["limit"] = max(1.0, state["limit"] / 2)
+        state["interval"] = min(MAX_INTERVAL, state["interval"] * 2)
+
+    def _release(self, token: str, outcome: str, latency: Optional[float] = None,
+                 retry_after: Optional[float] = None):
+        with self._state() as state:
+            state["leases"].pop(token, None)
+            probe = state["probe"] == token
+            if probe:
+                state["probe"] = None
+            if outcome == BLOCKED:
+                state["failures"] += 1
+                self._slow_down(state)
+                if state["failures"] >= self.failure_threshold:
+                    self._open(state, max(self.cooldown, retry_after or 0),
+                               f"after {state['failures']} blocked requests")
+            elif outcome == ERROR:
+                # Failures are left alone: a network error must not close an open circuit
+                self._slow_down(state)
+                if probe:
+                    self._open(state, self.cooldown, "again: the probe request failed")
+            elif outcome == OK and latency > self.target_latency:
+                state["failures"] = 0
+                self._slow_down(state)
+            elif outcome == OK:
+                state["failures"] = 0
+                state["limit"] = min(float(self.max_concurrency), state["limit"] + 1 / state["limit"])
+                state["interval"] = max(MIN_INTERVAL, state["interval"] - INTERVAL_STEP)
+        with self._cond:
+            self._cond.notify_all()
+
+    def request(self, method: str, url: str, session=None, **kwargs) -> "requests.Response":
+        """
+        Perform a request under the governor. Raises RequestBlockedError for
+        403/429/captcha responses and CircuitOpenError while the circuit is open;
+        other responses (including errors) are returned as usual.
+        """
+        token = self._acquire()
+        start = time.monotonic()
+        try:
+            response = (session or requests).request(method, url, **kwargs)
+        except requests.RequestException:
+            self._release(token, ERROR)
+            raise
+        except BaseException:
+            self._release(token, ABORTED)
+            raise
+        latency = time.monotonic() - start
+
+        if response.status_code in BLOCK_STATUS or is_captcha_page(response):
+            retry_after = response.headers.get('Retry-After', '')
+            self._release(token, BLOCKED, latency,
+                          retry_after=float(retry_after) if retry_after.isdigit() else None)
+            reason = f"HTTP {response.status_code}" if response.status_code in BLOCK_STATUS else "captcha page"
+            raise RequestBlockedError(f"Blocked by jisilu ({reason}) fetching {url}", response)
+
+        self._release(token, OK, latency)
+        return response
+
+    def get(self, url: str, session=None, **kwargs) -> "requests.Response":
+        return self.request("GET", url, session=session, **kwargs)
+
+
+# Shared by every scraper entry point in this process (and, via STATE_PATH, across processes)
+governor = RequestGovernor()
@@ -0,0 +1,38 @@
+import importlib
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Stands in for a module until an attribute is first read, then imports it."""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_module'] = None
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__['_module']
+        if module is None:
+            # The import lock makes concurrent first uses import it once
+            module = importlib.import_module(self.__name__)
+            self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__['_module'] is not None else "not loaded"
+        return f"<lazy module {self.__name__!r} ({state})>"
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """
+    `name` as a module-level global that is only imported on first use.
+
+    The parsing, HTTP, imaging and analytics stacks (bs4/lxml, requests,
+    PIL, numpy via columnar) take longer to import than most commands
+    run, and a server answering from its cache never needs them (see
+    check_import_time.py). A missing optional package raises ImportError
+    at that first use, where callers with a fallback catch it.
+    """
+    return LazyModule(name)
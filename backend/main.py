@@ -1,18 +1,83 @@
 import os
 import json
-import glob
-from fastapi import FastAPI, HTTPException, Query
+import time
+import queue
+import threading
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, Response
+from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from typing import List, Optional
-import uvicorn
-from scraper import get_jisilu_data
+from article_store import get_store
+from storage import key_lock, checksum
+from compaction import drop_derived_text, expand_article
+import article_index
+import snapshot
+from media_cache import MediaCache, MEDIA_DIR
+from export import iter_export, media_rewriter, FORMATS
+from delta import latest_version, deltas_since
+from lazy import lazy_import
 
-app = FastAPI()
+# Scraping loads bs4/lxml and requests, columnar numpy; a server that only
+# serves the cache never does
+scraper = lazy_import("scraper")
+columnar = lazy_import("columnar")
 
-CACHE_DIR = "cache"
-if not os.path.exists(CACHE_DIR):
-    os.makedirs(CACHE_DIR)
+# Warm start and shutdown snapshot when SNAPSHOT=1 (see load_snapshot below)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    load_snapshot()
+    yield
+    save_snapshot()
+
+app = FastAPI(lifespan=lifespan)
+
+# Parsed articles; JSON files under cache/ unless ARTICLE_STORE=sqlite
+store = get_store("cache")
+
+# Local copies of avatars and images; MEDIA_CACHE=0 keeps hotlinking jisilu
+media = MediaCache() if os.environ.get("MEDIA_CACHE", "1") != "0" else None
+
+class ImmutableStaticFiles(StaticFiles):
+    # Media files are named by content hash, so they never change
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+# The directory appears with the first download; nothing is created at import
+app.mount("/media", ImmutableStaticFiles(directory=MEDIA_DIR, check_dir=False), name="media")
+
+# Media downloads for freshly stored articles, off the request path
+_media_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="media")
+
+def localize_later(article_id: str):
+    """
+    Swap local media copies into a just-stored article in the background.
+    Scrapes store the original jisilu URLs, so the article is served (and
+    the fetch lock released) without waiting for downloads.
+    """
+    if media is not None:
+        _media_pool.submit(localize_stored, article_id, store.updated_at(article_id))
+
+def localize_stored(article_id: str, version):
+    try:
+        data = store.get(article_id)
+        if data is None or not media.localize_article(data):
+            return
+        with key_lock(f"fetch:{article_id}"):
+            # Re-scraped meanwhile: that copy gets its own pass
+            if store.updated_at(article_id) != version:
+                return
+            store.save(data)
+            index_saved(article_id, data)
+    except Exception as e:
+        # Hotlinked images are still better than no article
+        print(f"Media caching failed for {article_id}: {e}")
 
 # Enable CORS
 app.add_middleware(
@@ -23,6 +88,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Stored articles are compact (see compaction.py); responses name the author
+# on every comment, as they always have.
 class Comment(BaseModel):
     id: str
     author: str
@@ -31,6 +98,8 @@ class Comment(BaseModel):
     time: str
     location: Optional[str] = None
     reply_to_user: Optional[str] = None
+    # Share of the quote found in the parent, when the quote placed it
+    reply_confidence: Optional[float] = None
     children: List['Comment'] = []
 
 class ArticleData(BaseModel):
@@ -40,67 +109,399 @@ class ArticleData(BaseModel):
     author: Optional[str] = None
     publish_time: Optional[str] = None
     comments: List[Comment]
+    # Set on author/root filtered views: the comments that matched
+    matched_ids: Optional[List[str]] = None
 
 class HistoryItem(BaseModel):
     id: str
     title: str
 
+# Clients may keep responses but must revalidate; unchanged ones cost a 304.
+CACHE_CONTROL = "no-cache"
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 prescribes for If-None-Match
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+def raw_response(request: Request, body: bytes, digest: str) -> Response:
+    etag = f'"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# Fields of stored articles that are part of the API; the rest (quoted_text,
+# timestamp, content_text, ...) only serve matching and indexing.
+ARTICLE_KEYS = frozenset(ArticleData.model_fields)
+COMMENT_KEYS = frozenset(Comment.model_fields)
+
+def public_view(data):
+    """The article, expanded, reduced to the fields ArticleData declares. Modifies `data` in place."""
+    expand_article(data)
+    for key in [k for k in data if k not in ARTICLE_KEYS]:
+        del data[key]
+    stack = list(data.get('comments', []))
+    while stack:
+        comment = stack.pop()
+        for key in [k for k in comment if k not in COMMENT_KEYS]:
+            del comment[key]
+        stack.extend(comment.get('children', []))
+    return data
+
+# Encoded public form of recently served articles: id -> (store version, body, digest)
+PUBLIC_CACHE_SIZE = 64
+_public_bodies = OrderedDict()
+_public_guard = threading.Lock()
+
+def article_response(request: Request, article_id: str) -> Optional[Response]:
+    """
+    The stored article in its public form (public_view), or None if it is
+    not stored. The body is encoded once per store version and kept, so
+    repeat requests and 304s skip decoding; the strong ETag is the hash of
+    exactly those bytes. Articles loaded from the boot snapshot are
+    encoded from memory instead of being read again.
+    """
+    # Read before the body: a save racing us only makes the entry look stale
+    version = store.updated_at(article_id)
+    if version is None:
+        return None
+    with _public_guard:
+        cached = _public_bodies.get(article_id)
+        if cached is not None and cached[0] == version:
+            _public_bodies.move_to_end(article_id)
+            return raw_response(request, cached[1], cached[2])
+
+    warm = _warm_articles.pop(article_id, None)
+    if warm is not None and warm[0] == version:
+        raw = warm[1]
+    else:
+        raw = store.get_raw(article_id)
+        if raw is None:
+            return None
+        raw = raw[0]
+    body = json.dumps(public_view(json.loads(raw)), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    digest = checksum(body)
+    with _public_guard:
+        _public_bodies[article_id] = (version, body, digest)
+        _public_bodies.move_to_end(article_id)
+        while len(_public_bodies) > PUBLIC_CACHE_SIZE:
+            _public_bodies.popitem(last=False)
+    return raw_response(request, body, digest)
+
+# Encoded /api/history, rebuilt only when the store's listing token changes
+_history_cache = {"token": None, "body": None, "digest": None}
+
+# Requests per article since boot; they pick the articles of the next snapshot.
+# Unlocked: a lost increment only nudges the ranking.
+_hits = Counter()
+_hits_since = time.time()
+# article_id -> (version, body, digest) from the boot snapshot
+_warm_articles = {}
+
+# SNAPSHOT=1 boots warm from snapshots/cache.json (see snapshot.py) and
+# rewrites it on shutdown with this worker's hits.
+SNAPSHOT = os.environ.get("SNAPSHOT", "0") == "1"
+
+def load_snapshot():
+    if not SNAPSHOT:
+        return
+    start = time.perf_counter()
+    try:
+        warm = snapshot.load(store)
+    except Exception as e:
+        print(f"Snapshot not loaded: {e}")
+        return
+    if warm is None:
+        return
+    if warm["history"] is not None:
+        token, body, digest = warm["history"]
+        _history_cache.update({"token": token, "body": body, "digest": digest})
+    _warm_articles.update(warm["articles"])
+    print(f"Loaded snapshot ({len(_warm_articles)} articles, history "
+          f"{'warm' if warm['history'] else 'stale'}) in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+def save_snapshot():
+    if not SNAPSHOT:
+        return
+    try:
+        snapshot.write(store, dict(_hits), counted_since=_hits_since)
+    except Exception as e:
+        print(f"Snapshot not written: {e}")
+
 @app.get("/api/history", response_model=List[HistoryItem])
-async def get_history():
-    history = []
+def get_history(request: Request):
     try:
-        files = glob.glob(os.path.join(CACHE_DIR, "*.json"))
-        # Sort by modification time, newest first
-        files.sort(key=os.path.getmtime, reverse=True)
-        
-        for file_path in files:
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    if 'id' in data and 'title' in data:
-                        history.append(HistoryItem(id=data['id'], title=data['title']))
-            except Exception as e:
-                print(f"Error reading cache file {file_path}: {e}")
-                continue
-        return history
+        token = store.listing_token()
+        cached = _history_cache
+        if token is None or cached["token"] != token:
+            items = [{"id": item['id'], "title": item['title']} for item in store.list_articles()]
+            body = json.dumps(items, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            cached = {"token": token, "body": body, "digest": checksum(body)}
+            _history_cache.update(cached)
+        return raw_response(request, cached["body"], cached["digest"])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def fetch_article(article_id: str, force_update: bool = False):
+    """
+    Scrape and store an article. One scrape per article across all threads
+    and workers; whoever waited on the lock reuses the result instead of
+    hitting jisilu again.
+    """
+    url = f"https://www.jisilu.cn/question/{article_id}"
+    requested_at = time.time()
+    with key_lock(f"fetch:{article_id}"):
+        updated_at = store.updated_at(article_id)
+        if updated_at is not None and (not force_update or updated_at >= requested_at):
+            try:
+                if store.get_raw(article_id) is not None:
+                    return
+            except Exception as e:
+                print(f"Error reading cache for {article_id}: {e}")
+
+        data = scraper.get_jisilu_data(url, force_update=force_update)
+        # Inject ID into data
+        data['id'] = article_id
+        
+        # Save to cache
+        store.save(data)
+        index_saved(article_id, data)
+    localize_later(article_id)
+
+def index_saved(article_id: str, data):
+    # The comment-tree index was written by store.save
+    columnar.ingest(store.collection, data, store.updated_at(article_id))
+
+def filtered_view(article_id: str, author: Optional[str], root: Optional[str]):
+    view = article_index.view(store, article_id, author=author, root=root)
+    if view is None:
+        raise HTTPException(status_code=404, detail="Article not found.")
+    if view is False:
+        raise HTTPException(status_code=404, detail=f"Comment {root} not found in article {article_id}.")
+    return view
+
+# Plain `def` handlers run in the threadpool, so a blocking scrape (or waiting
+# on another worker's scrape) doesn't stall the event loop.
 @app.get("/api/parse", response_model=ArticleData)
-async def parse_article(
+def parse_article(
+    request: Request,
     article_id: str = Query(..., description="The Jisilu article ID"),
-    force_update: bool = Query(False, description="Force update from source")
+    force_update: bool = Query(False, description="Force update from source"),
+    author: Optional[str] = Query(None, description="Only this author's comments, with the comments they reply to"),
+    root: Optional[str] = Query(None, description="Only the reply subtree of this comment ID, with its ancestors"),
 ):
     if not article_id.isdigit():
          raise HTTPException(status_code=400, detail="Invalid Article ID. Must be numeric.")
+    filtered = author is not None or root is not None
+    _hits[article_id] += 1
 
-    file_path = os.path.join(CACHE_DIR, f"{article_id}.json")
-    
     # Try to load from cache if not force update
-    if not force_update and os.path.exists(file_path):
+    if not force_update:
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data
+            if filtered:
+                if store.exists(article_id):
+                    return filtered_view(article_id, author, root)
+            else:
+                response = article_response(request, article_id)
+                if response is not None:
+                    return response
+        except HTTPException:
+            raise
         except Exception as e:
             print(f"Error reading cache for {article_id}: {e}")
             # Fallback to fetching if cache read fails
             pass
 
-    url = f"https://www.jisilu.cn/question/{article_id}"
-    
     try:
-        data = get_jisilu_data(url, force_update=force_update)
-        # Inject ID into data
-        data['id'] = article_id
-        
-        # Save to cache
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-            
-        return data
+        fetch_article(article_id, force_update)
+        if filtered:
+            return filtered_view(article_id, author, root)
+        # Serve what was stored, so the response has the same form and ETag a later hit would
+        response = article_response(request, article_id)
+        if response is None:
+            raise RuntimeError(f"Article {article_id} was not stored")
+        return response
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Comments per `comments` event when replaying a cached article
+STREAM_BATCH_SIZE = 50
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def stream_comment(comment, parent_id):
+    fields = {k: v for k, v in comment.items() if k in COMMENT_KEYS and k != 'children'}
+    fields['parent_id'] = parent_id
+    return fields
+
+def stream_cached(data):
+    yield sse_event("article", {k: v for k, v in data.items() if k in ARTICLE_KEYS and k != 'comments'})
+    # Pre-order, so a parent is always sent before its replies
+    batch, total = [], 0
+    stack = [(c, None) for c in reversed(data.get('comments', []))]
+    while stack:
+        comment, parent_id = stack.pop()
+        batch.append(stream_comment(comment, parent_id))
+        stack.extend((c, comment['id']) for c in reversed(comment.get('children', [])))
+        if len(batch) >= STREAM_BATCH_SIZE:
+            total += len(batch)
+            yield sse_event("comments", {"comments": batch, "moved": {}})
+            batch = []
+    if batch:
+        total += len(batch)
+        yield sse_event("comments", {"comments": batch, "moved": {}})
+    yield sse_event("done", {"total": total})
+
+# Queued by scrape_events when another request stored the article while we waited
+_STORED = object()
+
+def scrape_events(article_id, force_update, requested_at, events: queue.Queue):
+    """
+    Scrape and store an article, putting its SSE events on `events` as pages
+    arrive, then None. Runs in its own thread and holds the fetch lock only
+    here: the queue is unbounded, so a slow client never keeps the lock.
+    """
+    url = f"https://www.jisilu.cn/question/{article_id}"
+    try:
+        # Same single-flight rule as /api/parse
+        with key_lock(f"fetch:{article_id}"):
+            updated_at = store.updated_at(article_id)
+            if updated_at is not None and (not force_update or updated_at >= requested_at):
+                events.put(_STORED)
+                return
+
+            header = None
+            builder = scraper.IncrementalTreeBuilder()
+            for page_header, comments in scraper.iter_article_pages(url, force_update=force_update):
+                if page_header is not None:
+                    header = dict(page_header, id=article_id)
+                    events.put(sse_event("article", {k: v for k, v in header.items() if k in ARTICLE_KEYS}))
+                new, moved = builder.add_batch(comments)
+                if new or moved:
+                    events.put(sse_event("comments", {
+                        "comments": [stream_comment(c, builder.parents[c['id']]) for c in new],
+                        "moved": moved,
+                    }))
+
+            # Same tree get_jisilu_data would have built
+            data = {**header, "comments": scraper.build_comment_tree(builder.comments)}
+            drop_derived_text(data['comments'])
+            store.save(data)
+            index_saved(article_id, data)
+        localize_later(article_id)
+        events.put(sse_event("done", {"total": len(builder.comments)}))
+    except Exception as e:
+        events.put(sse_event("error", {"detail": str(e)}))
+    finally:
+        events.put(None)
+
+def stream_fetch(article_id, force_update):
+    events = queue.Queue()
+    # The scrape runs to completion, and is stored, even if the client disconnects
+    threading.Thread(target=scrape_events, args=(article_id, force_update, time.time(), events),
+                     daemon=True).start()
+    while True:
+        event = events.get()
+        if event is None:
+            return
+        if event is _STORED:
+            try:
+                data = store.get(article_id)
+            except Exception as e:
+                data = None
+                print(f"Error reading cache for {article_id}: {e}")
+            if data is None:
+                yield sse_event("error", {"detail": f"Article {article_id} could not be read"})
+            else:
+                yield from stream_cached(data)
+            continue
+        yield event
+
+@app.get("/api/parse/stream")
+def parse_article_stream(
+    article_id: str = Query(..., description="The Jisilu article ID"),
+    force_update: bool = Query(False, description="Force update from source")
+):
+    """
+    Server-Sent Events variant of /api/parse. Emits `article` (header fields),
+    then `comments` batches as pages are fetched ({comments: [... with
+    parent_id], moved: {id: new parent_id}} for earlier comments whose parent
+    changed), then `done` ({total}) or `error` ({detail}).
+    """
+    if not article_id.isdigit():
+         raise HTTPException(status_code=400, detail="Invalid Article ID. Must be numeric.")
+
+    events = None
+    if not force_update:
+        try:
+            data = store.get(article_id)
+            if data is not None:
+                events = stream_cached(data)
+        except Exception as e:
+            print(f"Error reading cache for {article_id}: {e}")
+    if events is None:
+        events = stream_fetch(article_id, force_update)
+
+    return StreamingResponse(events, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/api/export/{article_id}")
+def export_article(
+    article_id: str,
+    request: Request,
+    format: str = Query("md", description="md (Markdown) or html (print-ready, save as PDF from the browser)")
+):
+    if not article_id.isdigit():
+         raise HTTPException(status_code=400, detail="Invalid Article ID. Must be numeric.")
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format. Use one of: {', '.join(sorted(FORMATS))}")
+    # Only stored articles; parse it first to export a new one
+    stored = store.iter_article(article_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Article not found. Parse it first.")
+    article, comments = stored
+
+    # The file is read offline: link media on this server, not relative to it
+    rewrite = media_rewriter(store.collection, str(request.base_url))
+    media_type, extension = FORMATS[format]
+    return StreamingResponse(
+        iter_export(article, comments, format, rewrite), media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{article_id}{extension}"'},
+    )
+
+# update_data.py publishes deltas next to the public (GitHub Pages) articles
+public_store = get_store("public")
+
+@app.get("/api/deltas/{article_id}")
+def get_deltas(
+    article_id: str,
+    since: int = Query(..., ge=0, description="Version of the copy the client holds"),
+):
+    """
+    The deltas (see delta.py) taking a public article from version `since`
+    to its current version, oldest first; apply them in order with
+    apply_delta. 410 if the chain is incomplete (pruned past MAX_DELTAS):
+    refetch the article in full.
+    """
+    if not article_id.isdigit():
+         raise HTTPException(status_code=400, detail="Invalid Article ID. Must be numeric.")
+    if not public_store.exists(article_id):
+        raise HTTPException(status_code=404, detail="Article not found.")
+    # Articles start at version 1; each delta bumps it by one
+    version = latest_version(public_store.directory, article_id) or 1
+    chain = deltas_since(public_store.directory, article_id, since, version) if since <= version else None
+    if chain is None:
+        raise HTTPException(status_code=410, detail=f"No delta chain from version {since}; refetch in full.")
+    return {"version": version, "deltas": chain}
+
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,211 @@
+import io
+import os
+import re
+import html
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+from storage import BACKEND_DIR, atomic_write_bytes, atomic_write_json, read_json, ensure_dir, key_lock
+from governor import governor, CircuitOpenError
+from article_store import collection_dir
+from lazy import lazy_import
+
+Image = lazy_import("PIL.Image")
+
+# Served by main.py at /media with a one-year immutable Cache-Control.
+# MEDIA_BASE_URL overrides the prefix written into articles when the API
+# sits behind a path prefix or on another host.
+MEDIA_DIR = os.path.join(BACKEND_DIR, "media")
+# File names are appended to it, so it always ends in one slash.
+MEDIA_URL = os.environ.get("MEDIA_BASE_URL", "/media/").rstrip("/") + "/"
+# The public collection is deployed to GitHub Pages with its data directory;
+# relative to the page, so it works under any Pages base path.
+PUBLIC_MEDIA_URL = "data/media/"
+# Downloads in parallel per article; the governor still paces them
+MEDIA_WORKERS = 4
+# Bounding box of generated thumbnails (content images and avatars)
+THUMB_SIZE = (480, 480)
+AVATAR_SIZE = (96, 96)
+# Larger files are left on the origin
+MAX_MEDIA_BYTES = 10 * 1024 * 1024
+
+URL_MAP_NAME = "urls.json"
+
+# Sanitized HTML (compaction.sanitize_html) always uses double-quoted attributes
+_IMG_SRC_RE = re.compile(r'<img\b[^>]*?\bsrc="([^"]+)"')
+_URL_ATTR_RE = re.compile(r'\b(src|href)="([^"]+)"')
+
+def collection_media(collection: str) -> Tuple[str, str]:
+    """(directory, URL prefix) of the media cache used for a collection's articles."""
+    if collection == "public":
+        return os.path.join(collection_dir("public"), "media"), PUBLIC_MEDIA_URL
+    return MEDIA_DIR, MEDIA_URL
+
+
+_EXTENSIONS = {
+    b'\xff\xd8\xff': '.jpg',
+    b'\x89PNG': '.png',
+    b'GIF8': '.gif',
+}
+
+
+def _extension(data: bytes) -> Optional[str]:
+    for magic, ext in _EXTENSIONS.items():
+        if data.startswith(magic):
+            return ext
+    if data.startswith(b'RIFF') and data[8:12] == b'WEBP':
+        return '.webp'
+    return None
+
+
+class MediaCache:
+    """
+    Content-addressed local copies of remote images.
+
+    Each distinct URL is downloaded once (the URL -> file map persists in
+    urls.json), stored as <sha256[:16]><ext>, so the same picture behind
+    different URLs is kept once, plus a <hash>.thumb<width><ext> thumbnail when
+    Pillow is installed. Articles are rewritten to point at `url_prefix`.
+    """
+
+    def __init__(self, directory: str = MEDIA_DIR, url_prefix: str = MEDIA_URL):
+        self.directory = directory
+        self.url_prefix = url_prefix
+        self._map_path = os.path.join(directory, URL_MAP_NAME)
+        self._guard = threading.Lock()
+        self._urls = None
+
+    def _load_map(self) -> Dict[str, Dict]:
+        if self._urls is None:
+            try:
+                self._urls = read_json(self._map_path) if os.path.exists(self._map_path) else {}
+            except ValueError as e:
+                print(f"Ignoring unreadable media map {self._map_path}: {e}")
+                self._urls = {}
+        return self._urls
+
+    def _thumbnail(self, data: bytes, name: str, ext: str, size) -> str:
+        if ext == '.gif':  # keep animations intact
+            return name
+        thumb_name = name[:-len(ext)] + f".thumb{size[0]}" + ext
+        path = os.path.join(self.directory, thumb_name)
+        if os.path.exists(path):
+            return thumb_name
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                if img.width <= size[0] and img.height <= size[1]:
+                    return name
+                img.thumbnail(size)
+                if ext == '.jpg' and img.mode not in ('RGB', 'L'):
+                    img = img.convert('RGB')
+                out = io.BytesIO()
+                img.save(out, format={'.jpg': 'JPEG', '.png': 'PNG', '.webp': 'WEBP'}[ext], optimize=True)
+        except ImportError:
+            return name  # without Pillow the full image is used
+        except Exception as e:
+            print(f"Could not thumbnail {name}: {e}")
+            return name
+        atomic_write_bytes(path, out.getvalue(), with_checksum=False)
+        return thumb_name
+
+    def _download(self, url: str, thumb_size) -> Optional[Dict]:
+        try:
+            response = governor.get(url, timeout=30)
+            response.raise_for_status()
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            print(f"Media download failed for {url}: {e}")
+            return None
+        data = response.content
+        ext = _extension(data)
+        if ext is None or len(data) > MAX_MEDIA_BYTES:
+            print(f"Skipping media {url}: not a supported image or too large")
+            return None
+
+        name = hashlib.sha256(data).hexdigest()[:16] + ext
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            atomic_write_bytes(path, data, with_checksum=False)
+        return {'file': name, 'thumb': self._thumbnail(data, name, ext, thumb_size)}
+
+    def fetch(self, urls: Iterable[str], thumb_size=THUMB_SIZE) -> Dict[str, Dict]:
+        """Download the URLs not seen before; returns url -> {file, thumb} for every cached one."""
+        ensure_dir(self.directory)
+        with self._guard:
+            known = self._load_map()
+            wanted = sorted({u for u in urls if u and u.startswith(('http://', 'https://'))})
+            missing = [u for u in wanted if u not in known]
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=MEDIA_WORKERS) as executor:
+                results = list(executor.map(lambda u: (u, self._download(u, thumb_size)), missing))
+            with key_lock(f"media:{self.directory}"):
+                with self._guard:
+                    # Merge with what other processes recorded meanwhile
+                    if os.path.exists(self._map_path):
+                        try:
+                            known.update(read_json(self._map_path))
+                        except ValueError:
+                            pass
+                    known.update({u: entry for u, entry in results if entry})
+                    # May live in the Pages data dir (update_data.py): no sidecar
+                    atomic_write_json(self._map_path, known, with_checksum=False, indent=None)
+
+        return {u: known[u] for u in wanted if u in known}
+
+    def url(self, name: str) -> str:
+        return self.url_prefix + name
+
+    def original_urls(self) -> Dict[str, str]:
+        """File name (full size or thumbnail) -> a remote URL it was downloaded from."""
+        with self._guard:
+            known = dict(self._load_map())
+        names = {}
+        for url, entry in sorted(known.items()):
+            names.setdefault(entry['file'], url)
+            names.setdefault(entry['thumb'], url)
+        return names
+
+    def localize_article(self, data: Dict) -> int:
+        """
+        Rewrite avatars and <img>/<a> URLs of an expanded article, in place,
+        to local copies: avatars and inline images use the thumbnail, links
+        to an image the full file. Anything that failed to download keeps
+        its original URL. Returns the number of URLs rewritten.
+        """
+        comments = []
+        stack = list(data.get('comments', []))
+        while stack:
+            comment = stack.pop()
+            comments.append(comment)
+            stack.extend(comment.get('children') or [])
+
+        avatars = self.fetch((c.get('author_avatar') for c in comments), AVATAR_SIZE)
+        html_fields = [data] + comments
+        images = self.fetch(
+            (html.unescape(src) for item in html_fields for src in _IMG_SRC_RE.findall(item.get('content') or '')),
+            THUMB_SIZE,
+        )
+
+        rewritten = 0
+        for comment in comments:
+            entry = avatars.get(comment.get('author_avatar'))
+            if entry:
+                comment['author_avatar'] = self.url(entry['thumb'])
+                rewritten += 1
+
+        def replace(match):
+            nonlocal rewritten
+            attr, url = match.group(1), match.group(2)
+            entry = images.get(html.unescape(url))
+            if not entry:
+                return match.group(0)
+            rewritten += 1
+            return f'{attr}="{self.url(entry["thumb"] if attr == "src" else entry["file"])}"'
+
+        for item in html_fields:
+            if item.get('content'):
+                item['content'] = _URL_ATTR_RE.sub(replace, item['content'])
+        return rewritten
@@ -0,0 +1,160 @@
+import re
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Iterable, List, NamedTuple, Optional
+
+# jisilu shows Beijing wall-clock times
+BEIJING = timezone(timedelta(hours=8))
+TIME_FORMAT = "%Y-%m-%d %H:%M"
+# Distinct meta strings remembered; a thread rarely has more
+CACHE_SIZE = 16384
+
+# Comment meta as it appears on pages, in the <span> or the whole meta div:
+#   "2026-02-21 16:51 来自河北", "2026-02-21 16:51修改 来自上海",
+#   "2026-02-21 16:51 来自河北引用回复", "3分钟前 来自北京", "昨天 09:12"
+# The common case in one pass: absolute time, optional 修改, 来自XX, action links
+_FAST_RE = re.compile(
+    r'\s*((\d{4}-\d{1,2}-\d{1,2})\s+(\d{1,2}):(\d{2}))\s*(修改)?\s*(?:来自\s*(\S*?))?\s*(?:(?:引用|回复|编辑|赞同).*)?$'
+)
+_ACTIONS_RE = re.compile(r'(?:引用|回复|编辑|赞同).*$')
+_LOCATION_RE = re.compile(r'\s*来自\s*(\S*)\s*$')
+_EDITED_RE = re.compile(r'\s*修改\s*$')
+_ABSOLUTE_RE = re.compile(r'^(\d{4}-\d{1,2}-\d{1,2})\s+(\d{1,2}):(\d{2})(?::\d{2})?$')
+_MONTH_DAY_RE = re.compile(r'^(\d{1,2})-(\d{1,2})\s+(\d{1,2}):(\d{2})$')
+_DAY_WORD_RE = re.compile(r'^(今天|昨天|前天)\s*(\d{1,2}):(\d{2})$')
+_AGO_RE = re.compile(r'^(\d+)\s*(秒|分钟|小时|天)前$')
+
+_DAYS_BACK = {"今天": 0, "昨天": 1, "前天": 2}
+_UNIT_SECONDS = {"秒": 1, "分钟": 60, "小时": 3600, "天": 86400}
+
+
+class CommentMeta(NamedTuple):
+    time: str        # "YYYY-MM-DD HH:MM" (+ "修改" if edited); relative forms resolved
+    timestamp: int   # epoch seconds, 0 if the time could not be parsed
+    location: str    # interned, "" if absent
+    edited: bool
+
+
+@lru_cache(maxsize=4096)
+def _day_start(date_text: str) -> int:
+    # strptime per comment was most of the old cost; comments share days
+    year, month, day = map(int, date_text.split("-"))
+    return int(datetime(year, month, day, tzinfo=BEIJING).timestamp())
+
+
+def _epoch(date_text: str, hour: str, minute: str) -> Optional[int]:
+    hour, minute = int(hour), int(minute)
+    if hour > 23 or minute > 59:
+        return None
+    try:
+        return _day_start(date_text) + hour * 3600 + minute * 60
+    except ValueError:
+        return None
+
+
+def _absolute(text: str) -> Optional[int]:
+    match = _ABSOLUTE_RE.match(text)
+    return _epoch(*match.groups()) if match else None
+
+
+def _relative(text: str, now: float) -> Optional[int]:
+    """Times shown relative to the page fetch ("3分钟前", "昨天 09:12", "02-21 16:51")."""
+    if text == "刚刚":
+        return int(now)
+    match = _AGO_RE.match(text)
+    if match:
+        return int(now) - int(match.group(1)) * _UNIT_SECONDS[match.group(2)]
+    today = datetime.fromtimestamp(now, BEIJING)
+    try:
+        match = _DAY_WORD_RE.match(text)
+        if match:
+            day = today - timedelta(days=_DAYS_BACK[match.group(1)])
+            return int(day.replace(hour=int(match.group(2)), minute=int(match.group(3)),
+                                   second=0, microsecond=0).timestamp())
+    except ValueError:
+        return None
+    match = _MONTH_DAY_RE.match(text)
+    if match:
+        # No year shown: the latest such date not after `now`, so "12-31" seen
+        # in January is last year, and "02-29" the last leap year's
+        month, day, hour, minute = map(int, match.groups())
+        for year in range(today.year, today.year - 5, -1):
+            try:
+                shown = int(today.replace(year=year, month=month, day=day, hour=hour, minute=minute,
+                                          second=0, microsecond=0).timestamp())
+            except ValueError:
+                continue
+            if shown <= now:
+                return shown
+    return None
+
+
+def parse_time(text: str, now: Optional[float] = None) -> Optional[int]:
+    """Epoch seconds for a jisilu time string (absolute or relative), or None."""
+    text = text.strip()
+    timestamp = _absolute(text)
+    if timestamp is None:
+        timestamp = _relative(text, time.time() if now is None else now)
+    return timestamp
+
+
+def _split(text: str):
+    """(time text, location, edited) of any meta string."""
+    text = _ACTIONS_RE.sub('', text.strip())
+    location = ""
+    match = _LOCATION_RE.search(text)
+    if match:
+        location = sys.intern(match.group(1))
+        text = text[:match.start()]
+    edited = bool(_EDITED_RE.search(text))
+    if edited:
+        text = _EDITED_RE.sub('', text)
+    return text.strip(), location, edited
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_absolute(text: str) -> Optional[CommentMeta]:
+    """Meta strings with an absolute time don't depend on `now`, so they are memoised whole."""
+    match = _FAST_RE.match(text)
+    if not match:
+        return None
+    time_text, date_text, hour, minute, edited, location = match.groups()
+    timestamp = _epoch(date_text, hour, minute)
+    if timestamp is None:
+        return None
+    return CommentMeta(time_text + ("修改" if edited else ""), timestamp, sys.intern(location or ""), bool(edited))
+
+
+def _parse(text: str, now: float, failures: List[str]) -> CommentMeta:
+    meta = _parse_absolute(text or "")
+    if meta is not None:
+        return meta
+    time_text, location, edited = _split(text or "")
+    timestamp = parse_time(time_text, now)
+    if timestamp is None:
+        failures.append(text)
+        timestamp = 0
+    elif not _ABSOLUTE_RE.match(time_text):
+        # Store relative times resolved, so re-scrapes don't see them change
+        time_text = datetime.fromtimestamp(timestamp, BEIJING).strftime(TIME_FORMAT)
+    return CommentMeta(time_text + ("修改" if edited else ""), timestamp, location, edited)
+
+
+def parse_meta_batch(texts: Iterable[str], now: Optional[float] = None) -> List[CommentMeta]:
+    """
+    Parse the meta strings of one page. Relative times are resolved against
+    a single `now` (default: the current time), so a page is consistent with
+    itself; unparseable times become timestamp 0 and are reported once.
+    """
+    now = time.time() if now is None else now
+    failures = []
+    metas = [_parse(text, now, failures) for text in texts]
+    if failures:
+        print(f"Failed to parse {len(failures)} time(s), e.g. {failures[0]!r}")
+    return metas
+
+
+def parse_meta(text: str, now: Optional[float] = None) -> CommentMeta:
+    return parse_meta_batch([text], now)[0]
@@ -0,0 +1,33 @@
+import os
+import argparse
+from article_store import JsonArticleStore, SqliteArticleStore, DEFAULT_DB_PATH, STATIC_COLLECTIONS, discover_collections
+
+def migrate_collection(collection, db_path):
+    source = JsonArticleStore(collection)
+    target = SqliteArticleStore(collection, db_path)
+    imported = 0
+    for article_id in sorted(source.list_ids()):
+        try:
+            data = source.get(article_id)
+            data.setdefault('id', article_id)
+            target.save(data)
+            imported += 1
+        except (OSError, ValueError, KeyError) as e:
+            print(f"  Skipping {collection}/{article_id}: {e}")
+    print(f"Imported {imported} articles into '{collection}'")
+    return imported
+
+def main():
+    parser = argparse.ArgumentParser(description='Import the JSON article files into the SQLite article store.')
+    parser.add_argument('--db', default=os.environ.get("ARTICLE_DB", DEFAULT_DB_PATH), help='SQLite database path')
+    parser.add_argument('--collection', '-c', action='append', help='Only migrate these collections (repeatable)')
+    args = parser.parse_args()
+
+    # Static collections always stay JSON files (see get_store)
+    collections = args.collection or [c for c in discover_collections() if c not in STATIC_COLLECTIONS]
+    total = sum(migrate_collection(c, args.db) for c in collections)
+    print(f"Done: {total} articles in {args.db}")
+    print("Set ARTICLE_STORE=sqlite to serve from the database.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import os
+import re
+import time
+import hashlib
+from typing import Dict, Optional, Tuple
+from storage import (
+    CACHE_DIR, atomic_write_text, atomic_write_json, read_text, read_json, key_lock, CorruptedFileError,
+)
+from governor import governor
+
+BASE_URL = "https://www.jisilu.cn"
+# cache/pages/<article_id>/<page>.html, with <page>.meta.json next to it
+PAGE_DIR = os.path.join(CACHE_DIR, "pages")
+# Where scraper.py kept pages before, as cache_<md5(url)>.html
+LEGACY_DIR = CACHE_DIR
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9",
+    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+    "Cache-Control": "max-age=0",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1"
+}
+
+_ARTICLE_URL_RE = re.compile(r'/question/(\d+)(?:[^?#]*)(?:\?(?:[^#]*&)?page=(\d+))?')
+
+
+def article_url(article_id: str, page: int = 1) -> str:
+    """Canonical URL of a thread page; page 1 is the plain article URL."""
+    url = f"{BASE_URL}/question/{article_id}"
+    return url if page == 1 else f"{url}?page={page}"
+
+
+def parse_article_url(url: str) -> Optional[Tuple[str, int]]:
+    """(article_id, page) for a jisilu thread URL, or None for anything else."""
+    match = _ARTICLE_URL_RE.search(url)
+    if not match:
+        return None
+    return match.group(1), int(match.group(2) or 1)
+
+
+def page_path(article_id: str, page: int = 1) -> str:
+    return os.path.join(PAGE_DIR, str(article_id), f"{page}.html")
+
+
+def _meta_path(path: str) -> str:
+    return path[:-len(".html")] + ".meta.json"
+
+
+def page_meta(article_id: str, page: int = 1) -> Optional[Dict]:
+    """{url, fetched_at, status} of the cached page, or None if it is not cached."""
+    path = page_path(article_id, page)
+    if not os.path.exists(path):
+        return None
+    try:
+        return read_json(_meta_path(path))
+    except (FileNotFoundError, ValueError):
+        # Page without metadata (e.g. written by hand): age from the file itself
+        return {"url": article_url(article_id, page), "fetched_at": os.path.getmtime(path), "status": None}
+
+
+def _read_cached(article_id: str, page: int, max_age: Optional[float]) -> Optional[str]:
+    meta = page_meta(article_id, page)
+    if meta is None:
+        return _adopt_legacy(article_id, page, max_age)
+    if max_age is not None and time.time() - meta["fetched_at"] > max_age:
+        return None
+    try:
+        return read_text(page_path(article_id, page))
+    except CorruptedFileError as e:
+        print(f"Ignoring corrupted cache: {e}")
+        return None
+
+
+def _adopt_legacy(article_id: str, page: int, max_age: Optional[float]) -> Optional[str]:
+    """Move a page cached under the old cache_<md5>.html name into the new layout."""
+    url = article_url(article_id, page)
+    legacy = os.path.join(LEGACY_DIR, f"cache_{hashlib.md5(url.encode()).hexdigest()}.html")
+    if not os.path.exists(legacy):
+        return None
+    fetched_at = os.path.getmtime(legacy)
+    if max_age is not None and time.time() - fetched_at > max_age:
+        return None
+    try:
+        html = read_text(legacy)
+    except CorruptedFileError as e:
+        print(f"Ignoring corrupted cache: {e}")
+        return None
+    _write(article_id, page, html, url, fetched_at, None)
+    return html
+
+
+def _write(article_id, page, html, url, fetched_at, status):
+    path = page_path(article_id, page)
+    atomic_write_text(path, html)
+    atomic_write_json(_meta_path(path), {"url": url, "fetched_at": fetched_at, "status": status},
+                      with_checksum=False, indent=None)
+
+
+def get_page(article_id: str, page: int = 1, max_age: Optional[float] = None, force: bool = False,
+             session=None, headers: Optional[Dict] = None) -> str:
+    """
+    HTML of one thread page, shared by every tool. Served from the cache
+    unless `force` or the copy is older than `max_age` seconds (None: any
+    age). Fetches go through the request governor, one per page at a time
+    across threads and processes; a caller that waited on another's fetch
+    reuses it.
+    """
+    article_id = str(article_id)
+    if not force:
+        html = _read_cached(article_id, page, max_age)
+        if html is not None:
+            print(f"Loading from cache: {page_path(article_id, page)}")
+            return html
+
+    requested_at = time.time()
+    with key_lock(f"page:{article_id}:{page}"):
+        meta = page_meta(article_id, page)
+        if meta is not None and meta["fetched_at"] >= requested_at:
+            html = _read_cached(article_id, page, None)
+            if html is not None:
+                return html
+
+        url = article_url(article_id, page)
+        print(f"Fetching from URL: {url}")
+        response = governor.get(url, session=session, headers=headers or HEADERS, timeout=30)
+        response.raise_for_status()
+        _write(article_id, page, response.text, url, time.time(), response.status_code)
+        return response.text
@@ -0,0 +1,122 @@
+import re
+import zlib
+import heapq
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+# Character n-gram size. Three characters is roughly one Chinese word-and-a-half:
+# long enough to be selective, short enough to survive light edits.
+SHINGLE_SIZE = 3
+# Only shingles starting at an "anchor" character (code point % ANCHOR_MOD == 0)
+# are indexed. Anchors depend on the characters alone, not their position, so a
+# truncated or re-spaced quote selects the same shingles as its source.
+ANCHOR_MOD = 3
+# Anchored shingles sampled from a quote to look up candidates (bottom-k sketch)
+SAMPLE_SIZE = 12
+# A candidate must share at least this share of the sampled shingles to be verified
+MIN_SAMPLE_HITS = 0.25
+# Minimum containment of the quote in a comment to accept it as the parent
+MIN_QUOTE_SCORE = 0.6
+
+_STRIP_RE = re.compile(r'[\s　]+|\.{3,}|…+|修改')
+
+
+def normalize(text: str) -> str:
+    """Fold width/case and drop whitespace, ellipses and the "修改" edit marker."""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return _STRIP_RE.sub('', text)
+
+
+def shingles(text: str) -> set:
+    """All shingles of already normalized text."""
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def anchored_shingles(text: str) -> set:
+    """The indexed subset of shingles of already normalized text."""
+    last = len(text) - SHINGLE_SIZE
+    return {text[i:i + SHINGLE_SIZE] for i, ch in enumerate(text) if i <= last and ord(ch) % ANCHOR_MOD == 0}
+
+
+def _sample_key(shingle: str) -> int:
+    # crc32 rather than hash(): str hashes are salted per process, and every
+    # worker must pick the same sample to build the same tree.
+    return zlib.crc32(shingle.encode('utf-8'))
+
+
+def containment(quote_shingles: set, text: str) -> float:
+    """Share of the quote's shingles that occur in (normalized) `text`."""
+    if not quote_shingles:
+        return 0.0
+    return sum(1 for s in quote_shingles if s in text) / len(quote_shingles)
+
+
+class QuoteIndex:
+    """
+    Incremental inverted index from character shingles to comments.
+
+    Jisilu quotes are usually a truncated, whitespace-collapsed or lightly
+    edited copy of an earlier comment, so the score is how much of the quote
+    is contained in a candidate (not Jaccard similarity, which would punish
+    a short quote of a long comment). Lookups only touch the postings of a
+    small fixed sample of the quote's shingles, so cost does not grow with
+    the number of earlier comments the way a linear scan does.
+    """
+
+    def __init__(self):
+        self.comments: List[Dict] = []
+        self._texts: List[str] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+
+    def __len__(self):
+        return len(self.comments)
+
+    def add(self, comment: Dict, text: Optional[str] = None):
+        doc = len(self.comments)
+        text = normalize(text if text is not None else comment.get('content_text', ''))
+        self.comments.append(comment)
+        self._texts.append(text)
+        postings = self._postings
+        for s in anchored_shingles(text):
+            postings[s].append(doc)
+
+    def query(self, quote: str, author: Optional[str] = None,
+              min_score: float = MIN_QUOTE_SCORE, limit: int = 5) -> List[Tuple[Dict, float]]:
+        """
+        Return up to `limit` (comment, score) pairs whose text contains at
+        least `min_score` of the quote, best first; ties go to the most
+        recent comment. `author` restricts matches to that author.
+        """
+        quote = normalize(quote)
+        keys = anchored_shingles(quote)
+        if not keys:
+            # Too short to have an anchor; fall back to any shingle of it.
+            keys = shingles(quote)
+        if not keys:
+            return []
+
+        # Bottom-k by hash value is a deterministic, evenly spread sample.
+        sample = heapq.nsmallest(SAMPLE_SIZE, keys, key=_sample_key)
+        hits = defaultdict(int)
+        for s in sample:
+            for doc in self._postings.get(s, ()):
+                hits[doc] += 1
+
+        needed = max(1, int(len(sample) * MIN_SAMPLE_HITS))
+        quote_shingles = None
+        results = []
+        for doc, count in hits.items():
+            if count < needed:
+                continue
+            comment = self.comments[doc]
+            if author is not None and comment.get('author') != author:
+                continue
+            if quote_shingles is None:
+                quote_shingles = shingles(quote)
+            score = containment(quote_shingles, self._texts[doc])
+            if score >= min_score:
+                results.append((score, doc))
+
+        results.sort(reverse=True)
+        return [(self.comments[doc], score) for score, doc in results[:limit]]
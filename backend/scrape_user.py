@@ -1,12 +1,23 @@
-import requests
-from bs4 import BeautifulSoup
-import json
 import os
-import time
 import re
 import argparse
 import sys
+import threading
 from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor
+from article_store import get_store
+from governor import governor, CircuitOpenError
+from page_cache import get_page
+from meta_parser import parse_meta_batch
+from lazy import lazy_import
+
+bs4 = lazy_import("bs4")
+columnar = lazy_import("columnar")
+requests = lazy_import("requests")
+
+
+def make_soup(html):
+    return bs4.BeautifulSoup(html, 'lxml')
 
 class JisiluUserScraper:
     BASE_URL = "https://www.jisilu.cn"
@@ -15,14 +26,28 @@ class JisiluUserScraper:
         "X-Requested-With": "XMLHttpRequest"
     }
 
-    def __init__(self, username, output_dir="backend/knowledge"):
+    # Thread pages younger than this are taken from the shared page cache
+    PAGE_MAX_AGE = 24 * 3600
+
+    def __init__(self, username, output_dir="backend/knowledge", page_max_age=PAGE_MAX_AGE):
         self.username = username
+        self.page_max_age = page_max_age
         self.output_dir = os.path.join(output_dir, username)
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
+        self.store = get_store(f"knowledge/{username}", self.output_dir)
         self.user_id = None
-        self.session = requests.Session()
-        self.session.headers.update(self.HEADERS)
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        """This thread's Session: run() scrapes articles from a thread pool, and Sessions aren't thread-safe."""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.HEADERS)
+            self._local.session = session
+        return session
 
     def get_user_id(self):
         """
@@ -34,7 +59,7 @@ class JisiluUserScraper:
             # First request without XMLHttpRequest to get full page
             headers = self.HEADERS.copy()
             del headers["X-Requested-With"]
-            response = self.session.get(url, headers=headers)
+            response = governor.get(url, session=self.session, headers=headers)
             response.raise_for_status()
             
             # Look for var PEOPLE_USER_ID = '12345';
@@ -68,12 +93,12 @@ class JisiluUserScraper:
             print(f"Fetching actions (type {action_type}) page {page}...")
             
             try:
-                response = self.session.get(url)
+                response = governor.get(url, session=self.session)
                 if not response.text.strip():
                     print("Empty response, stopping.")
                     break
                 
-                soup = BeautifulSoup(response.text, 'lxml')
+                soup = make_soup(response.text)
                 items = soup.find_all('div', class_='aw-item')
                 
                 if not items:
@@ -94,7 +119,6 @@ class JisiluUserScraper:
                                 article_ids.add(match.group(1))
                 
                 page += 1
-                time.sleep(0.5) # Be polite
                 
                 # Safety break
                 if page > 50: 
@@ -112,7 +136,7 @@ class JisiluUserScraper:
         """
         if not html_content:
             return ""
-        soup = BeautifulSoup(html_content, 'lxml')
+        soup = make_soup(html_content)
         
         # Remove script and style elements
         for script in soup(["script", "style", "img", "iframe", "video"]):
@@ -155,8 +179,8 @@ class JisiluUserScraper:
         try:
             headers = self.HEADERS.copy()
             del headers["X-Requested-With"]
-            response = self.session.get(url, headers=headers)
-            soup = BeautifulSoup(response.text, 'lxml')
+            page_html = get_page(article_id, 1, max_age=self.page_max_age, session=self.session, headers=headers)
+            soup = make_soup(page_html)
             
             # Title
             title_tag = soup.find('div', class_='aw-mod-head').find('h1') if soup.find('div', class_='aw-mod-head') else None
@@ -214,7 +238,7 @@ class JisiluUserScraper:
             
             # Function to parse comments from a soup
             def parse_comments(current_soup):
-                comments_list = []
+                comments_list, meta_texts = [], []
                 comment_items = current_soup.find_all('div', class_='aw-item')
                 for item in comment_items:
                     # Check if it's a comment
@@ -240,20 +264,18 @@ class JisiluUserScraper:
                                 full_text += f"> {quote_text}\n\n"
                             full_text += content_text
                             
-                            # Time
+                            # Time, parsed for the whole page below
                             meta = item.find('div', class_='aw-dynamic-topic-meta') or item.find('div', class_='meta')
-                            time_str = ""
-                            if meta:
-                                raw_time = meta.get_text(strip=True)
-                                # Clean up unwanted action text
-                                raw_time = re.sub(r'(引用|回复|编辑|赞同).*$', '', raw_time).strip()
-                                time_str = raw_time
-                                
+                            meta_texts.append(meta.get_text(strip=True) if meta else "")
                             comments_list.append({
                                 "id": item.get('id'),
                                 "content": full_text,
-                                "time": time_str
                             })
+
+                for comment, meta in zip(comments_list, parse_meta_batch(meta_texts)):
+                    comment["time"] = f"{meta.time} 来自{meta.location}" if meta.location else meta.time
+                    comment["timestamp"] = meta.timestamp
+                    comment["location"] = meta.location
                 return comments_list
 
             # Get comments from page 1
@@ -276,26 +298,26 @@ class JisiluUserScraper:
                 # Loop through other pages
                 for p in range(2, max_page + 1):
                     print(f"  Scraping page {p}/{max_page}...")
-                    page_url = f"{url}?page={p}"
-                    # Usually url structure is /question/id?page=p OR /question/id?sort_key=add_time&sort=ASC&page=p
-                    # Let's try appending parameter
                     try:
-                        page_resp = self.session.get(page_url, headers=headers)
-                        page_soup = BeautifulSoup(page_resp.text, 'lxml')
+                        page_html = get_page(article_id, p, max_age=self.page_max_age,
+                                             session=self.session, headers=headers)
+                        page_soup = make_soup(page_html)
                         article_data['comments'].extend(parse_comments(page_soup))
-                        time.sleep(0.5)
+                    except CircuitOpenError:
+                        raise
                     except Exception as e:
                         print(f"Error scraping page {p}: {e}")
 
+        except CircuitOpenError:
+            raise
         except Exception as e:
             print(f"Error scraping article {article_id}: {e}")
             
         # Save if there is content (either main post or comments)
         if article_data['content'] or article_data['comments']:
-            filename = os.path.join(self.output_dir, f"{article_id}.json")
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(article_data, f, ensure_ascii=False, indent=2)
-            print(f"Saved to {filename}")
+            self.store.save(article_data)
+            print(f"Saved article {article_id} to knowledge/{self.username}")
+            columnar.ingest(self.store.collection, article_data, self.store.updated_at(article_id))
         else:
             print(f"No content found for user {self.username} in article {article_id}, skipping save.")
 
@@ -316,15 +338,27 @@ class JisiluUserScraper:
         all_ids = topic_ids
         print(f"Total unique articles to scrape: {len(all_ids)}")
         
-        for idx, aid in enumerate(all_ids):
+        # Pacing is up to the shared governor, which also caps how many of
+        # these workers actually have a request in flight.
+        def process(item):
+            idx, aid = item
             print(f"Processing {idx+1}/{len(all_ids)}: Article {aid}")
             self.scrape_article(aid)
-            time.sleep(1) # Delay between articles
+
+        with ThreadPoolExecutor(max_workers=governor.max_concurrency) as executor:
+            try:
+                for _ in executor.map(process, enumerate(all_ids)):
+                    pass
+            except CircuitOpenError as e:
+                print(f"Stopping: {e}")
+                executor.shutdown(cancel_futures=True)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Scrape Jisilu user content.')
     parser.add_argument('username', help='Username to scrape (e.g. gaigai777)')
+    parser.add_argument('--max-age', type=float, default=JisiluUserScraper.PAGE_MAX_AGE,
+                        help='Reuse cached thread pages up to this many seconds old (0 refetches)')
     args = parser.parse_args()
     
-    scraper = JisiluUserScraper(args.username)
+    scraper = JisiluUserScraper(args.username, page_max_age=args.max_age)
     scraper.run()
@@ -1,25 +1,31 @@
-import requests
-from bs4 import BeautifulSoup
 import re
 from typing import List, Dict, Optional
 import uuid
-from datetime import datetime
+from quote_index import QuoteIndex
+from compaction import sanitize_html, drop_derived_text
+from page_cache import HEADERS, get_page, article_url, parse_article_url
+from meta_parser import CommentMeta, parse_meta, parse_meta_batch
+from lazy import lazy_import
+
+bs4 = lazy_import("bs4")
 
 def get_headers():
-    return {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9",
-        "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
-        "Cache-Control": "max-age=0",
-        "Connection": "keep-alive",
-        "Upgrade-Insecure-Requests": "1"
-    }
+    return dict(HEADERS)
 
 def clean_text(text):
     return re.sub(r'\s+', ' ', text).strip()
 
-def extract_comment_data(item_div) -> Dict:
-    """Extract raw data from a single comment div."""
+def comment_meta_text(item_div) -> str:
+    """The "2026-02-21 16:51 来自河北" line of a comment div."""
+    meta_div = item_div.find('div', class_='aw-dynamic-topic-meta')
+    time_loc_span = meta_div.find('span', class_='aw-text-color-999') if meta_div else None
+    return time_loc_span.get_text(strip=True) if time_loc_span else ""
+
+def extract_comment_data(item_div, meta: Optional[CommentMeta] = None) -> Dict:
+    """
+    Extract raw data from a single comment div. `meta` is its parsed time
+    and location when the caller parsed a whole page at once.
+    """
     try:
         # ID
         # id="answer_list_XXXXXX"
@@ -36,7 +42,6 @@ def extract_comment_data(item_div) -> Dict:
         
         # Content (HTML)
         content_div = item_div.find('div', class_='markitup-box')
-        content_text = content_div.get_text(strip=True) if content_div else ""
         
         quoted_text = None
         
@@ -47,26 +52,13 @@ def extract_comment_data(item_div) -> Dict:
                 quoted_text = blockquote.get_text(strip=True)
                 # Remove blockquote from content HTML to avoid duplication in display
                 blockquote.decompose()
-        
-        content_html = str(content_div) if content_div else ""
+        # The comment's own words: a later quote of it must match these, not
+        # the text it quoted in turn
+        content_text = content_div.get_text(strip=True) if content_div else ""
         
         # Time & Location
-        meta_div = item_div.find('div', class_='aw-dynamic-topic-meta')
-        time_loc_span = meta_div.find('span', class_='aw-text-color-999') if meta_div else None
-        time_loc = time_loc_span.get_text(strip=True) if time_loc_span else ""
-        # Split "2026-02-21 16:51 来自河北"
-        parts = time_loc.split(' 来自')
-        publish_time = parts[0]
-        location = parts[1] if len(parts) > 1 else ""
-        
-        # Parse time for sorting
-        try:
-            # Remove potential "修改" suffix
-            clean_time_str = publish_time.replace("修改", "").strip()
-            timestamp = datetime.strptime(clean_time_str, "%Y-%m-%d %H:%M").timestamp()
-        except ValueError:
-            print(f"Failed to parse time: {publish_time}")
-            timestamp = 0
+        if meta is None:
+            meta = parse_meta(comment_meta_text(item_div))
         
         # Determine if it's a reply
         reply_to_user = None
@@ -91,15 +83,18 @@ def extract_comment_data(item_div) -> Dict:
             if first_link and current_text.startswith('@'):
                  reply_to_user = first_link.get_text(strip=True).replace('@', '')
 
+        # Last, since it strips the classes the @user lookup above relies on
+        content_html = sanitize_html(content_div) if content_div else ""
+
         return {
             "id": comment_id,
             "author": author,
             "author_avatar": avatar,
             "content": content_html,
-            "content_text": content_text, # For matching (this includes quote text because we extracted it before decompose)
-            "time": publish_time,
-            "timestamp": timestamp,
-            "location": location,
+            "content_text": content_text, # For matching, without the quote
+            "time": meta.time,
+            "timestamp": meta.timestamp,
+            "location": meta.location,
             "reply_to_user": reply_to_user,
             "quoted_text": quoted_text,
             "children": []
@@ -108,95 +103,141 @@ def extract_comment_data(item_div) -> Dict:
         print(f"Error extracting comment: {e}")
         return None
 
-def build_comment_tree(comments: List[Dict]) -> List[Dict]:
+class ReplyResolver:
     """
-    Convert flat list of comments to a tree based on reply logic.
+    Decides each comment's parent from the comments seen before it.
     Heuristic:
-    1. If quote exists -> find comment with matching content (substring).
+    1. If quote exists -> find comment whose content best contains it (fuzzy, see quote_index).
     2. If @user exists -> find last comment by that user.
     3. Else -> Top level.
+    Comments must be added oldest first. A parent found by its quote is
+    recorded on the comment as `reply_confidence`, the share of the quote
+    found in the parent (1.0 for an exact quote); it is absent otherwise.
     """
-    tree = []
-    processed_comments = [] # List of dicts
-    
-    for comment in comments:
+    def __init__(self):
+        self.quote_index = QuoteIndex() # All processed comments, for quote lookups
+        self.last_by_author = {}
+
+    def resolve(self, comment: Dict) -> Optional[Dict]:
         parent_found = None
+        score = None
+        target_user = comment.get('reply_to_user')
+        quote = comment.get('quoted_text')
         
         # Priority 1: @User AND Quoted Text
         # Strongest signal: replying to a specific user and quoting specific content
-        if comment.get('reply_to_user') and comment.get('quoted_text'):
-            target_user = comment['reply_to_user']
-            quote = comment['quoted_text'][:50]
-            for prev in reversed(processed_comments):
-                # Must match both author and content
-                if prev['author'] == target_user and quote in prev['content_text']:
-                    parent_found = prev
-                    break
+        if target_user and quote:
+            matches = self.quote_index.query(quote, author=target_user, limit=1)
+            if matches:
+                parent_found, score = matches[0]
         
         # Priority 2: @User Only (if not found above)
         # Fallback: finding latest comment by that user
-        if not parent_found and comment.get('reply_to_user'):
-            target_user = comment['reply_to_user']
-            for prev in reversed(processed_comments):
-                if prev['author'] == target_user:
-                    parent_found = prev
-                    break
+        if not parent_found and target_user:
+            parent_found = self.last_by_author.get(target_user)
         
         # Priority 3: Quoted Text Only (if not found above)
         # Fallback: finding comment with matching content (e.g. no @user used)
-        if not parent_found and comment.get('quoted_text'):
-            quote = comment['quoted_text'][:50]
-            for prev in reversed(processed_comments):
-                if quote in prev['content_text']:
-                    parent_found = prev
-                    break
-        
+        if not parent_found and quote:
+            matches = self.quote_index.query(quote, limit=1)
+            if matches:
+                parent_found, score = matches[0]
+
+        # Re-resolution (IncrementalTreeBuilder) may change the answer
+        comment.pop('reply_confidence', None)
+        if score is not None:
+            comment['reply_confidence'] = round(score, 3)
+        return parent_found
+
+    def add(self, comment: Dict):
+        self.quote_index.add(comment)
+        self.last_by_author[comment['author']] = comment
+
+def build_comment_tree(comments: List[Dict]) -> List[Dict]:
+    """
+    Convert flat list of comments (oldest first) to a tree based on reply logic.
+    See ReplyResolver for the heuristic.
+    """
+    tree = []
+    resolver = ReplyResolver()
+    
+    for comment in comments:
+        parent_found = resolver.resolve(comment)
         if parent_found:
             parent_found['children'].append(comment)
         else:
             tree.append(comment)
-            
-        processed_comments.append(comment)
+        resolver.add(comment)
         
     return tree
 
-import os
-import hashlib
+class IncrementalTreeBuilder:
+    """
+    Assigns parents while comments arrive in batches (e.g. page by page).
+    Batches that continue in time order are resolved incrementally; a batch
+    older than what was already seen forces a full re-resolution, reported
+    as `moved` so earlier assignments can be corrected.
+    The final assignments always equal build_comment_tree on all comments.
+    """
+    def __init__(self):
+        self.comments = []
+        self.parents = {} # comment id -> parent id (None for top level)
+        self._resolver = ReplyResolver()
 
-def get_jisilu_data(url: str, force_update: bool = False):
-    # Cache key based on URL
-    url_hash = hashlib.md5(url.encode()).hexdigest()
-    
-    # Ensure cache directory exists
-    cache_dir = "cache"
-    if not os.path.exists(cache_dir):
-        os.makedirs(cache_dir)
-        
-    cache_file = os.path.join(cache_dir, f"cache_{url_hash}.html")
-    
-    html_content = ""
-    if not force_update and os.path.exists(cache_file):
-        print(f"Loading from cache: {cache_file}")
-        with open(cache_file, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-    else:
-        print(f"Fetching from URL: {url}")
-        response = requests.get(url, headers=get_headers(), timeout=30)
-        response.raise_for_status()
-        html_content = response.text
-        # Save to cache
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-            
-    soup = BeautifulSoup(html_content, 'lxml')
-    
+    def add_batch(self, batch: List[Dict]):
+        """Returns (new_comments, moved) with moved = {id: new parent id} for earlier comments."""
+        batch = sorted(batch, key=lambda x: x['timestamp'])
+        if not batch:
+            return [], {}
+        moved = {}
+        if self.comments and batch[0]['timestamp'] < self.comments[-1]['timestamp']:
+            previous = self.parents
+            self.comments = sorted(self.comments + batch, key=lambda x: x['timestamp'])
+            self.parents = {}
+            self._resolver = ReplyResolver()
+            for comment in self.comments:
+                self._assign(comment)
+            moved = {
+                cid: parent for cid, parent in self.parents.items()
+                if cid in previous and previous[cid] != parent
+            }
+        else:
+            self.comments.extend(batch)
+            for comment in batch:
+                self._assign(comment)
+        return batch, moved
+
+    def _assign(self, comment):
+        parent = self._resolver.resolve(comment)
+        self.parents[comment['id']] = parent['id'] if parent else None
+        self._resolver.add(comment)
+
+def fetch_page(url: str, force_update: bool = False, max_age: Optional[float] = None) -> str:
+    """Return the HTML of thread page `url`, through the shared page cache (see page_cache.get_page)."""
+    parsed = parse_article_url(url)
+    if parsed is None:
+        raise ValueError(f"Not a jisilu thread URL: {url}")
+    article_id, page = parsed
+    return get_page(article_id, page, max_age=max_age, force=force_update, headers=get_headers())
+
+def get_page_count(soup) -> int:
+    pagination = soup.find('div', class_='pagination')
+    max_page = 1
+    if pagination:
+        for link in pagination.find_all('a'):
+            text = link.get_text(strip=True)
+            if text.isdigit():
+                max_page = max(max_page, int(text))
+    return max_page
+
+def parse_article_header(soup) -> Dict:
     # 1. Article Info
     title_tag = soup.find('div', class_='aw-mod-head').find('h1') if soup.find('div', class_='aw-mod-head') else None
     title = title_tag.get_text(strip=True) if title_tag else "Unknown Title"
     
     # Content
     content_div = soup.find('div', class_='aw-question-detail-txt')
-    content = str(content_div) if content_div else ""
+    content = sanitize_html(content_div) if content_div else ""
     
     # Author (Try to find from meta)
     # The meta structure is messy, let's just use "Unknown" or parse if needed.
@@ -215,32 +256,81 @@ def get_jisilu_data(url: str, force_update: bool = False):
         if match:
             publish_time = match.group(0)
 
-    # 2. Comments
+    return {
+        "title": title,
+        "content": content,
+        "author": author,
+        "publish_time": publish_time,
+    }
+
+def extract_page_comments(soup) -> List[Dict]:
+    """Comments on one page, in page order."""
     comments_raw = []
-    
-    # Support Pagination (MVP: First Page Only)
-    # TODO: Loop through pages if needed.
-    
     comment_list_div = soup.find('div', class_='aw-mod-body aw-dynamic-topic')
     if comment_list_div:
-        items = comment_list_div.find_all('div', class_='aw-item')
-        for item in items:
-            # Check if it's a real comment (has id starting with answer_list)
-            if item.get('id', '').startswith('answer_list_'):
-                c_data = extract_comment_data(item)
-                if c_data:
-                    comments_raw.append(c_data)
+        # Real comments have an id starting with answer_list
+        items = [
+            item for item in comment_list_div.find_all('div', class_='aw-item')
+            if item.get('id', '').startswith('answer_list_')
+        ]
+        metas = parse_meta_batch(comment_meta_text(item) for item in items)
+        for item, meta in zip(items, metas):
+            c_data = extract_comment_data(item, meta)
+            if c_data:
+                comments_raw.append(c_data)
+    return comments_raw
+
+def iter_article_pages(url: str, force_update: bool = False, max_age: Optional[float] = None):
+    """
+    Yield (header, comments) per fetched page; header is only set for the
+    first page. Pages are visited so that comments come out roughly oldest
+    first: jisilu lists newest first, in which case the last page is
+    fetched right after page 1 and page 1's comments are yielded last.
+    """
+    parsed = parse_article_url(url)
+    if parsed is None:
+        raise ValueError(f"Not a jisilu thread URL: {url}")
+    article_id = parsed[0]
+    first_soup = bs4.BeautifulSoup(fetch_page(article_url(article_id), force_update, max_age), 'lxml')
+    header = parse_article_header(first_soup)
+    first_comments = extract_page_comments(first_soup)
+    page_count = get_page_count(first_soup)
+
+    timestamps = [c['timestamp'] for c in first_comments]
+    newest_first = timestamps != sorted(timestamps)
+    if not newest_first:
+        yield header, first_comments
+    else:
+        yield header, []
+
+    seen = {c['id'] for c in first_comments}
+    pages = range(page_count, 1, -1) if newest_first else range(2, page_count + 1)
+    for page in pages:
+        soup = bs4.BeautifulSoup(fetch_page(article_url(article_id, page), force_update, max_age), 'lxml')
+        # Guard against pages that repeat what we already have
+        comments = [c for c in extract_page_comments(soup) if c['id'] not in seen]
+        seen.update(c['id'] for c in comments)
+        yield None, comments
+
+    if newest_first:
+        yield None, first_comments
+
+def get_jisilu_data(url: str, force_update: bool = False, max_age: Optional[float] = None):
+    header = None
+    comments_raw = []
+    for page_header, comments in iter_article_pages(url, force_update, max_age):
+        header = header or page_header
+        comments_raw.extend(comments)
     
     # Sort comments by timestamp ascending (Oldest first)
     comments_raw.sort(key=lambda x: x['timestamp'])
 
     # 3. Build Tree
     comments_tree = build_comment_tree(comments_raw)
+    # Only needed for matching; comment_text() derives it again on demand
+    drop_derived_text(comments_tree)
     
     return {
-        "title": title,
-        "content": content,
-        "author": author,
-        "publish_time": publish_time,
+        **header,
         "comments": comments_tree
     }
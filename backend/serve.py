@@ -0,0 +1,28 @@
+import os
+import argparse
+import uvicorn
+
+def default_workers():
+    # WEB_CONCURRENCY is the conventional knob on most hosting platforms
+    env = os.environ.get("WEB_CONCURRENCY")
+    if env:
+        return int(env)
+    return os.cpu_count() or 1
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the API with multiple worker processes (no auto-reload).')
+    parser.add_argument('--host', default=os.environ.get("HOST", "0.0.0.0"), help='Bind address')
+    parser.add_argument('--port', type=int, default=int(os.environ.get("PORT", 8000)), help='Bind port')
+    parser.add_argument('--workers', '-w', type=int, default=default_workers(),
+                        help='Number of worker processes (default: $WEB_CONCURRENCY or CPU count)')
+    args = parser.parse_args()
+
+    # Workers coordinate through backend/storage.py: per-article file locks
+    # dedupe scrapes and serialise writes, and the cache is written atomically.
+    # Run from the backend directory so "main:app" resolves.
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    print(f"Starting {args.workers} workers on {args.host}:{args.port}")
+    uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers, reload=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import argparse
+from typing import Dict, Optional
+from storage import BACKEND_DIR, atomic_write_bytes, read_bytes, checksum, key_lock, CorruptedFileError
+
+# snapshots/<collection>.json, written by main.py on shutdown (SNAPSHOT=1) or by this CLI
+SNAPSHOT_DIR = os.path.join(BACKEND_DIR, "snapshots")
+# Articles carried in a snapshot
+SNAPSHOT_SIZE = 20
+# Hit counts from earlier runs of the API are scaled by this, once per run,
+# when the first worker of a run merges its hits in, so "hottest" follows
+# recent traffic.
+HIT_DECAY = 0.5
+
+
+def snapshot_path(collection: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, collection.replace("/", "__") + ".json")
+
+
+def _token(value):
+    # SQLite listing tokens are tuples, which come back from JSON as lists
+    return list(value) if isinstance(value, tuple) else value
+
+
+def build(store, hits: Dict[str, float], size: int = SNAPSHOT_SIZE, decayed_at: float = 0) -> Dict:
+    """
+    The encoded /api/history body and the stored bytes of the `size` most
+    requested articles (topped up with the newest ones), each tagged with
+    the store version it was read at. Versions are read first, so a write
+    racing the snapshot only makes an entry look stale, never fresh.
+    """
+    token = store.listing_token()
+    listing = store.list_articles()
+    history = json.dumps([{"id": item['id'], "title": item['title']} for item in listing],
+                         ensure_ascii=False, separators=(',', ':'))
+
+    hot = [article_id for article_id, _ in sorted(hits.items(), key=lambda kv: -kv[1])]
+    hot += [item['id'] for item in listing if item['id'] not in hits]
+    articles = []
+    for article_id in hot:
+        if len(articles) >= size:
+            break
+        version = store.updated_at(article_id)
+        raw = store.get_raw(article_id) if version is not None else None
+        if raw is None:
+            continue
+        articles.append({"id": article_id, "version": version, "body": raw[0].decode('utf-8'), "digest": raw[1]})
+
+    return {
+        "collection": store.collection,
+        "created_at": time.time(),
+        "history": {"token": _token(token), "body": history, "digest": checksum(history.encode('utf-8'))},
+        "hits": hits,
+        "decayed_at": decayed_at,
+        "articles": articles,
+    }
+
+
+def _read(path: str) -> Optional[Dict]:
+    if not os.path.exists(path):
+        return None
+    try:
+        return json.loads(read_bytes(path))
+    except (CorruptedFileError, ValueError) as e:
+        print(f"Ignoring unreadable snapshot {path}: {e}")
+        return None
+
+
+def write(store, hits: Optional[Dict[str, float]] = None, size: int = SNAPSHOT_SIZE,
+          counted_since: Optional[float] = None) -> str:
+    """
+    Write the snapshot of `store`, merging `hits` (counted since the epoch
+    time `counted_since`, the worker's boot) into the counts recorded so
+    far. Those are decayed only if that was not done since `counted_since`:
+    every worker of a run merges its hits, and the run counts once.
+    """
+    path = snapshot_path(store.collection)
+    with key_lock(f"snapshot:{store.collection}"):
+        previous = _read(path) or {}
+        merged = dict(previous.get("hits", {}))
+        decayed_at = previous.get("decayed_at", 0)
+        if hits:
+            if counted_since is None or decayed_at < counted_since:
+                merged = {k: v * HIT_DECAY for k, v in merged.items()}
+                decayed_at = time.time()
+            for article_id, count in hits.items():
+                merged[article_id] = merged.get(article_id, 0) + count
+        body = json.dumps(build(store, merged, size, decayed_at), ensure_ascii=False, separators=(',', ':'))
+        atomic_write_bytes(path, body.encode('utf-8'))
+    return path
+
+
+def load(store) -> Optional[Dict]:
+    """
+    Warm state for `store` from its snapshot: {"history": (token, body,
+    digest) or None, "articles": {id: (version, body, digest)}}. The
+    history is dropped if the listing changed since; articles are checked
+    against the store by the caller on use.
+    """
+    snapshot = _read(snapshot_path(store.collection))
+    if snapshot is None:
+        return None
+    history = snapshot.get("history")
+    token = store.listing_token()
+    warm_history = None
+    if history and token is not None and history["token"] == _token(token):
+        warm_history = (token, history["body"].encode('utf-8'), history["digest"])
+    articles = {
+        a["id"]: (a["version"], a["body"].encode('utf-8'), a["digest"]) for a in snapshot.get("articles", [])
+    }
+    return {"history": warm_history, "articles": articles}
+
+
+def main():
+    from article_store import get_store
+
+    parser = argparse.ArgumentParser(description='Write the warm-start snapshot the API loads with SNAPSHOT=1.')
+    parser.add_argument('--collection', '-c', default='cache', help='Store collection (cache, public or knowledge/<user>)')
+    parser.add_argument('--size', '-n', type=int, default=SNAPSHOT_SIZE, help='Articles to include')
+    args = parser.parse_args()
+
+    store = get_store(args.collection)
+    start = time.perf_counter()
+    path = write(store, size=args.size)
+    warm = load(store)
+    print(f"Wrote {path} ({os.path.getsize(path)} bytes, {len(warm['articles'])} articles) "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
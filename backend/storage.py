@@ -0,0 +1,277 @@
+import os
+import json
+import codecs
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locks only
+    fcntl = None
+
+# Absolute so every tool (API, CLIs, debug scripts) agrees on the location
+# regardless of the working directory it was started from.
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+# Scraped articles (the "cache" collection), raw pages and lock files
+CACHE_DIR = os.path.join(BACKEND_DIR, "cache")
+LOCK_DIR = os.path.join(CACHE_DIR, ".locks")
+
+CHECKSUM_SUFFIX = ".sha256"
+# Bytes read at a time by JsonObjectReader
+STREAM_CHUNK = 64 * 1024
+
+
+class CorruptedFileError(ValueError):
+    """Raised when a file does not match its recorded checksum."""
+
+
+def ensure_dir(directory):
+    os.makedirs(directory, exist_ok=True)
+
+
+def checksum(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def checksum_path(path):
+    return path + CHECKSUM_SUFFIX
+
+
+def _fsync_dir(directory):
+    # Make the rename itself durable. Not supported on every platform.
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _atomic_replace(path, data: bytes):
+    directory = os.path.dirname(os.path.abspath(path))
+    ensure_dir(directory)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        # mkstemp creates 0600; keep the existing file's mode, or use a normal readable one,
+        # since these files are also served statically.
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except FileNotFoundError:
+            mode = 0o644
+        os.chmod(tmp_path, mode)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_dir(directory)
+
+
+def _write_sidecar(path, data: bytes):
+    # The new hash first, then the one of the content still in place: the
+    # sidecar goes in before the data, so it matches whichever a crash (or a
+    # reader) between the two renames finds.
+    current = read_checksums(path)[:1]
+    if not current and os.path.exists(path):
+        # A file from before sidecars: hash it once
+        with open(path, 'rb') as f:
+            current = [checksum(f.read())]
+    hashes = [checksum(data)] + [h for h in current if h != checksum(data)]
+    _atomic_replace(checksum_path(path), "\n".join(hashes).encode('ascii'))
+
+
+def atomic_write_bytes(path, data: bytes, with_checksum: bool = True):
+    """
+    Write `data` to `path` via temp file + fsync + rename, so readers only
+    ever see the old or the new content, never a truncated file.
+    The checksum sidecar is renamed in before the data and lists the hashes
+    of both, so either content verifies; anything else, such as a torn
+    in-place write, is corruption.
+    """
+    if with_checksum:
+        _write_sidecar(path, data)
+    _atomic_replace(path, data)
+
+
+def atomic_write_text(path, text: str, with_checksum: bool = True):
+    atomic_write_bytes(path, text.encode('utf-8'), with_checksum=with_checksum)
+
+
+def atomic_write_json(path, data, with_checksum: bool = True, indent=2):
+    text = json.dumps(data, ensure_ascii=False, indent=indent)
+    atomic_write_text(path, text, with_checksum=with_checksum)
+
+
+def read_checksums(path):
+    """The checksums `path` may have (newest first), or [] if there is no sidecar."""
+    try:
+        with open(checksum_path(path), 'r', encoding='ascii') as f:
+            return f.read().split()
+    except FileNotFoundError:
+        return []
+
+
+def read_bytes(path, verify: bool = True) -> bytes:
+    """
+    Read `path`, verifying it against its checksum sidecar when present.
+    Files written before the sidecar existed are accepted as-is; the next
+    write adds one.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if verify:
+        expected = read_checksums(path)
+        if expected and checksum(data) not in expected:
+            raise CorruptedFileError(f"Checksum mismatch for {path}")
+    return data
+
+
+def read_text(path, verify: bool = True) -> str:
+    return read_bytes(path, verify=verify).decode('utf-8')
+
+
+def read_json(path, verify: bool = True):
+    return json.loads(read_text(path, verify=verify))
+
+
+class JsonObjectReader:
+    """
+    The members of a JSON object file, read STREAM_CHUNK bytes at a time:
+    for each key from members(), the caller takes the value with value(),
+    or with elements() one array element at a time, so only the element at
+    hand is held in memory. `sha256` covers the bytes read so far.
+    """
+
+    def __init__(self, f):
+        self._file = f
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self.sha256 = hashlib.sha256()
+
+    def _fill(self) -> bool:
+        data = self._file.read(STREAM_CHUNK)
+        if not data:
+            return False
+        self.sha256.update(data)
+        self._buf = self._buf[self._pos:] + self._utf8.decode(data)
+        self._pos = 0
+        return True
+
+    def read_rest(self):
+        """Read (and hash) the remainder of the file."""
+        while self._fill():
+            pass
+
+    def _peek(self) -> str:
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < len(self._buf) or not self._fill():
+                return self._buf[self._pos:self._pos + 1]
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            raise ValueError(f"Expected {char!r} at {self._pos} in {self._file.name}")
+        self._pos += 1
+
+    def value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number cut off by the chunk end decodes too; be sure it ended
+            if end < len(self._buf) or not self._fill():
+                self._pos = end
+                return value
+
+    def _more(self, close: str) -> bool:
+        char = self._peek()
+        self._pos += 1
+        if char == ",":
+            return True
+        if char != close:
+            raise ValueError(f"Expected ',' or {close!r} in {self._file.name}")
+        return False
+
+    def members(self):
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            self._expect(":")
+            yield key  # the caller reads the value before asking for the next key
+            if not self._more("}"):
+                return
+
+    def elements(self):
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if not self._more("]"):
+                return
+
+
+def remove(path):
+    for p in (path, checksum_path(path)):
+        try:
+            os.remove(p)
+        except FileNotFoundError:
+            pass
+
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _thread_lock(key):
+    with _thread_locks_guard:
+        lock = _thread_locks.get(key)
+        if lock is None:
+            lock = _thread_locks[key] = threading.Lock()
+        return lock
+
+
+def _lock_file_name(key):
+    # Keys may contain path separators or other unsafe characters.
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in key)
+    return f"{safe[:64]}-{hashlib.md5(key.encode()).hexdigest()[:8]}.lock"
+
+
+@contextmanager
+def key_lock(key: str):
+    """
+    Exclusive lock for `key`, held across threads of this process and across
+    processes (e.g. uvicorn workers) sharing the same backend directory.
+    """
+    with _thread_lock(key):
+        if fcntl is None:
+            yield
+            return
+        ensure_dir(LOCK_DIR)
+        with open(os.path.join(LOCK_DIR, _lock_file_name(key)), 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
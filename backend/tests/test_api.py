@@ -0,0 +1,85 @@
+import json
+
+import pytest
+from starlette.requests import Request
+
+import main
+from article_store import JsonArticleStore
+from storage import checksum
+
+
+ARTICLE = {
+    "id": "1", "title": "t", "content": "<p>body</p>", "author": "alice", "version": 2,
+    "comments": [{
+        "id": "10", "author": "bob", "author_avatar": "", "content": "<p>hi</p>", "content_text": "hi",
+        "time": "2026-02-21 16:51", "timestamp": 1771663860, "location": "北京",
+        "quoted_text": "body", "reply_to_user": "alice", "reply_confidence": 1.0,
+        "children": [{"id": "11", "author": "alice", "content": "<p>yo</p>", "time": "2026-02-21 16:52",
+                      "timestamp": 1771663920, "quoted_text": None, "children": []}],
+    }],
+}
+
+
+def get(article_id, etag=None):
+    headers = [(b"if-none-match", etag.encode())] if etag else []
+    return main.article_response(Request({"type": "http", "method": "GET", "headers": headers}), article_id)
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    store = JsonArticleStore("cache", str(tmp_path))
+    monkeypatch.setattr(main, "store", store)
+    monkeypatch.setattr(main, "_public_bodies", main.OrderedDict())
+    monkeypatch.setattr(main, "_warm_articles", {})
+    return store
+
+
+def test_internal_fields_are_not_served(store):
+    store.save(ARTICLE)
+    body = json.loads(get("1").body)
+    assert "version" not in body
+    assert "authors" not in body
+    reply = body["comments"][0]
+    assert reply["reply_confidence"] == 1.0
+    # Stored as an index into `authors`, served as the name
+    assert (reply["author"], reply["children"][0]["author"]) == ("bob", "alice")
+    for comment in (reply, reply["children"][0]):
+        assert not {"timestamp", "quoted_text", "content_text"} & set(comment)
+
+
+def test_etag_is_the_hash_of_the_body_sent(store):
+    store.save(ARTICLE)
+    response = get("1")
+    assert response.headers["etag"] == f'"{checksum(response.body)}"'
+    assert get("1", response.headers["etag"]).status_code == 304
+
+    store.save(dict(ARTICLE, title="t2"))
+    changed = get("1", response.headers["etag"])
+    assert changed.status_code == 200
+    assert json.loads(changed.body)["title"] == "t2"
+    assert changed.headers["etag"] == f'"{checksum(changed.body)}"'
+
+
+def test_missing_article(store):
+    assert get("404") is None
+
+
+class FakeMedia:
+    def localize_article(self, data):
+        data["comments"][0]["author_avatar"] = "/media/abc.jpg"
+        return 1
+
+
+def test_media_is_localized_after_the_article_is_stored(store, monkeypatch):
+    monkeypatch.setattr(main, "media", FakeMedia())
+    monkeypatch.setattr(main, "index_saved", lambda *args: None)
+    store.save(dict(ARTICLE))
+    version = store.updated_at("1")
+
+    main.localize_stored("1", version)
+    assert store.get("1")["comments"][0]["author_avatar"] == "/media/abc.jpg"
+
+    # A re-scrape stored a newer copy in the meantime: leave it alone
+    store.save(dict(ARTICLE, title="t2"))
+    main.localize_stored("1", version)
+    assert store.get("1")["comments"][0]["author_avatar"] == ""
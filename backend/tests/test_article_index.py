@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+import article_index
+from article_store import JsonArticleStore, SqliteArticleStore
+
+
+ARTICLE = {
+    "id": "1", "title": "t", "author": "alice", "content": "<p>body</p>",
+    "comments": [
+        {"id": "10", "author": "bob", "content": "a", "children": [
+            {"id": "11", "author": "alice", "content": "b", "children": [
+                {"id": "12", "author": "bob", "content": "c", "children": []},
+            ]},
+            {"id": "13", "author": "carol", "content": "d", "children": []},
+        ]},
+        {"id": "14", "author": "bob", "content": "e", "children": []},
+    ],
+}
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(article_index, "_cache", article_index.OrderedDict())
+    if request.param == "json":
+        store = JsonArticleStore("cache", str(tmp_path / "cache"))
+    else:
+        store = SqliteArticleStore("cache", str(tmp_path / "articles.db"))
+    store.save(json.loads(json.dumps(ARTICLE)))
+    return store
+
+
+def ids(comments):
+    return [(c["id"], ids(c["children"])) for c in comments]
+
+
+def test_index_is_persisted_at_save(store, monkeypatch):
+    stored = store.get_index("1")
+    assert stored["version"] == store.updated_at("1")
+    assert stored["ids"] == ["10", "11", "12", "13", "14"]
+
+    # A fresh process: the view comes from the stored index, without loading the tree
+    monkeypatch.setattr(store, "get", None)
+    view = article_index.view(store, "1", author="alice")
+    assert ids(view["comments"]) == [("10", [("11", [])])]
+    assert view["matched_ids"] == ["11"]
+    assert view["title"] == "t"
+
+
+def test_subtree_view(store):
+    view = article_index.view(store, "1", root="11")
+    assert ids(view["comments"]) == [("10", [("11", [("12", [])])])]
+    assert article_index.view(store, "1", root="99") is False
+    assert article_index.view(store, "2") is None
+
+
+def test_replaced_article_is_reindexed(store):
+    article_index.view(store, "1", author="bob")
+    changed = json.loads(json.dumps(ARTICLE))
+    changed["comments"].insert(0, {"id": "9", "author": "bob", "content": "z", "children": []})
+    store.save(changed)
+    view = article_index.view(store, "1", author="bob")
+    assert view["matched_ids"] == ["9", "10", "12", "14"]
+
+
+def test_stale_index_is_rebuilt(store):
+    # An index left behind by an older copy of the article
+    stale = article_index.ArticleIndex.build(ARTICLE["comments"][1:], store.updated_at("1"))
+    store.save_index("1", stale)
+    view = article_index.view(store, "1", author="bob")
+    assert view["matched_ids"] == ["10", "12", "14"]
+    assert store.get_index("1")["ids"][0] == "10"
+
+
+def test_json_views_decode_the_file_once_per_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(article_index, "_cache", article_index.OrderedDict())
+    store = JsonArticleStore("cache", str(tmp_path))
+    store.save(json.loads(json.dumps(ARTICLE)))
+    assert article_index.view(store, "1", author="carol")["matched_ids"] == ["13"]
+
+    # Warm: neither the article nor the index file is read again
+    monkeypatch.setattr(store, "_read", None)
+    monkeypatch.setattr(store, "get_index", None)
+    assert article_index.view(store, "1", root="11")["matched_ids"] == ["11", "12"]
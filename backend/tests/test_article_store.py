@@ -0,0 +1,20 @@
+import article_store
+from article_store import get_store, JsonArticleStore, SqliteArticleStore
+
+
+def test_public_stays_json_under_sqlite(monkeypatch, tmp_path):
+    monkeypatch.setenv("ARTICLE_STORE", "sqlite")
+    monkeypatch.setattr(article_store, "DEFAULT_DB_PATH", str(tmp_path / "articles.db"))
+    monkeypatch.setattr(article_store, "_stores", {})
+    assert isinstance(get_store("public"), JsonArticleStore)
+    assert isinstance(get_store("cache"), SqliteArticleStore)
+
+
+def test_public_files_have_no_sidecar(tmp_path):
+    store = JsonArticleStore("public", str(tmp_path))
+    store.save({"id": "1", "title": "t", "content": "", "comments": []})
+    assert (tmp_path / "1.json").exists()
+    assert not (tmp_path / "1.json.sha256").exists()
+    cache = JsonArticleStore("cache", str(tmp_path / "cache"))
+    cache.save({"id": "1", "title": "t", "content": "", "comments": []})
+    assert (tmp_path / "cache" / "1.json.sha256").exists()
@@ -0,0 +1,107 @@
+import os
+from collections import Counter
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import columnar
+from article_store import JsonArticleStore
+from columnar import ColumnarStore, flatten_article, load_table
+from comment_query import author_counts, filter_table, location_counts
+from meta_parser import parse_meta
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ARTICLE = {
+    "id": "1", "title": "t",
+    "comments": [
+        {"id": "10", "author": "bob", "content": "<p>hello</p>", "time": "2026-02-21 16:51 来自北京", "children": [
+            {"id": "11", "author": "alice", "content": "<p>hi</p>", "time": "2026-02-21 16:52", "location": "上海",
+             "children": []},
+        ]},
+    ],
+}
+
+
+def source_comments():
+    """The comments of the repo's sample thread and knowledge files, walked from JSON."""
+    sources = [("cache", JsonArticleStore("cache", os.path.join(BACKEND_DIR, "cache")).get("517247"))]
+    knowledge = JsonArticleStore("knowledge/gaigai777", os.path.join(BACKEND_DIR, "knowledge", "gaigai777"))
+    sources += [("knowledge/gaigai777", knowledge.get(article_id)) for article_id in sorted(knowledge.list_ids())]
+    for collection, data in sources:
+        stack = list(data['comments'])
+        while stack:
+            comment = stack.pop()
+            stack.extend(comment.get('children') or [])
+            yield collection, data, comment
+
+
+def test_partition_round_trip(tmp_path):
+    store = ColumnarStore(str(tmp_path))
+    store.append("cache", ARTICLE, version=1.0)
+    table = load_table(str(tmp_path))
+    rows = flatten_article(ARTICLE)
+    for name in ("article_id", "comment_id", "parent_id", "text_length"):
+        assert table[name].tolist() == rows[name]
+    assert [table.authors[code] for code in table['author']] == ["bob", "alice"]
+    assert [table.locations[code] for code in table['location']] == ["北京", "上海"]
+    assert table['parent_id'].tolist() == [-1, 10]
+    assert list(table.collections) == ["cache"]
+    assert store.load_manifest()["cache/1"]["rows"] == 2
+
+
+def test_ingest_appends_to_the_manifest_log(tmp_path):
+    store = ColumnarStore(str(tmp_path))
+    store.append("cache", ARTICLE, version=1.0)
+    store.append("cache", dict(ARTICLE, id="2"), version=2.0)
+    store.append("cache", ARTICLE, version=3.0)
+    # manifest.json is only written when the log is folded in
+    assert not os.path.exists(store.manifest_path)
+    with open(store.log_path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 3
+    manifest = store.load_manifest()
+    assert {key: entry["version"] for key, entry in manifest.items()} == {"cache/1": 3.0, "cache/2": 2.0}
+
+    store._update_manifest({"cache/2": None})
+    assert list(store.load_manifest()) == ["cache/1"]
+    assert not os.path.exists(os.path.join(str(tmp_path), "parts", manifest["cache/2"]["file"]))
+
+
+def test_log_is_folded_into_the_manifest(tmp_path, monkeypatch):
+    monkeypatch.setattr(columnar, "MANIFEST_LOG_LIMIT", 0)
+    store = ColumnarStore(str(tmp_path))
+    store.append("cache", ARTICLE, version=1.0)
+    assert not os.path.exists(store.log_path)
+    store.append("cache", dict(ARTICLE, id="2"), version=2.0)
+    assert sorted(store.load_manifest()) == ["cache/1", "cache/2"]
+
+
+def test_comment_query_matches_the_json_source(tmp_path):
+    store = ColumnarStore(str(tmp_path))
+    ingested = set()
+    for collection, data, _ in source_comments():
+        if (collection, data['id']) not in ingested:
+            ingested.add((collection, data['id']))
+            store.append(collection, data)
+    table = load_table(str(tmp_path))
+
+    comments = list(source_comments())
+    authors = Counter(c.get('author') or collection.split('/', 1)[1] for collection, _, c in comments)
+    assert Counter(dict(author_counts(table, limit=len(authors)))) == authors
+    assert len(table) == len(comments)
+
+    author, expected = authors.most_common(1)[0]
+    assert int(filter_table(table, author=author).sum()) == expected
+    assert not filter_table(table, author="nobody").any()
+
+    stamps = sorted(parse_meta(c.get('time') or "").timestamp or c.get('timestamp') for _, _, c in comments)
+    since, until = stamps[len(stamps) // 4], stamps[3 * len(stamps) // 4]
+    mask = filter_table(table, since=since, until=until)
+    assert int(mask.sum()) == sum(1 for t in stamps if since <= t < until)
+
+    by_author = [c for collection, _, c in comments if (c.get('author') or collection.split('/', 1)[1]) == author]
+    locations = Counter(c['location'] if c.get('location') is not None else parse_meta(c.get('time') or "").location
+                        for c in by_author)
+    assert Counter(dict(location_counts(table, filter_table(table, author=author), limit=100))) == locations
@@ -0,0 +1,31 @@
+from article_store import JsonArticleStore
+from compaction import sanitize_html, compact_article
+
+
+def test_empty_table_cells_are_kept():
+    html = "<div><table><tr><th></th><th>b</th></tr><tr><td></td><td>1</td></tr></table></div>"
+    assert sanitize_html(html) == "<table><tr><th></th><th>b</th></tr><tr><td></td><td>1</td></tr></table>"
+
+
+def test_image_links_are_kept():
+    html = '<div><a href="/x"><img src="/a.png"></a><span> </span></div>'
+    assert sanitize_html(html) == '<a href="https://www.jisilu.cn/x"><img src="https://www.jisilu.cn/a.png"/></a>'
+
+
+def test_link_around_an_unsafe_image_is_dropped():
+    assert sanitize_html('<div><a href="/x"><img src="javascript:alert(1)"></a>text</div>') == "text"
+
+
+def test_articles_without_named_authors_get_no_authors_list():
+    data = {"id": "1", "title": "t", "comments": [{"id": "c1", "content": "> q\n\nreply"}]}
+    assert "authors" not in compact_article(data)
+
+
+def test_knowledge_files_are_stored_as_given(tmp_path):
+    store = JsonArticleStore("knowledge/someone", str(tmp_path))
+    data = {"id": "1", "title": "t", "author": "someone",
+            "comments": [{"id": "answer_list_2", "content": "> q\n\nreply", "time": "2024-05-03 14:56 来自北京"}]}
+    store.save(data)
+    text = (tmp_path / "1.json").read_text(encoding="utf-8")
+    assert text.startswith('{\n  "id": "1"')
+    assert store.get("1") == data
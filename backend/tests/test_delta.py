@@ -0,0 +1,60 @@
+import copy
+
+from delta import apply_delta, compute_delta, write_delta, catch_up, deltas_since
+
+
+def comment(cid, content, *children, **fields):
+    return {"id": cid, "author": f"user{cid}", "content": content, "time": "2026-02-21 16:51",
+            "children": list(children), **fields}
+
+
+OLD = {
+    "id": "1", "title": "t", "content": "body", "version": 1,
+    "comments": [
+        comment("10", "a", comment("11", "a.1"), comment("12", "a.2", comment("13", "a.2.1"))),
+        comment("20", "b", comment("21", "b.1")),
+        comment("30", "c", location="北京"),
+    ],
+}
+
+
+def new_version():
+    new = copy.deepcopy(OLD)
+    new["title"] = "t (edited)"
+    a, b, c = new["comments"]
+    moved = a["children"][1]["children"].pop()  # 13 moves from 12 ...
+    b["children"].append(moved)                    # ... to 20
+    a["children"].pop(0)                           # 11 deleted
+    c["content"] = "c (edited)"
+    del c["location"]                              # field removed
+    b["children"].append(comment("22", "new reply"))
+    new["comments"] = [c, a, b, comment("40", "new top")]
+    return new
+
+
+def test_apply_delta_round_trip():
+    new = new_version()
+    delta = compute_delta(OLD, new)
+    assert delta["moved"] == ["13"]
+    assert delta["removed"] == ["11"]
+    assert apply_delta(OLD, delta) == new
+
+
+def test_identical_articles_have_no_delta():
+    assert compute_delta(OLD, copy.deepcopy(OLD)) is None
+
+
+def test_catch_up_applies_the_chain(tmp_path):
+    middle = new_version()
+    latest = copy.deepcopy(middle)
+    latest["comments"].pop(1)                      # 10 and its subtree deleted
+    latest["comments"][0]["children"].append(comment("31", "c.1"))
+    for version, (old, new) in enumerate([(OLD, middle), (middle, latest)], start=1):
+        delta = compute_delta(old, new)
+        delta.update({"id": "1", "from_version": version, "to_version": version + 1})
+        write_delta(str(tmp_path), "1", delta)
+
+    assert catch_up(OLD, str(tmp_path), 3) == dict(latest, version=3)
+    # A client two versions behind whose first delta was pruned refetches
+    (tmp_path / "deltas" / "1" / "2.json").unlink()
+    assert deltas_since(str(tmp_path), "1", 1, 3) is None
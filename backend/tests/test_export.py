@@ -0,0 +1,95 @@
+import json
+import tracemalloc
+
+import pytest
+
+import media_cache
+import storage
+from article_store import JsonArticleStore, SqliteArticleStore
+from export import iter_export, media_rewriter, walk
+
+
+ARTICLE = {
+    "id": "1", "title": "t", "author": "alice",
+    "content": '<p><a href="/media/aa.jpg"><img src="/media/aa_t.jpg"></a></p>',
+    "comments": [
+        {"id": "10", "author": "bob", "content": "<p>one</p>", "time": "2026-02-21 16:51", "children": [
+            {"id": "11", "author": "alice", "content": "<p>two</p>", "time": "2026-02-21 16:52", "children": [
+                {"id": "12", "author": "bob", "content": "<p>three</p>", "time": "2026-02-21 16:53", "children": []},
+            ]},
+        ]},
+        {"id": "13", "author": "carol", "content": '<img src="https://elsewhere/x.png">',
+         "time": "2026-02-21 16:54", "children": []},
+    ],
+}
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "json":
+        store = JsonArticleStore("cache", str(tmp_path / "cache"))
+    else:
+        store = SqliteArticleStore("cache", str(tmp_path / "articles.db"))
+    store.save(json.loads(json.dumps(ARTICLE)))
+    return store
+
+
+def test_iter_article_matches_the_stored_tree(store, monkeypatch):
+    import article_store
+    monkeypatch.setattr(article_store, "ITER_PAGE_SIZE", 2)
+    # Chunks that split keys, strings and numbers
+    monkeypatch.setattr(storage, "STREAM_CHUNK", 7)
+    article, comments = store.iter_article("1")
+    assert "comments" not in article
+    assert article["title"] == "t"
+
+    streamed = [(c["id"], c["author"], depth) for c, depth in comments]
+    expected = [(c["id"], c["author"], depth) for c, depth in walk(store.get("1")["comments"])]
+    assert streamed == expected == [("10", "bob", 0), ("11", "alice", 1), ("12", "bob", 2), ("13", "carol", 0)]
+    assert store.iter_article("missing") is None
+
+
+def test_json_export_memory_is_bounded_by_a_comment(tmp_path):
+    store = JsonArticleStore("cache", str(tmp_path))
+    comments = [{"id": str(i), "author": f"user{i % 50}", "content": "<p>" + "x" * 2000 + "</p>",
+                 "time": "2026-02-21 16:51", "children": []} for i in range(2000)]
+    store.save({"id": "1", "title": "t", "content": "", "comments": comments})
+    size = len(store.get_raw("1")[0])
+
+    tracemalloc.start()
+    try:
+        article, stream = store.iter_article("1")
+        assert sum(1 for _ in stream) == 2000
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak < size / 10
+
+
+def test_torn_json_is_not_exported(tmp_path):
+    store = JsonArticleStore("cache", str(tmp_path))
+    store.save(json.loads(json.dumps(ARTICLE)))
+    with open(store.path("1"), "r+b") as f:
+        f.truncate(60)
+    with pytest.raises(storage.CorruptedFileError):
+        store.iter_article("1")
+
+
+def test_media_links_are_made_absolute(store):
+    article, comments = store.iter_article("1")
+    exported = "".join(iter_export(article, comments, "html", media_rewriter("cache", "http://host:8000/")))
+    assert 'href="http://host:8000/media/aa.jpg"' in exported
+    assert 'src="http://host:8000/media/aa_t.jpg"' in exported
+    assert 'src="https://elsewhere/x.png"' in exported
+
+
+def test_media_links_fall_back_to_the_original_urls(store, monkeypatch, tmp_path):
+    monkeypatch.setattr(media_cache, "MEDIA_DIR", str(tmp_path / "media"))
+    (tmp_path / "media").mkdir()
+    (tmp_path / "media" / media_cache.URL_MAP_NAME).write_text(
+        json.dumps({"https://jisilu/a.jpg": {"file": "aa.jpg", "thumb": "aa_t.jpg"}})
+    )
+    article, comments = store.iter_article("1")
+    exported = "".join(iter_export(article, comments, "md", media_rewriter("cache")))
+    assert "/media/" not in exported
+    assert "https://jisilu/a.jpg" in exported
@@ -0,0 +1,117 @@
+import threading
+import time
+
+import pytest
+import requests
+
+import governor as governor_module
+from governor import RequestGovernor, RequestBlockedError, CircuitOpenError
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, text="<div class='aw-item'></div>"):
+        self.status_code = status_code
+        self.headers = {"Content-Type": "text/html"}
+        self.text = text
+
+
+class FakeSession:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+
+    def request(self, method, url, **kwargs):
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture(autouse=True)
+def no_pacing(monkeypatch):
+    monkeypatch.setattr(governor_module, "START_INTERVAL", 0.0)
+    monkeypatch.setattr(governor_module, "MIN_INTERVAL", 0.0)
+    monkeypatch.setattr(governor_module, "MAX_INTERVAL", 0.0)
+
+
+def test_circuit_is_shared_between_processes(tmp_path):
+    # Two governors on one state file stand in for two worker processes
+    path = str(tmp_path / "governor.json")
+    worker_a = RequestGovernor(failure_threshold=2, state_path=path)
+    worker_b = RequestGovernor(failure_threshold=2, state_path=path)
+
+    with pytest.raises(RequestBlockedError):
+        worker_a.get("u", session=FakeSession(FakeResponse(429)))
+    with pytest.raises(RequestBlockedError):
+        worker_b.get("u", session=FakeSession(FakeResponse(403)))
+    with pytest.raises(CircuitOpenError):
+        worker_a.get("u", session=FakeSession(FakeResponse()))
+    assert worker_b.snapshot()["failures"] == 2
+
+
+def test_additive_increase_is_shared(tmp_path):
+    path = str(tmp_path / "governor.json")
+    worker_a = RequestGovernor(state_path=path)
+    worker_b = RequestGovernor(state_path=path)
+    worker_a.get("u", session=FakeSession(FakeResponse()))
+    worker_b.get("u", session=FakeSession(FakeResponse()))
+    state = worker_a.snapshot()
+    assert state["limit"] == 2.5  # 1 + 1/1, then 2 + 1/2
+    assert state["leases"] == {}
+
+
+def test_lost_lease_expires(tmp_path, monkeypatch):
+    monkeypatch.setattr(governor_module, "LEASE_TIMEOUT", 0.05)
+    governor = RequestGovernor(state_path=str(tmp_path / "governor.json"))
+    lost = governor._acquire()  # never released, as if its process died
+    assert list(governor.snapshot()["leases"]) == [lost]
+    time.sleep(0.1)
+    # The only slot (limit 1) is free again
+    token = governor._acquire()
+    assert list(governor.snapshot()["leases"]) == [token]
+
+
+def test_failed_probe_reopens_the_circuit(tmp_path, monkeypatch):
+    governor = RequestGovernor(failure_threshold=1, cooldown=0.05, state_path=str(tmp_path / "governor.json"))
+    with pytest.raises(RequestBlockedError):
+        governor.get("u", session=FakeSession(FakeResponse(429)))
+    time.sleep(0.1)
+
+    # Half open: the probe hits a network error, which must not count as a success
+    with pytest.raises(requests.ConnectionError):
+        governor.get("u", session=FakeSession(requests.ConnectionError("reset")))
+    assert governor.snapshot()["failures"] == 1
+    with pytest.raises(CircuitOpenError):
+        governor.get("u", session=FakeSession(FakeResponse()))
+
+    time.sleep(0.1)
+    governor.get("u", session=FakeSession(FakeResponse()))
+    assert governor.snapshot()["failures"] == 0
+
+
+def test_network_error_slows_down_without_resetting_failures(tmp_path):
+    governor = RequestGovernor(failure_threshold=3, state_path=str(tmp_path / "governor.json"))
+    governor.get("u", session=FakeSession(FakeResponse()))
+    with pytest.raises(RequestBlockedError):
+        governor.get("u", session=FakeSession(FakeResponse(403)))
+    with pytest.raises(requests.Timeout):
+        governor.get("u", session=FakeSession(requests.Timeout()))
+    state = governor.snapshot()
+    assert state["failures"] == 1
+    assert state["limit"] == 1.0
+
+
+def test_waiting_does_not_rewrite_the_state(tmp_path, monkeypatch):
+    governor = RequestGovernor(state_path=str(tmp_path / "governor.json"))
+    held = governor._acquire()  # the only slot (limit 1)
+    writes = []
+    real_write = governor_module.atomic_write_json
+    monkeypatch.setattr(governor_module, "atomic_write_json", lambda *a, **k: (writes.append(1), real_write(*a, **k)))
+    monkeypatch.setattr(governor_module, "POLL_INTERVAL", 0.01)
+
+    waiter = threading.Thread(target=governor._acquire)
+    waiter.start()
+    time.sleep(0.2)  # ~20 polls
+    assert writes == []
+    governor._release(held, governor_module.ABORTED)
+    waiter.join(timeout=5)
+    assert len(writes) == 2  # the release and the waiter's lease
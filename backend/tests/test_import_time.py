@@ -0,0 +1,19 @@
+import os
+
+import pytest
+
+from check_import_time import BUDGETS, HEAVY, measure
+
+# Slow CI machines: IMPORT_TIME_SCALE=3 triples every budget
+SCALE = float(os.environ.get("IMPORT_TIME_SCALE", "1"))
+RUNS = 2
+
+
+@pytest.mark.parametrize("module", sorted(BUDGETS))
+def test_import_is_fast_and_light(module):
+    best, loaded = None, set()
+    for _ in range(RUNS):
+        total, loaded = measure(module)
+        best = total if best is None else min(best, total)
+    assert not set(HEAVY) & loaded, f"import {module} loads {sorted(set(HEAVY) & loaded)}"
+    assert best <= BUDGETS[module] * SCALE, f"import {module} took {best:.1f} ms"
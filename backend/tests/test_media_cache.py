@@ -0,0 +1,11 @@
+import importlib
+
+import media_cache
+
+
+def test_media_base_url_gets_one_trailing_slash(monkeypatch):
+    for value in ("https://cdn.example/media", "https://cdn.example/media/", "https://cdn.example/media//"):
+        monkeypatch.setenv("MEDIA_BASE_URL", value)
+        assert importlib.reload(media_cache).MediaCache().url("a.jpg") == "https://cdn.example/media/a.jpg"
+    monkeypatch.delenv("MEDIA_BASE_URL")
+    assert importlib.reload(media_cache).MEDIA_URL == "/media/"
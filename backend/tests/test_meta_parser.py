@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from meta_parser import BEIJING, parse_meta, parse_time
+
+
+def at(*args) -> int:
+    return int(datetime(*args, tzinfo=BEIJING).timestamp())
+
+
+NOW = at(2026, 1, 5, 10, 0)
+
+
+def test_month_day_later_than_now_is_last_year():
+    assert parse_time("12-31 23:00", NOW) == at(2025, 12, 31, 23, 0)
+    assert parse_time("01-05 09:59", NOW) == at(2026, 1, 5, 9, 59)
+    assert parse_time("01-05 10:01", NOW) == at(2025, 1, 5, 10, 1)
+    assert parse_meta("12-31 23:00 来自北京", NOW).time == "2025-12-31 23:00"
+
+
+def test_february_29_is_the_last_leap_year():
+    assert parse_time("02-29 08:00", at(2026, 3, 1, 0, 0)) == at(2024, 2, 29, 8, 0)
+    assert parse_time("02-29 08:00", at(2028, 3, 1, 0, 0)) == at(2028, 2, 29, 8, 0)
+    assert parse_time("02-30 08:00", NOW) is None
+
+
+def test_day_words():
+    assert parse_time("今天 09:12", NOW) == at(2026, 1, 5, 9, 12)
+    assert parse_time("昨天 09:12", NOW) == at(2026, 1, 4, 9, 12)
+    # Across the year boundary
+    assert parse_time("前天 23:59", at(2026, 1, 1, 8, 0)) == at(2025, 12, 30, 23, 59)
+    assert parse_time("昨天 24:00", NOW) is None
+
+
+def test_ago():
+    assert parse_time("5分钟前", NOW) == NOW - 300
+    assert parse_time("3小时前", NOW) == NOW - 3 * 3600
+    assert parse_time("刚刚", NOW) == NOW
+    meta = parse_meta("5分钟前 来自上海", NOW)
+    assert (meta.time, meta.location) == ("2026-01-05 09:55", "上海")
@@ -0,0 +1,60 @@
+from scraper import ReplyResolver, build_comment_tree
+
+
+def comment(cid, author, text, quote=None, reply_to=None):
+    return {"id": cid, "author": author, "content_text": text, "quoted_text": quote,
+            "reply_to_user": reply_to, "children": []}
+
+
+SOURCE = "可转债下修之后溢价率明显回落，双低策略这两周的表现比去年同期好不少"
+
+
+def resolve_against(earlier, reply):
+    resolver = ReplyResolver()
+    for c in earlier:
+        resolver.add(c)
+    return resolver.resolve(reply)
+
+
+def test_exact_quote():
+    source = comment("1", "alice", SOURCE)
+    reply = comment("3", "bob", "同意", quote=SOURCE)
+    assert resolve_against([source, comment("2", "carol", "今天大跌")], reply) is source
+    assert reply["reply_confidence"] == 1.0
+
+
+def test_edited_quote():
+    source = comment("1", "alice", SOURCE)
+    # Truncated, re-spaced, one character changed
+    quote = "可转债下修之后 溢价率明显回落，双低策略这两周的表观"
+    reply = comment("2", "bob", "同意", quote=quote)
+    assert resolve_against([source], reply) is source
+    assert 0.6 <= reply["reply_confidence"] < 1.0
+
+
+def test_ambiguous_quote_prefers_quoted_author_then_latest():
+    first = comment("1", "alice", SOURCE)
+    repost = comment("2", "carol", "转一下：" + SOURCE)
+    by_author = comment("3", "bob", "同意", quote=SOURCE, reply_to="alice")
+    assert resolve_against([first, repost], by_author) is first
+    anonymous = comment("4", "bob", "同意", quote=SOURCE)
+    assert resolve_against([first, repost], anonymous) is repost
+    assert anonymous["reply_confidence"] == 1.0
+
+
+def test_quote_of_a_quote_is_not_matched_by_the_quoter():
+    # 2 quotes 1; a later quote of 1's text belongs to 1, never to 2
+    source = comment("1", "alice", SOURCE)
+    quoter = comment("2", "carol", "有道理", quote=SOURCE, reply_to="alice")
+    late = comment("3", "bob", "+1", quote=SOURCE)
+    tree = build_comment_tree([source, quoter, late])
+    assert [c["id"] for c in tree] == ["1"]
+    assert [c["id"] for c in tree[0]["children"]] == ["2", "3"]
+
+
+def test_no_confidence_without_a_quote_match():
+    source = comment("1", "alice", SOURCE)
+    reply = comment("2", "bob", "@alice 说得对", reply_to="alice")
+    reply["reply_confidence"] = 0.9  # left over from an earlier resolution
+    assert resolve_against([source], reply) is source
+    assert "reply_confidence" not in reply
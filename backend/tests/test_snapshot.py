@@ -0,0 +1,22 @@
+import time
+
+import snapshot
+from article_store import JsonArticleStore
+
+
+def test_hits_decay_once_per_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    store = JsonArticleStore("cache", str(tmp_path / "cache"))
+    store.save({"id": "1", "title": "t", "content": "", "comments": []})
+
+    snapshot.write(store, {"1": 8}, counted_since=time.time())
+    run_started = time.time()
+    # Two workers of the next run shut down one after the other
+    snapshot.write(store, {"1": 2}, counted_since=run_started)
+    snapshot.write(store, {"1": 2}, counted_since=run_started)
+    # A snapshot written without hits (the CLI) changes nothing
+    snapshot.write(store)
+    assert snapshot._read(snapshot.snapshot_path("cache"))["hits"] == {"1": 8 * snapshot.HIT_DECAY + 4}
+
+    snapshot.write(store, {"1": 1}, counted_since=time.time())
+    assert snapshot._read(snapshot.snapshot_path("cache"))["hits"] == {"1": 8 * snapshot.HIT_DECAY ** 2 + 2 + 1}
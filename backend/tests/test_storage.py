@@ -0,0 +1,56 @@
+import os
+import pytest
+from storage import (
+    atomic_write_bytes, read_bytes, read_checksums, checksum, checksum_path, _atomic_replace, _write_sidecar,
+    CorruptedFileError,
+)
+
+
+def test_write_then_read(tmp_path):
+    path = str(tmp_path / "a.json")
+    atomic_write_bytes(path, b"one")
+    assert read_bytes(path) == b"one"
+    assert read_checksums(path) == [checksum(b"one")]
+    atomic_write_bytes(path, b"two")
+    assert read_checksums(path) == [checksum(b"two"), checksum(b"one")]
+
+
+def test_crash_between_renames_is_not_corruption(tmp_path):
+    path = str(tmp_path / "a.json")
+    atomic_write_bytes(path, b"one")
+    # A crash after the sidecar rename leaves the previous content in place
+    _write_sidecar(path, b"two")
+    assert read_bytes(path) == b"one"
+    _atomic_replace(path, b"two")
+    assert read_bytes(path) == b"two"
+    atomic_write_bytes(path, b"three")
+    assert read_bytes(path) == b"three"
+
+
+def test_in_place_truncation_is_corruption(tmp_path):
+    path = str(tmp_path / "a.json")
+    atomic_write_bytes(path, b'{"a": 1, "b": 2}')
+    # A torn write bypassing atomic_write_bytes; its mtime is newer than the sidecar's
+    with open(path, "w") as f:
+        f.write('{"a": 1, ')
+    with pytest.raises(CorruptedFileError):
+        read_bytes(path)
+
+
+def test_mismatch_with_sidecar_raises(tmp_path):
+    path = str(tmp_path / "a.json")
+    atomic_write_bytes(path, b"one")
+    with open(checksum_path(path), "w") as f:
+        f.write(checksum(b"something else"))
+    with pytest.raises(CorruptedFileError):
+        read_bytes(path)
+
+
+def test_file_without_sidecar_gets_one(tmp_path):
+    path = str(tmp_path / "a.json")
+    atomic_write_bytes(path, b"one", with_checksum=False)
+    assert not os.path.exists(checksum_path(path))
+    assert read_bytes(path) == b"one"
+    # Its hash is recorded as the previous one, for a crash before the data rename
+    atomic_write_bytes(path, b"two")
+    assert read_checksums(path) == [checksum(b"two"), checksum(b"one")]
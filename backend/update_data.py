@@ -1,8 +1,15 @@
 import os
 import sys
-import json
 import argparse
 from scraper import get_jisilu_data
+from storage import atomic_write_json
+from article_store import get_store
+from bundles import write_bundle, load_manifest, head_path
+from delta import compute_delta, write_delta
+from media_cache import MediaCache, collection_media
+from lazy import lazy_import
+
+columnar = lazy_import("columnar")
 
 # Define paths relative to this script
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -13,20 +20,47 @@ def ensure_dir(directory):
     if not os.path.exists(directory):
         os.makedirs(directory)
 
-def update_article(article_id):
+def update_article(article_id, with_media=True, max_age=0):
     url = f"https://www.jisilu.cn/question/{article_id}"
     print(f"Fetching data for article {article_id}...")
     
     try:
-        data = get_jisilu_data(url, force_update=True)
+        # Pages fetched by another tool within max_age seconds are reused
+        data = get_jisilu_data(url, max_age=max_age)
         data['id'] = article_id
+        if with_media:
+            # Before diffing, so unchanged images don't show up as edits
+            try:
+                MediaCache(*collection_media("public")).localize_article(data)
+            except Exception as e:
+                print(f"Media caching failed, keeping remote URLs: {e}")
+        
+        store = get_store("public")
+        previous = store.get(article_id)
+        
+        # Publish what changed since the last snapshot so clients can patch their copy
+        if previous is not None:
+            version = previous.get('version', 0)
+            delta = compute_delta(previous, data)
+            if delta is not None:
+                delta.update({'id': article_id, 'from_version': version, 'to_version': version + 1})
+                version += 1
+                path = write_delta(DATA_DIR, article_id, delta)
+                print(f"Wrote delta v{version} ({len(delta['added'])} added, "
+                      f"{len(delta['updated'])} updated, {len(delta['moved'])} moved, "
+                      f"{len(delta['removed'])} removed) to {path}")
+            data['version'] = version
+        else:
+            data['version'] = 1
         
         # Save article JSON
         ensure_dir(DATA_DIR)
-        file_path = os.path.join(DATA_DIR, f"{article_id}.json")
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        print(f"Saved article data to {file_path}")
+        store.save(data)
+        print(f"Saved article data for {article_id}")
+        columnar.ingest(store.collection, data, store.updated_at(article_id))
+
+        manifest = write_bundle(data, DATA_DIR)
+        print(f"Wrote bundle {head_path(manifest, article_id)} ({len(manifest['files'])} chunks)")
         
         return True
     except Exception as e:
@@ -37,43 +71,40 @@ def update_index():
     print("Updating index...")
     ensure_dir(DATA_DIR)
     
-    files = [f for f in os.listdir(DATA_DIR) if f.endswith('.json') and f != 'index.json']
-    history = []
-    
-    for filename in files:
-        file_path = os.path.join(DATA_DIR, filename)
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                if 'id' in data and 'title' in data:
-                    history.append({
-                        'id': data['id'],
-                        'title': data['title'],
-                        # Use file modification time or publish time if needed, 
-                        # but file mtime is good for "last updated"
-                        'updated_at': os.path.getmtime(file_path)
-                    })
-        except Exception as e:
-            print(f"Error reading {filename}: {e}")
-            
-    # Sort by updated_at desc
-    history.sort(key=lambda x: x.get('updated_at', 0), reverse=True)
+    store = get_store("public")
+    # Already sorted by updated_at desc
+    history = store.list_articles()
     
     # Clean up fields for index
-    index_data = [{'id': item['id'], 'title': item['title']} for item in history]
+    index_data = []
+    for item in history:
+        entry = {'id': item['id'], 'title': item['title'], 'version': item['version']}
+        manifest = load_manifest(DATA_DIR, item['id'])
+        if manifest is None:
+            # Bundles are untracked: a fresh checkout (the deploy job) builds them here
+            manifest = write_bundle(store.get(item['id']), DATA_DIR)
+        entry['bundle'] = head_path(manifest, item['id'])
+        index_data.append(entry)
     
     index_path = os.path.join(DATA_DIR, "index.json")
-    with open(index_path, 'w', encoding='utf-8') as f:
-        json.dump(index_data, f, ensure_ascii=False, indent=2)
+    # Deployed as-is to GitHub Pages, so no checksum sidecar
+    atomic_write_json(index_path, index_data, with_checksum=False)
     print(f"Updated index with {len(index_data)} items at {index_path}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Update article data.')
-    parser.add_argument('article_id', help='The Article ID to update')
+    parser.add_argument('article_id', nargs='?', help='The Article ID to update')
+    parser.add_argument('--index-only', action='store_true',
+                        help='Only rebuild index.json and the (untracked) bundles from the stored articles')
+    parser.add_argument('--no-media', action='store_true', help='Keep linking avatars and images on jisilu')
+    parser.add_argument('--max-age', type=float, default=0,
+                        help='Reuse cached thread pages up to this many seconds old (default: always refetch)')
     args = parser.parse_args()
     
-    if args.article_id:
-        if update_article(args.article_id):
+    if args.index_only:
+        update_index()
+    elif args.article_id:
+        if update_article(args.article_id, with_media=not args.no_media, max_age=args.max_age):
             update_index()
         else:
             sys.exit(1)
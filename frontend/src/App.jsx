@@ -11,11 +11,18 @@ const extractId = (input) => {
   return null;
 };
 
+// index.json and legacy article files keep their URL across updates, so the
+// browser revalidates them (a 304 when unchanged) instead of refetching each
+// visit; everything they point to is content-hashed.
+const REVALIDATE = { adapter: 'fetch', fetchOptions: { cache: 'no-cache' } };
+
 function App() {
   const [inputId, setInputId] = useState('');
   const [loading, setLoading] = useState(false);
   const [data, setData] = useState(null);
   const [error, setError] = useState(null);
+  const [nextChunk, setNextChunk] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [history, setHistory] = useState([]);
   const [sidebarOpen, setSidebarOpen] = useState(true);
 
@@ -26,7 +33,7 @@ function App() {
 
   const fetchHistory = async () => {
     try {
-      const res = await axios.get(import.meta.env.BASE_URL + 'data/index.json?t=' + new Date().getTime());
+      const res = await axios.get(import.meta.env.BASE_URL + 'data/index.json', REVALIDATE);
       setHistory(res.data);
     } catch (err) {
       console.error("Failed to fetch history", err);
@@ -39,11 +46,24 @@ function App() {
     setLoading(true);
     setError(null);
     setData(null);
+    setNextChunk(null);
 
     try {
-      // Add timestamp to prevent browser caching when re-fetching
-      const response = await axios.get(`${import.meta.env.BASE_URL}data/${id}.json?t=${new Date().getTime()}`);
-      setData(response.data);
+      const entry = history.find((item) => item.id === id);
+      let bundle = null;
+      if (entry?.bundle) {
+        // Bundle chunks are content-hashed, so the browser may cache them forever.
+        // They are built by the deploy job only: a fresh clone or `npm run dev`
+        // has none, so a missing bundle falls back to the article file.
+        bundle = await axios.get(`${import.meta.env.BASE_URL}data/${entry.bundle}`).catch(() => null);
+      }
+      if (bundle?.data?.comments) {
+        setData(bundle.data);
+        setNextChunk(bundle.data.next || null);
+      } else {
+        const response = await axios.get(`${import.meta.env.BASE_URL}data/${id}.json`, REVALIDATE);
+        setData(response.data);
+      }
     } catch (err) {
       setError('文章未收录，请在 GitHub Actions 中手动触发更新');
     } finally {
@@ -51,6 +71,22 @@ function App() {
     }
   };
 
+  const chunkBase = data ? `${import.meta.env.BASE_URL}data/bundles/${data.id}/` : '';
+
+  const loadMoreComments = async () => {
+    if (!nextChunk) return;
+    setLoadingMore(true);
+    try {
+      const response = await axios.get(chunkBase + nextChunk);
+      setData((prev) => ({ ...prev, comments: [...prev.comments, ...response.data.comments] }));
+      setNextChunk(response.data.next || null);
+    } catch (err) {
+      console.error("Failed to load more comments", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleSubmit = (e) => {
     e.preventDefault();
     const id = extractId(inputId);
@@ -191,11 +227,20 @@ function App() {
                     <h2 className="text-xl font-bold text-gray-800 flex items-center gap-2">
                       评论区 
                       <span className="text-sm font-normal text-gray-500 bg-gray-100 px-2 py-1 rounded-full">
-                        {data.comments.length}
+                        {data.comment_count ?? data.comments.length}
                       </span>
                     </h2>
                   </div>
-                  <CommentTree comments={data.comments} />
+                  <CommentTree comments={data.comments} chunkBase={chunkBase} authors={data.authors} />
+                  {nextChunk && (
+                    <button
+                      onClick={loadMoreComments}
+                      disabled={loadingMore}
+                      className="mt-4 w-full py-2 text-sm text-blue-600 bg-white border border-gray-200 rounded-lg hover:bg-blue-50 disabled:opacity-50 transition-colors"
+                    >
+                      {loadingMore ? '加载中...' : `加载更多评论 (${data.comments.length}/${data.comment_count})`}
+                    </button>
+                  )}
                 </section>
               </div>
             )}
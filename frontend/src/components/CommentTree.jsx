@@ -1,10 +1,39 @@
 import React, { useState } from 'react';
+import axios from 'axios';
 import { MessageSquare, User, Clock, MapPin, ChevronDown, ChevronRight } from 'lucide-react';
 import clsx from 'clsx';
 
-const CommentItem = ({ comment, depth = 0 }) => {
-  const [isExpanded, setIsExpanded] = useState(true);
-  const hasChildren = comment.children && comment.children.length > 0;
+// Compact articles name a comment's author by index into the article's `authors` list
+const resolveAuthor = (comment, authors) => {
+  if (typeof comment.author !== 'number') return { name: comment.author, avatar: comment.author_avatar };
+  return authors?.[comment.author] || {};
+};
+
+const CommentItem = ({ comment, depth = 0, chunkBase, authors }) => {
+  const author = resolveAuthor(comment, authors);
+  // Large reply subtrees in a bundle are split out into `children_chunk` and fetched on expand
+  const [lazyChildren, setLazyChildren] = useState(null);
+  const [isExpanded, setIsExpanded] = useState(!comment.children_chunk);
+  const [loadingChildren, setLoadingChildren] = useState(false);
+  const children = comment.children || lazyChildren || [];
+  const childCount = comment.children_count ?? children.length;
+  const hasChildren = childCount > 0;
+
+  const toggleExpanded = async () => {
+    if (!isExpanded && comment.children_chunk && !lazyChildren) {
+      setLoadingChildren(true);
+      try {
+        const response = await axios.get(chunkBase + comment.children_chunk);
+        setLazyChildren(response.data);
+      } catch (err) {
+        console.error("Failed to load replies", err);
+        return;
+      } finally {
+        setLoadingChildren(false);
+      }
+    }
+    setIsExpanded(!isExpanded);
+  };
 
   return (
     <div className={clsx("flex flex-col mb-4", depth > 0 && "ml-2 pl-2 border-l-2 border-gray-200")}>
@@ -15,14 +44,14 @@ const CommentItem = ({ comment, depth = 0 }) => {
         {/* Header */}
         <div className="flex items-center justify-between mb-2">
           <div className="flex items-center gap-2">
-            {comment.author_avatar && !comment.author_avatar.includes('default') ? (
-                <img src={comment.author_avatar} alt={comment.author} className="w-6 h-6 rounded-full" />
+            {author.avatar && !author.avatar.includes('default') ? (
+                <img src={author.avatar} alt={author.name} className="w-6 h-6 rounded-full" />
             ) : (
                 <div className="w-6 h-6 bg-blue-100 rounded-full flex items-center justify-center">
                   <User size={14} className="text-blue-500" />
                 </div>
             )}
-            <span className="font-semibold text-gray-800 text-sm">{comment.author}</span>
+            <span className="font-semibold text-gray-800 text-sm">{author.name}</span>
             {comment.reply_to_user && (
                 <span className="text-gray-500 text-xs flex items-center gap-1">
                     <span className="text-gray-400">回复</span>
@@ -45,11 +74,12 @@ const CommentItem = ({ comment, depth = 0 }) => {
         {/* Footer / Actions */}
         {hasChildren && (
             <button 
-                onClick={() => setIsExpanded(!isExpanded)}
+                onClick={toggleExpanded}
+                disabled={loadingChildren}
                 className="mt-2 flex items-center gap-1 text-xs text-blue-500 hover:text-blue-700 font-medium select-none"
             >
                 {isExpanded ? <ChevronDown size={14} /> : <ChevronRight size={14} />}
-                {isExpanded ? '收起回复' : `展开 ${comment.children.length} 条回复`}
+                {loadingChildren ? '加载中...' : isExpanded ? '收起回复' : `展开 ${childCount} 条回复`}
             </button>
         )}
       </div>
@@ -57,8 +87,8 @@ const CommentItem = ({ comment, depth = 0 }) => {
       {/* Children */}
       {hasChildren && isExpanded && (
         <div className="mt-2">
-          {comment.children.map(child => (
-            <CommentItem key={child.id} comment={child} depth={depth + 1} />
+          {children.map(child => (
+            <CommentItem key={child.id} comment={child} depth={depth + 1} chunkBase={chunkBase} authors={authors} />
           ))}
         </div>
       )}
@@ -66,13 +96,13 @@ const CommentItem = ({ comment, depth = 0 }) => {
   );
 };
 
-const CommentTree = ({ comments }) => {
+const CommentTree = ({ comments, chunkBase = '', authors }) => {
   if (!comments || comments.length === 0) return <div className="text-center text-gray-500 py-10">暂无评论</div>;
 
   return (
     <div className="space-y-4">
       {comments.map(comment => (
-        <CommentItem key={comment.id} comment={comment} />
+        <CommentItem key={comment.id} comment={comment} chunkBase={chunkBase} authors={authors} />
       ))}
     </div>
   );
@@ -16,6 +16,13 @@ if [ "$1" == "backend" ]; then
         exit 1
     fi
 
+elif [ "$1" == "prod" ]; then
+    echo "Starting Backend Service (production, multiple workers)..."
+    cd backend
+    # Worker count: WEB_CONCURRENCY env var, or pass e.g. --workers 4
+    shift
+    python serve.py "$@"
+
 elif [ "$1" == "frontend" ]; then
     echo "Starting Frontend Service..."
     cd frontend
@@ -28,9 +35,10 @@ elif [ "$1" == "frontend" ]; then
     fi
 
 else
-    echo "Usage: $0 {backend|frontend}"
+    echo "Usage: $0 {backend|prod|frontend}"
     echo "Examples:"
     echo "  $0 backend   # Start the FastAPI backend"
+    echo "  $0 prod -w 4 # Start the backend with 4 workers, no reload"
     echo "  $0 frontend  # Start the React frontend"
     exit 1
 fi